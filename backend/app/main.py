@@ -3,11 +3,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
-from backend.core.data_loader import (
-    rebuild_factories_and_tariffs_from_google,
-    load_factories_and_tariffs,
-)
+from backend.core.catalog import get_catalog
+from backend.core.data_loader import rebuild_factories_and_tariffs_from_google
 from backend.core.logger import get_logger
+from backend.core.responses import FastJSONResponse
+from backend.service.distance_grid import start_grid_refresher
+from backend.service.fibonacci_service import fibonacci_table
+from backend.service.quote_jobs import get_job_runner
 
 # === ЛОГГЕР ===
 log = get_logger("main")
@@ -15,7 +17,8 @@ log = get_logger("main")
 # === ЗАГРУЗКА ENV ===
 load_dotenv()
 
-app = FastAPI(title="Delivery Calculator")
+# Все ответы по умолчанию сериализуются через orjson (см. backend.core.responses)
+app = FastAPI(title="Delivery Calculator", default_response_class=FastJSONResponse)
 
 # === CORS ===
 app.add_middleware(
@@ -31,25 +34,56 @@ GOOGLE_SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 GOOGLE_CREDS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 
-@app.on_event("startup")
-async def startup_event():
-    log.info("🚀 Backend has started")
+def preload_data(rebuild: bool = True) -> None:
+    """
+    Пересоздаёт данные из Google Sheets и прогревает снимок каталога со всеми
+    производными структурами. Под ``backend.app.serve`` выполняется один раз
+    в мастер-процессе до fork, воркеры получают готовый снимок.
+    """
     log.info(f"ENV GOOGLE_SHEET_ID: {GOOGLE_SHEET_ID}")
     log.info(f"ENV GOOGLE_APPLICATION_CREDENTIALS: {GOOGLE_CREDS}")
 
     # Пересоздание данных из Google Sheets
-    rebuild_factories_and_tariffs_from_google(GOOGLE_SHEET_ID)
+    if rebuild:
+        rebuild_factories_and_tariffs_from_google(GOOGLE_SHEET_ID)
 
-    # Проверим, что файлы теперь точно есть
-    factories, tariffs = load_factories_and_tariffs()
+    # Проверим, что файлы теперь точно есть, и сразу прогреем снимок каталога
+    catalog = get_catalog()
+    factories, tariffs = catalog.factories_products, catalog.tariffs
     log.info(f"✅ factories_products.json загружен ({len(factories)} записей)")
     log.info(f"✅ tariffs.json загружен ({len(tariffs)} тарифов)")
+    warm_catalog(catalog)
+    # таблица Фибоначчи тоже строится до fork и делится воркерами
+    fibonacci_table()
+
+
+@app.on_event("startup")
+async def startup_event():
+    log.info("🚀 Backend has started")
+    if os.getenv("SERVE_MASTER_PID"):
+        # воркер backend.app.serve: каталог уже загружен мастером, сетку считает он же;
+        # исполнители заданий /quote/jobs у каждого воркера свои (очередь общая, в SQLite)
+        get_job_runner()
+        return
+
+    preload_data()
+
+    # Сетка расстояний для частых регионов (DISTANCE_GRID_REGIONS) считается в фоне
+    start_grid_refresher()
+
+    # Исполнители фоновых заданий /api/quote/jobs (подхватывают очередь после перезапуска)
+    get_job_runner()
 
 
 # === РОУТЫ ===
 from backend.app.routes_admin import router as admin_router
 from backend.app.routes_fibonacci import router as fibonacci_router
+from backend.app.routes_jobs import router as jobs_router
+from backend.app.routes_metrics import router as metrics_router
 from backend.app.routes_quote import router as quote_router
+from backend.app.routes_quote import warm_catalog
 app.include_router(quote_router, prefix="/api")
+app.include_router(jobs_router, prefix="/api")
 app.include_router(fibonacci_router, prefix="/api")
-app.include_router(admin_router)
\ No newline at end of file
+app.include_router(admin_router)
+app.include_router(metrics_router)
\ No newline at end of file
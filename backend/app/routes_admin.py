@@ -1,40 +1,64 @@
+import hmac
 import json
+import os
+from typing import Literal, Optional
 
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Header, Query
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 
+from ..core.catalog import broadcast_reload
 from ..core.logger import get_logger
+from ..core.profiler import ProfilerBusy, memory_diff, render_collapsed, sample_stacks
+from ..core.responses import FastJSONResponse
 from ..core.data_loader import (
     load_factories_from_google,
     load_tariffs_from_google,
 )
+from ..service.distance_grid import grid_status, schedule_grid_refresh
+from ..service.osrm_client import osrm_health
 
 router = APIRouter()
 log = get_logger("routes.admin")
 
+# Токен для служебных эндпоинтов, которые влияют на работу процесса (/admin/profile);
+# без него они выключены
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Предел длительности профилирования (с)
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+
+
+def _check_admin_token(token: Optional[str]) -> Optional[FastJSONResponse]:
+    """None — доступ разрешён, иначе готовый ответ с ошибкой."""
+    if not ADMIN_TOKEN:
+        return FastJSONResponse(status_code=403, content={"detail": "Эндпоинт выключен: не задан ADMIN_TOKEN"})
+    if not token or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return FastJSONResponse(status_code=401, content={"detail": "Неверный X-Admin-Token"})
+    return None
+
 
 @router.post("/admin/reload")
 async def admin_reload():
     """
     🔄 Перезагрузка и factories, и tariffs.
+    Чтение таблиц и привязка заводов к OSRM блокируют — выполняются в пуле потоков.
     """
     try:
         log.info("Запуск полного обновления данных из Google Sheets...")
-        factories = load_factories_from_google()
-        tariffs_result = load_tariffs_from_google()
+        factories = await run_in_threadpool(load_factories_from_google)
+        tariffs_result = await run_in_threadpool(load_tariffs_from_google)
+        broadcast_reload()
+        schedule_grid_refresh()
 
-        return JSONResponse(
+        return FastJSONResponse(
             content={
                 "factories_count": len(factories),
                 "tariffs": tariffs_result,
             }
         )
     except Exception as e:
-        import traceback
-
-        traceback.print_exc()
-        log.error("Ошибка при обновлении данных: %s", e)
-        return JSONResponse(
+        log.exception("Ошибка при обновлении данных: %s", e)
+        return FastJSONResponse(
             status_code=500,
             content={"detail": f"Ошибка при обновлении данных: {e}"},
         )
@@ -44,16 +68,15 @@ async def admin_reload():
 async def admin_reload_factories():
     try:
         log.info("Обновление factories из Google Sheets...")
-        factories = load_factories_from_google()
-        return JSONResponse(
+        factories = await run_in_threadpool(load_factories_from_google)
+        broadcast_reload()
+        schedule_grid_refresh()
+        return FastJSONResponse(
             content={"status": "ok", "factories_count": len(factories)}
         )
     except Exception as e:
-        import traceback
-
-        traceback.print_exc()
-        log.error("Ошибка при обновлении factories: %s", e)
-        return JSONResponse(
+        log.exception("Ошибка при обновлении factories: %s", e)
+        return FastJSONResponse(
             status_code=500,
             content={"detail": f"Ошибка при обновлении factories: {e}"},
         )
@@ -63,14 +86,61 @@ async def admin_reload_factories():
 async def admin_reload_tariffs():
     try:
         log.info("Обновление tariffs из Google Sheets...")
-        result = load_tariffs_from_google()
-        return JSONResponse(content=result)
+        result = await run_in_threadpool(load_tariffs_from_google)
+        broadcast_reload()
+        return FastJSONResponse(content=result)
     except Exception as e:
-        import traceback
-
-        traceback.print_exc()
-        log.error("Ошибка при обновлении tariffs: %s", e)
-        return JSONResponse(
+        log.exception("Ошибка при обновлении tariffs: %s", e)
+        return FastJSONResponse(
             status_code=500,
             content={"detail": f"Ошибка при обновлении тарифов: {e}"},
         )
+
+
+@router.get("/admin/osrm")
+async def admin_osrm_stats():
+    """
+    🛰️ Состояние бэкендов OSRM: предохранитель, запросы в полёте,
+    латентность (EWMA и p95), ошибки и выигранные дубли.
+    """
+    return FastJSONResponse(content=osrm_health())
+
+
+@router.get("/admin/distance-grid")
+async def admin_distance_grid():
+    """
+    🗺️ Сетка заранее посчитанных расстояний: регионы, размер ячейки,
+    число заводов и ячеек, время последнего пересчёта.
+    """
+    return FastJSONResponse(content=grid_status())
+
+
+@router.get("/admin/profile")
+async def admin_profile(
+    seconds: float = Query(5.0, gt=0, le=PROFILE_MAX_SECONDS, description="Длительность окна"),
+    mode: Literal["cpu", "memory"] = Query("cpu", description="cpu — выборка стеков, memory — разница tracemalloc"),
+    interval_ms: Optional[float] = Query(None, ge=1, le=1000, description="Интервал выборки стеков (мс)"),
+    limit: int = Query(30, ge=1, le=500, description="Сколько мест вернуть в режиме memory"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    🔬 Профиль процесса за ``seconds`` секунд (нужен заголовок ``X-Admin-Token``).
+    ``cpu`` — свёрнутые стеки всех потоков для flamegraph (text/plain),
+    ``memory`` — места с наибольшим приростом памяти по ``tracemalloc``.
+    Профилируется тот воркер, который принял запрос.
+    """
+    denied = _check_admin_token(x_admin_token)
+    if denied is not None:
+        return denied
+    try:
+        if mode == "memory":
+            result = await run_in_threadpool(memory_diff, seconds, limit)
+            return FastJSONResponse(content={"pid": os.getpid(), "seconds": seconds, **result})
+        interval_s = interval_ms / 1000.0 if interval_ms is not None else None
+        result = await run_in_threadpool(sample_stacks, seconds, interval_s)
+    except ProfilerBusy as exc:
+        return FastJSONResponse(status_code=409, content={"detail": str(exc)})
+    return PlainTextResponse(
+        render_collapsed(result["stacks"]),
+        headers={"X-Profile-Samples": str(result["samples"]), "X-Profile-Pid": str(os.getpid())},
+    )
@@ -1,16 +1,73 @@
-from fastapi import APIRouter, Query
+import os
+from typing import Literal, Optional
 
-from backend.service.fibonacci_service import fibonacci_sequence
+from fastapi import APIRouter, Path, Query
+from fastapi.responses import Response, StreamingResponse
+
+from backend.core.responses import FastJSONResponse
+from backend.service.fibonacci_service import (
+    FIBONACCI_MAX_N,
+    FIBONACCI_TABLE_SIZE,
+    estimate_range_digits,
+    fibonacci,
+    iter_fibonacci_json,
+    render_sequence,
+)
+
+# Пределы потоковой выдачи: номер первого числа, длина диапазона и общий объём
+# вывода в цифрах — время и трафик растут как count × число цифр, а не как count
+FIBONACCI_STREAM_MAX_START = int(os.getenv("FIBONACCI_STREAM_MAX_START", "100000"))
+FIBONACCI_STREAM_MAX_COUNT = int(os.getenv("FIBONACCI_STREAM_MAX_COUNT", "100000"))
+FIBONACCI_STREAM_MAX_DIGITS = int(os.getenv("FIBONACCI_STREAM_MAX_DIGITS", "20000000"))
+
+_STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
 
 router = APIRouter(prefix="/fibonacci", tags=["fibonacci"])
 
 
 @router.get("")
-def get_fibonacci_sequence(count: int = Query(..., ge=1, le=1000, description="Количество чисел Фибоначчи")):
-    """Возвращает последовательность чисел Фибоначчи длиной ``count``."""
-    sequence = fibonacci_sequence(count)
-    return {
-        "count": count,
-        "sequence": sequence,
-        "last": sequence[-1],
-    }
\ No newline at end of file
+def get_fibonacci_sequence(
+    count: int = Query(..., ge=1, le=FIBONACCI_TABLE_SIZE, description="Количество чисел Фибоначчи"),
+):
+    """Возвращает последовательность чисел Фибоначчи длиной ``count`` (срез общей таблицы)."""
+    return Response(content=render_sequence(count), media_type="application/json")
+
+
+@router.get("/stream")
+def stream_fibonacci_range(
+    start: int = Query(0, ge=0, le=FIBONACCI_STREAM_MAX_START, description="Номер первого числа"),
+    count: int = Query(..., ge=1, le=FIBONACCI_STREAM_MAX_COUNT, description="Количество чисел"),
+    format: Literal["ndjson", "json"] = Query("ndjson", description="ndjson — строка на число, json — массив"),
+):
+    """
+    Диапазон ``F(start) … F(start + count - 1)`` потоком: числа считаются
+    по мере отправки, память не растёт с ``count``. Суммарный объём цифр
+    ограничен ``FIBONACCI_STREAM_MAX_DIGITS``.
+    """
+    digits = estimate_range_digits(start, count)
+    if digits > FIBONACCI_STREAM_MAX_DIGITS:
+        return FastJSONResponse(
+            status_code=422,
+            content={
+                "detail": f"Диапазон даёт ~{digits} цифр, предел — {FIBONACCI_STREAM_MAX_DIGITS}; "
+                          "уменьшите start или count"
+            },
+        )
+    return StreamingResponse(
+        iter_fibonacci_json(start, count, format),
+        media_type=_STREAM_MEDIA_TYPES[format],
+    )
+
+
+@router.get("/{n}")
+def get_fibonacci_number(
+    n: int = Path(..., ge=0, le=10**18, description="Номер числа Фибоначчи"),
+    mod: Optional[int] = Query(None, ge=1, le=2**63 - 1, description="Модуль: вернуть F(n) mod mod"),
+):
+    """Возвращает ``F(n)``; без ``mod`` номер ограничен ``FIBONACCI_MAX_N``."""
+    if mod is None and n > FIBONACCI_MAX_N:
+        return FastJSONResponse(
+            status_code=422,
+            content={"detail": f"Без mod номер n ограничен {FIBONACCI_MAX_N}"},
+        )
+    return {"n": n, "mod": mod, "value": fibonacci(n, mod)}
@@ -0,0 +1,81 @@
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.responses import FastJSONResponse
+from backend.models.dto import QuoteRequest
+from backend.service.quote_jobs import FINISHED, QueueFull, get_job, submit_job
+from backend.service.quote_service import QuoteView
+
+router = APIRouter(prefix="/quote/jobs", tags=["quote"])
+
+# Как часто поток событий опрашивает состояние задания (секунды)
+_EVENTS_POLL_S = 0.5
+
+
+def _not_found(job_id: str) -> FastJSONResponse:
+    return FastJSONResponse(status_code=404, content={"detail": f"Задание {job_id} не найдено"})
+
+
+@router.post("")
+async def create_quote_job(
+    req: QuoteRequest,
+    view: QuoteView = Query("full", description="summary — только итоги, full — с детализацией рейсов"),
+):
+    """
+    Ставит расчёт в очередь и сразу возвращает id задания (202).
+    Прогресс и результат — ``GET /api/quote/jobs/{id}`` или поток ``/events``.
+    """
+    try:
+        job_id = await run_in_threadpool(submit_job, req.dict(by_alias=True), view)
+    except QueueFull as exc:
+        return FastJSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+    return FastJSONResponse(
+        status_code=202,
+        content={"id": job_id, "status": "queued", "url": f"/api/quote/jobs/{job_id}"},
+    )
+
+
+@router.get("/{job_id}")
+async def get_quote_job(job_id: str):
+    """Состояние задания: статус, прогресс ``{done, total}`` и результат по завершении."""
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        return _not_found(job_id)
+    return job
+
+
+@router.get("/{job_id}/events")
+async def quote_job_events(job_id: str):
+    """
+    Server-Sent Events: ``progress`` при каждом изменении прогресса и
+    завершающее ``done`` с полным состоянием задания.
+    """
+    job = await run_in_threadpool(get_job, job_id)
+    if job is None:
+        return _not_found(job_id)
+
+    async def events():
+        nonlocal job
+        last = None
+        while True:
+            if job["status"] in FINISHED:
+                yield _sse("done", job)
+                return
+            state = (job["status"], job["progress"]["done"], job["progress"]["total"])
+            if state != last:
+                last = state
+                yield _sse("progress", {"id": job_id, "status": job["status"], "progress": job["progress"]})
+            await asyncio.sleep(_EVENTS_POLL_S)
+            job = await run_in_threadpool(get_job, job_id)
+            if job is None:
+                return
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode("ascii") + b"\ndata: " + orjson.dumps(data) + b"\n\n"
@@ -0,0 +1,13 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from backend.core.metrics import render_metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    """Метрики в формате Prometheus (агрегированные по воркерам в multiprocess-режиме)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
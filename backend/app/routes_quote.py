@@ -1,119 +1,133 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-
-from backend.core.logger import get_logger
-from backend.models.dto import QuoteRequest
-from backend.core.data_loader import load_factories_and_tariffs
-from backend.service.osrm_client import OSRMUnavailableError
-from backend.service.transport_calc import (
-    build_shipment_details_from_result,
-    build_trip_items_details,
-    evaluate_scenario_transport,
-)
-from backend.service.scenario_builder import build_factory_scenarios_v2
+import os
+import time
+
+from fastapi import APIRouter, Query, Request
+from starlette.concurrency import run_in_threadpool
+
+from backend.core.admission import AdmissionRejected, admitted, estimate_quote_work, get_admission
+from backend.core.responses import FastJSONResponse
+from backend.core.metrics import QUOTE_LATENCY
+from backend.core.slowlog import is_slow_quote, record_slow_quote, slow_log_enabled
+from backend.core.tracing import end_trace, span, start_trace
+from backend.models.dto import QuoteRequest, QuoteVariantRequest
+from backend.core.catalog import CatalogSnapshot, catalog_response, get_catalog
+from backend.service.quote_records import compile_tariffs
+from backend.service.quote_service import QuoteView, build_offer_index, calculate_quote, calculate_variant
+from backend.service.traffic_recorder import get_recorder
 
 router = APIRouter(tags=["quote"])
-log = get_logger("routes.quote")
+
+
+# Трассировка включается заголовком X-Debug-Timing: 1 / параметром ?debug=1
+# или для всех запросов переменной QUOTE_TRACING=1
+QUOTE_TRACING = os.getenv("QUOTE_TRACING", "0").lower() in ("1", "true", "yes")
+
+
+def _tracing_requested(request: Request) -> bool:
+    if QUOTE_TRACING:
+        return True
+    flag = request.headers.get("x-debug-timing") or request.query_params.get("debug")
+    return (flag or "").lower() in ("1", "true", "yes")
 
 
 @router.post("/quote")
-async def make_quote(req: QuoteRequest):
+async def make_quote(
+    req: QuoteRequest,
+    request: Request,
+    view: QuoteView = Query("full", description="summary — только итоги, full — с детализацией рейсов"),
+):
     """
     Основной эндпоинт расчёта маршрутов.
     """
-    log.info("Запрос на расчёт: %s", req.dict())
-
-    # ✅ загружаем объединённые данные (товары + заводы)
-    factories_products, tariffs = load_factories_and_tariffs()
-    if not factories_products:
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Не удалось загрузить factories_products.json"},
-        )
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        # До расчёта оцениваем его тяжесть и занимаем слоты допуска: тяжёлые
+        # заказы не должны вытеснять лёгкие интерактивные (см. backend.core.admission)
+        work = _estimate_work(req)
+        try:
+            async with admitted(get_admission(), work):
+                status_code, response = await _run_quote(req, request, view)
+                return response
+        except AdmissionRejected as exc:
+            status_code = 503
+            return FastJSONResponse(
+                status_code=503,
+                content={"detail": str(exc)},
+                headers={"Retry-After": str(exc.retry_after)},
+            )
+    finally:
+        QUOTE_LATENCY.labels(status=str(status_code)).observe(time.perf_counter() - started)
+
+
+@router.post("/quote/variant")
+async def make_quote_variant(req: QuoteVariantRequest):
+    """
+    Детализация одного варианта по ``variantKey`` из ответа /quote?view=summary.
+    Оценивается только этот сценарий, без перебора комбинаций заводов.
+    """
+    status_code, content = await run_in_threadpool(calculate_variant, req)
+    return FastJSONResponse(status_code=status_code, content=content)
 
-    # 🧩 строим сценарии (используем товары с вложенными заводами)
-    # Приводим factories_products в список объектов
-    if isinstance(factories_products, dict):
-        factories_list = []
-        for sheet, items in factories_products.items():
-            if isinstance(items, list):
-                factories_list.extend(items)
-    else:
-        factories_list = factories_products
-
-    # Преобразуем Pydantic-модели в обычные словари
-    items_data = [item.dict() for item in req.items]
-
-    scenarios = build_factory_scenarios_v2(factories_list, items_data)
-
-    if not scenarios:
-        return JSONResponse(
-            status_code=400,
-            content={"detail": "Не удалось построить ни одного сценария"},
-        )
 
-    results = []
+def _estimate_work(req: QuoteRequest) -> float:
+    offer_index = get_catalog().memo("offer_index", build_offer_index)
+    return estimate_quote_work(offer_index, [item.dict() for item in req.items])
 
-    try:
-        for sc in scenarios:
-            r = evaluate_scenario_transport(sc, req, tariffs)
-            if r:
-                results.append(r)
-    except OSRMUnavailableError:
-        return JSONResponse(
-            status_code=503,
-            content={"detail": "OSRM недоступен, попробуйте позже"},
-        )
 
-    if not results:
-        return JSONResponse(
-            status_code=400,
-            content={"detail": "Не удалось подобрать подходящий вариант"},
-        )
+def _calculate(req: QuoteRequest, view: str):
+    # выборка запросов пишется в журнал для backend.bench.replay (QUOTE_RECORD_FILE)
+    recorder = get_recorder()
+    if recorder is not None and recorder.sampled():
+        return recorder.record(calculate_quote, req, view)
+    return calculate_quote(req, view)
 
-    # --- фильтруем результаты, у которых нет total_cost ---
-    valid_results = [r for r in results if isinstance(r, dict) and "total_cost" in r]
-
-    if not valid_results:
-        print("⚠️ Нет валидных результатов с total_cost")
-        return {"ok": False, "reason": "Не удалось рассчитать стоимость"}
-
-    results = sorted(valid_results, key=lambda x: x["total_cost"])[:3]
-
-    # формируем детализированные варианты
-    variants = []
-    for r in results:
-        shipment_details = build_shipment_details_from_result(r, req)
-        trip_items = build_trip_items_details(r)
-        transport_title = r.get("transport_name", "Неизвестный транспорт")
-        scenario_weight = r.get("scenario", {}).get("total_weight", 0)
-        variants.append({
-            "totalCost": round(r["material_sum"] + r["delivery_cost"], 2),
-            "materialCost": round(r["material_sum"], 2),
-            "deliveryCost": round(r["delivery_cost"], 2),
-            "totalWeight": round(scenario_weight, 2),
-            "transportName": transport_title,
-            "tripCount": r.get("trip_count", 0),
-            "transportDetails": r.get("factory_plans", []),
-            "details": shipment_details,
-            "tripItems": trip_items,
-        })
 
-    # выводим в лог лучший результат
-    print("\n=== 📊 ТОП-3 РЕЗУЛЬТАТОВ ===")
-    for i, v in enumerate(variants, start=1):
-        print(f"{i}) {v['transportName']}: {v['totalCost']}₽ ({v['deliveryCost']} доставка)")
-    print("==================================\n")
+async def _run_quote(req: QuoteRequest, request: Request, view: str):
+    # Расчёт синхронный и тяжёлый — уносим его в пул потоков, чтобы не блокировать
+    # event loop и обслуживать одновременные запросы (контекст трассы копируется)
+    debug = _tracing_requested(request)
+    if not debug and not slow_log_enabled():
+        status_code, content = await run_in_threadpool(_calculate, req, view)
+        return status_code, FastJSONResponse(status_code=status_code, content=content)
 
-    return JSONResponse({"success": True, "variants": variants})
+    trace, token = start_trace()
+    try:
+        status_code, content = await run_in_threadpool(_calculate, req, view)
+        if debug:
+            content["debug"] = trace.as_dict()
+        with span("serialize"):
+            response = FastJSONResponse(status_code=status_code, content=content)
+    finally:
+        end_trace(token)
+
+    elapsed_ms = trace.elapsed_ms()
+    if is_slow_quote(elapsed_ms):
+        # медленный расчёт — в журнал: запрос, этапы и счётчики сценариев
+        await run_in_threadpool(
+            record_slow_quote, elapsed_ms, status_code, view, req.dict(by_alias=True), trace.as_dict()
+        )
+    if debug:
+        response.headers["Server-Timing"] = trace.server_timing()
+    return status_code, response
 
 
-@router.get("/factories")
-def get_factories():
-    factories_products, _ = load_factories_and_tariffs()
+def warm_catalog(catalog: CatalogSnapshot) -> None:
+    """Строит индекс предложений, записи тарифов и тела справочников заранее."""
+    catalog.memo("offer_index", build_offer_index)
+    compile_tariffs(catalog.tariffs)
+    catalog.rendered("factories", _build_factories)
+    catalog.rendered("tariffs", _build_tariffs)
+    catalog.rendered("categories", _build_categories)
+    catalog.rendered("bootstrap", _build_bootstrap)
 
+
+# === СПРАВОЧНИКИ ===
+# Тела ответов строятся один раз на версию данных (см. backend.core.catalog)
+
+def _build_factories(catalog: CatalogSnapshot):
     factories = []
-    for category, items in factories_products.items():
+    for category, items in catalog.factories_products.items():
         for item in items:
             f = item.get("factory", {})
             if not f.get("name"):
@@ -136,16 +150,13 @@ def get_factories():
     return factories
 
 
-@router.get("/tariffs")
-def get_tariffs():
-    _, tariffs = load_factories_and_tariffs()
+def _build_tariffs(catalog: CatalogSnapshot):
     # возвращаем массив напрямую, без ключа "tariffs"
-    return tariffs
+    return catalog.tariffs
 
 
-@router.get("/categories")
-def get_categories():
-    factories_products, _ = load_factories_and_tariffs()
+def _build_categories(catalog: CatalogSnapshot):
+    factories_products = catalog.factories_products
 
     result = {}
     if isinstance(factories_products, dict):
@@ -163,3 +174,78 @@ def get_categories():
                 result[category] = subtypes
 
     return result
+
+
+def _build_subtypes(catalog: CatalogSnapshot):
+    """Параметры подтипов по категориям: вес штуки, порог спецтранспорта, максимум на рейс."""
+    result = {}
+    factories_products = catalog.factories_products
+    if not isinstance(factories_products, dict):
+        return result
+
+    fields = ("weight_per_item", "special_threshold", "max_per_trip")
+    for category, items in factories_products.items():
+        if not isinstance(items, list):
+            continue
+        subtypes = result.setdefault(category, {})
+        for item in items:
+            if not item.get("subtype"):
+                continue
+            meta = subtypes.setdefault(str(item.get("subtype")), dict.fromkeys(fields))
+            # у разных заводов значение может отсутствовать — берём первое заданное
+            for field in fields:
+                if meta[field] is None:
+                    meta[field] = item.get(field)
+        if not subtypes:
+            del result[category]
+
+    return {category: dict(sorted(subtypes.items())) for category, subtypes in result.items()}
+
+
+def _build_tariff_summaries(catalog: CatalogSnapshot):
+    """Машины из тарифов без строк по диапазонам: тег, название, грузоподъёмность."""
+    vehicles = {}
+    for tariff in compile_tariffs(catalog.tariffs):
+        name = tariff.raw.get("название") or tariff.raw.get("name")
+        if not name:
+            continue
+        vehicle = vehicles.setdefault((tariff.tag, name), {
+            "tag": tariff.tag,
+            "name": name,
+            "capacity": tariff.capacity,
+            "tariffs": 0,
+        })
+        vehicle["capacity"] = max(vehicle["capacity"], tariff.capacity)
+        vehicle["tariffs"] += 1
+    return list(vehicles.values())
+
+
+def _build_bootstrap(catalog: CatalogSnapshot):
+    """Всё, что нужно странице калькулятора при загрузке, одним документом."""
+    return {
+        "version": catalog.version,
+        # строим прямо здесь: rendered() уже держит блокировку снимка, повторный memo() её не возьмёт
+        "categories": _build_categories(catalog),
+        "subtypes": _build_subtypes(catalog),
+        "tariffs": _build_tariff_summaries(catalog),
+    }
+
+
+@router.get("/bootstrap")
+def get_bootstrap(request: Request):
+    return catalog_response(request, "bootstrap", _build_bootstrap)
+
+
+@router.get("/factories")
+def get_factories(request: Request):
+    return catalog_response(request, "factories", _build_factories)
+
+
+@router.get("/tariffs")
+def get_tariffs(request: Request):
+    return catalog_response(request, "tariffs", _build_tariffs)
+
+
+@router.get("/categories")
+def get_categories(request: Request):
+    return catalog_response(request, "categories", _build_categories)
@@ -0,0 +1,273 @@
+"""Многопроцессный запуск бэкенда с каталогом, загруженным до fork.
+
+Мастер-процесс один раз пересоздаёт данные из Google Sheets, загружает снимок
+каталога со всеми производными структурами (индекс предложений, тарифы,
+готовые справочники), замораживает кучу (``gc.freeze``) и форкает воркеров
+uvicorn на общем сокете. Воркеры делят эти страницы памяти copy-on-write и
+не повторяют загрузку.
+
+Перезагрузка: воркер, выполнивший ``/admin/reload``, шлёт мастеру SIGHUP
+(то же делает ``kill -HUP <pid мастера>``). Мастер загружает новый снимок,
+форкает новое поколение воркеров и мягко гасит старое (SIGTERM: uvicorn
+дорабатывает начатые запросы). Так же мастер поступает после пересчёта сетки
+расстояний. Упавший воркер перезапускается; если воркеры падают сразу после
+старта (например, ошибка импорта), перезапуск откладывается с растущей паузой.
+
+Запуск:
+    python -m backend.app.serve --host 0.0.0.0 --port 8000 --workers 4
+"""
+import argparse
+import gc
+import os
+import shutil
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+# Сколько воркеров запускать по умолчанию (как у gunicorn/uvicorn)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or (os.cpu_count() or 1)
+# Сколько секунд старый воркер может дорабатывать запросы после SIGTERM
+SERVE_GRACEFUL_TIMEOUT_S = float(os.getenv("SERVE_GRACEFUL_TIMEOUT_S", "30"))
+# Воркер, проживший меньше этого (с), считается упавшим при старте
+SERVE_RESPAWN_MIN_UPTIME_S = float(os.getenv("SERVE_RESPAWN_MIN_UPTIME_S", "5"))
+# Пауза перед перезапуском после первого такого падения; дальше удваивается до предела
+SERVE_RESPAWN_BACKOFF_S = float(os.getenv("SERVE_RESPAWN_BACKOFF_S", "0.5"))
+SERVE_RESPAWN_BACKOFF_MAX_S = float(os.getenv("SERVE_RESPAWN_BACKOFF_MAX_S", "30"))
+
+
+def _prepare_multiproc_dir() -> None:
+    """
+    Метрики нескольких воркеров агрегируются через PROMETHEUS_MULTIPROC_DIR;
+    каталог очищается до импорта prometheus_client (он читает переменную при импорте).
+    """
+    path = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if not path:
+        return
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def _mark_metrics_dead(pid: int) -> None:
+    """Удаляет live-значения метрик завершившегося воркера (livesum/livemax)."""
+    if not os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        return
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid)
+
+
+class PreforkServer:
+    def __init__(self, host: str, port: int, workers: int, graceful_timeout_s: float = SERVE_GRACEFUL_TIMEOUT_S):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers)
+        self.graceful_timeout_s = graceful_timeout_s
+        self.sock: Optional[socket.socket] = None
+        # pid воркера → поколение (номер загрузки каталога) и время запуска
+        self.children: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        # падения при старте подряд и моменты отложенных перезапусков
+        self._crashes = 0
+        self._respawn_at: List[float] = []
+        self.generation = 0
+        self._reload_requested = False
+        self._stopping = False
+        self.log = None
+
+    # --- мастер ---
+
+    def run(self) -> int:
+        from backend.app.main import app, preload_data
+        from backend.core.logger import get_logger
+        from backend.service.distance_grid import add_refresh_listener, start_grid_refresher
+
+        self.app = app
+        self.log = get_logger("serve")
+        os.environ["SERVE_MASTER_PID"] = str(os.getpid())
+
+        self.sock = self._bind()
+        self.log.info("Мастер %s слушает %s:%s, воркеров: %s", os.getpid(), self.host, self.port, self.workers)
+
+        preload_data()
+        signal.signal(signal.SIGHUP, self._on_reload_signal)
+        signal.signal(signal.SIGTERM, self._on_stop_signal)
+        signal.signal(signal.SIGINT, self._on_stop_signal)
+
+        # сетку расстояний считает только мастер; после пересчёта — новое поколение воркеров
+        add_refresh_listener(lambda grid: self._request_reload())
+        start_grid_refresher()
+
+        self._spawn_generation()
+        try:
+            while not self._stopping:
+                if self._reload_requested:
+                    self._reload_requested = False
+                    self._reload()
+                self._reap(respawn=True)
+                self._respawn_due()
+                time.sleep(0.2)
+        finally:
+            self._shutdown()
+        return 0
+
+    def _bind(self) -> socket.socket:
+        sock = socket.socket(socket.AF_INET6 if ":" in self.host else socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(2048)
+        sock.set_inheritable(True)
+        return sock
+
+    def _on_reload_signal(self, signum, frame) -> None:
+        self._request_reload()
+
+    def _request_reload(self) -> None:
+        self._reload_requested = True
+
+    def _on_stop_signal(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _reload(self) -> None:
+        from backend.app.main import preload_data
+        from backend.core.catalog import invalidate_catalog
+        from backend.service.distance_grid import schedule_grid_refresh
+
+        self.log.info("Перезагрузка каталога в мастере, поколение %s", self.generation + 1)
+        gc.unfreeze()
+        invalidate_catalog()
+        # данные из таблицы уже записал воркер, выполнивший /admin/reload, — читаем файлы
+        preload_data(rebuild=False)
+        schedule_grid_refresh()
+
+        old = [pid for pid, gen in self.children.items() if gen == self.generation]
+        self._spawn_generation()
+        for pid in old:
+            self._signal(pid, signal.SIGTERM)
+
+    def _spawn_generation(self) -> None:
+        self.generation += 1
+        # отложенные перезапуски относились к прошлому поколению — его заменяет полный набор
+        self._respawn_at.clear()
+        # Собираем мусор и замораживаем всё, что есть: воркеры не будут сканировать
+        # (и тем самым копировать) унаследованные объекты при сборке мусора
+        gc.disable()
+        gc.collect()
+        gc.freeze()
+        try:
+            while sum(1 for gen in self.children.values() if gen == self.generation) < self.workers:
+                self._spawn()
+        finally:
+            gc.enable()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            from backend.core.logger import flush_logging
+
+            gc.enable()
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException:
+                code = 1
+                self.log.exception("Воркер %s завершился с ошибкой", os.getpid())
+            finally:
+                flush_logging()
+                os._exit(code)
+        self.children[pid] = self.generation
+        self.started[pid] = time.monotonic()
+        self.log.info("Запущен воркер %s (поколение %s)", pid, self.generation)
+
+    def _reap(self, respawn: bool) -> None:
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self.children.clear()
+                return
+            if pid == 0:
+                return
+            gen = self.children.pop(pid, None)
+            started = self.started.pop(pid, None)
+            _mark_metrics_dead(pid)
+            if gen is None:
+                continue
+            if respawn and not self._stopping and gen == self.generation:
+                self._schedule_respawn(pid, status, time.monotonic() - (started or 0.0))
+
+    def _schedule_respawn(self, pid: int, status: int, uptime_s: float) -> None:
+        """Перезапуск сразу, а если воркеры падают при старте — с растущей паузой."""
+        if uptime_s < SERVE_RESPAWN_MIN_UPTIME_S:
+            self._crashes += 1
+        else:
+            self._crashes = 0
+        delay = 0.0
+        if self._crashes:
+            delay = min(SERVE_RESPAWN_BACKOFF_MAX_S, SERVE_RESPAWN_BACKOFF_S * 2 ** (self._crashes - 1))
+        self.log.warning(
+            "Воркер %s завершился (статус %s) через %.1f с, перезапуск через %.1f с",
+            pid, status, uptime_s, delay,
+        )
+        self._respawn_at.append(time.monotonic() + delay)
+
+    def _respawn_due(self) -> None:
+        now = time.monotonic()
+        due = [at for at in self._respawn_at if at <= now]
+        if not due:
+            return
+        self._respawn_at = [at for at in self._respawn_at if at > now]
+        for _ in due:
+            if sum(1 for gen in self.children.values() if gen == self.generation) < self.workers:
+                self._spawn()
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            self.children.pop(pid, None)
+            self.started.pop(pid, None)
+
+    def _shutdown(self) -> None:
+        self.log.info("Остановка: воркеров %s", len(self.children))
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.graceful_timeout_s
+        while self.children and time.monotonic() < deadline:
+            self._reap(respawn=False)
+            time.sleep(0.1)
+        for pid in list(self.children):
+            self._signal(pid, signal.SIGKILL)
+        self._reap(respawn=False)
+        if self.sock is not None:
+            self.sock.close()
+
+    # --- воркер ---
+
+    def _run_worker(self) -> None:
+        import uvicorn
+
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        # uvicorn ставит свои обработчики SIGTERM/SIGINT и гасится мягко, а после
+        # остановки повторно поднимает пойманный сигнал для прежнего обработчика.
+        # Пустой обработчик даёт воркеру дописать логи и выйти с кодом 0.
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: None)
+        config = uvicorn.Config(self.app, lifespan="on", log_config=None, access_log=False)
+        uvicorn.Server(config).run(sockets=[self.sock])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Многопроцессный запуск бэкенда с предзагрузкой каталога")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    _prepare_multiproc_dir()
+    return PreforkServer(args.host, args.port, args.workers).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
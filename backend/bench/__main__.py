@@ -0,0 +1,5 @@
+import sys
+
+from backend.bench.quote_bench import main
+
+sys.exit(main())
@@ -0,0 +1,199 @@
+"""Минимальный локальный OSRM для нагрузочных тестов: ``/route``, ``/table`` и ``/nearest``.
+
+Расстояния считаются как расстояние по прямой × коэффициент извилистости,
+задержка ответа настраивается, чтобы отделять накладные расходы бэкенда
+от латентности роутинга.
+
+Пример:
+    python -m backend.bench.fake_osrm --port 5000 --latency-ms 20
+    OSRM_BASE_URL=http://127.0.0.1:5000 uvicorn backend.app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from backend.service.distance_providers import DEFAULT_DETOUR_FACTOR, haversine_km
+
+# Условная средняя скорость для поля duration, км/ч
+_AVG_SPEED_KMH = 50.0
+
+
+def _parse_coords(raw: str) -> List[Tuple[float, float]]:
+    coords = []
+    for pair in raw.split(";"):
+        lon, lat = pair.split(",")[:2]
+        coords.append((float(lon), float(lat)))
+    return coords
+
+
+def _parse_indexes(raw: Optional[str], default: range) -> List[int]:
+    if not raw or raw == "all":
+        return list(default)
+    return [int(i) for i in raw.split(";")]
+
+
+class FakeOSRMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 detour_factor: float = DEFAULT_DETOUR_FACTOR):
+        super().__init__(address, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.detour_factor = detour_factor
+        self.requests_served = 0
+        self.hinted_requests = 0
+        # hints от /nearest привязаны к версии данных, как в настоящем OSRM
+        self.dataset_version = 1
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def distance_m(self, a: Tuple[float, float], b: Tuple[float, float]) -> float:
+        return haversine_km(a[0], a[1], b[0], b[1]) * self.detour_factor * 1000.0
+
+    def make_hint(self, coord: Tuple[float, float]) -> str:
+        raw = f"{self.dataset_version}:{coord[0]:.5f},{coord[1]:.5f}".encode("ascii")
+        return base64.urlsafe_b64encode(raw).decode("ascii")
+
+    def hint_is_valid(self, hint: str) -> bool:
+        try:
+            version = base64.urlsafe_b64decode(hint.encode("ascii")).decode("ascii").split(":")[0]
+        except ValueError:
+            return False
+        return version == str(self.dataset_version)
+
+    def simulate_latency(self) -> None:
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeOSRMServer
+
+    def log_message(self, format, *args):  # noqa: A002 — сигнатура BaseHTTPRequestHandler
+        pass
+
+    def do_GET(self):  # noqa: N802
+        parsed = urlsplit(self.path)
+        parts = parsed.path.strip("/").split("/")
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        if len(parts) != 4 or parts[1] != "v1":
+            return self._reply(400, {"code": "InvalidUrl", "message": "Bad path"})
+
+        service = parts[0]
+        try:
+            coords = _parse_coords(parts[3])
+        except ValueError:
+            return self._reply(400, {"code": "InvalidQuery", "message": "Bad coordinates"})
+
+        hints = query.get("hints")
+        if hints is not None:
+            hints = hints.split(";")
+            if len(hints) != len(coords) or not all(
+                self.server.hint_is_valid(h) for h in hints if h
+            ):
+                return self._reply(400, {"code": "InvalidHint", "message": "Hint is stale"})
+
+        self.server.simulate_latency()
+        with self.server._lock:
+            self.server.requests_served += 1
+            if hints:
+                self.server.hinted_requests += 1
+
+        if service == "nearest":
+            return self._nearest(coords)
+        if service == "route":
+            return self._route(coords)
+        if service == "table":
+            return self._table(coords, query)
+        return self._reply(400, {"code": "InvalidService", "message": service})
+
+    def _route(self, coords):
+        if len(coords) < 2:
+            return self._reply(400, {"code": "InvalidQuery", "message": "Need 2+ coordinates"})
+        distance = sum(self.server.distance_m(a, b) for a, b in zip(coords, coords[1:]))
+        return self._reply(200, {
+            "code": "Ok",
+            "routes": [{"distance": round(distance, 1),
+                        "duration": round(distance / 1000.0 / _AVG_SPEED_KMH * 3600, 1)}],
+            "waypoints": [{"location": list(c)} for c in coords],
+        })
+
+    def _nearest(self, coords):
+        coord = coords[0]
+        return self._reply(200, {
+            "code": "Ok",
+            "waypoints": [{"location": list(coord), "distance": 0.0, "hint": self.server.make_hint(coord)}],
+        })
+
+    def _table(self, coords, query):
+        everything = range(len(coords))
+        sources = _parse_indexes(query.get("sources"), everything)
+        destinations = _parse_indexes(query.get("destinations"), everything)
+        distances = [
+            [round(self.server.distance_m(coords[s], coords[d]), 1) for d in destinations]
+            for s in sources
+        ]
+        return self._reply(200, {
+            "code": "Ok",
+            "distances": distances,
+            "sources": [{"location": list(coords[s])} for s in sources],
+            "destinations": [{"location": list(coords[d])} for d in destinations],
+        })
+
+    def _reply(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def start_fake_osrm(host: str = "127.0.0.1", port: int = 0, **kwargs) -> FakeOSRMServer:
+    """Запускает сервер в фоновом потоке; остановка — ``server.shutdown()``."""
+    server = FakeOSRMServer((host, port), **kwargs)
+    threading.Thread(target=server.serve_forever, name="fake-osrm", daemon=True).start()
+    return server
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Локальный фейковый OSRM")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--detour-factor", type=float, default=DEFAULT_DETOUR_FACTOR)
+    args = parser.parse_args(argv)
+
+    server = FakeOSRMServer(
+        (args.host, args.port),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        detour_factor=args.detour_factor,
+    )
+    print(f"Fake OSRM слушает {server.base_url} (задержка {args.latency_ms} мс)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""Сквозной бенчмарк расчёта /quote на синтетических каталогах и корзинах.
+
+Этапы:
+- ``pipeline`` — build_factory_scenarios_v2 + evaluate_scenario_transport по всем сценариям;
+- ``http`` — полный эндпоинт POST /api/quote через TestClient (валидация, роутинг, сериализация);
+- ``serialize`` — сериализация готовых ответов /quote: стандартный json против быстрого энкодера.
+
+Расстояния берутся из фейкового провайдера (haversine) или локального fake OSRM,
+поэтому результат не зависит от сети.
+
+Примеры:
+    python -m backend.bench --baskets 200 --save-baseline local
+    python -m backend.bench --baskets 200 --compare local --tolerance 0.15
+    python -m backend.bench --osrm fake --osrm-latency-ms 5
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import math
+import platform
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from backend.bench.workload import Workload, generate_workload
+from backend.core.distance import clear_distance_cache
+from backend.core.responses import dumps_json, dumps_std
+from backend.models.dto import QuoteRequest
+from backend.service import osrm_client
+from backend.service.distance_providers import HaversineDistanceProvider, OSRMDistanceProvider
+from backend.service.quote_records import OfferIndex
+from backend.service.scenario_builder import build_factory_scenarios_v2
+from backend.service.transport_calc import evaluate_scenario_transport
+
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+
+# Метрики, где меньше — лучше / больше — лучше
+_LOWER_IS_BETTER = ("p50_ms", "p95_ms", "p99_ms", "mean_ms")
+_HIGHER_IS_BETTER = ("scenarios_per_s",)
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Перцентиль с линейной интерполяцией по отсортированной выборке."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = math.floor(rank)
+    high = math.ceil(rank)
+    if low == high:
+        return sorted_values[low]
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(latencies_s: List[float], scenarios: int) -> Dict[str, float]:
+    values = sorted(latencies_s)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(total / len(values) * 1000, 3) if values else 0.0,
+        "scenarios": scenarios,
+        "scenarios_per_s": round(scenarios / total, 1) if total else 0.0,
+    }
+
+
+@contextlib.contextmanager
+def use_distance_provider(provider) -> Iterator[None]:
+    """Временно подменяет провайдер расстояний (кэш расстояний сбрасывается)."""
+    osrm_client.set_distance_provider(provider)
+    clear_distance_cache()
+    try:
+        yield
+    finally:
+        osrm_client.set_distance_provider(None)
+        clear_distance_cache()
+
+
+@contextlib.contextmanager
+def fake_osrm_provider(latency_ms: float = 0.0) -> Iterator[OSRMDistanceProvider]:
+    """Поднимает локальный fake OSRM и направляет на него OSRM_BASE_URL."""
+    from backend.bench.fake_osrm import start_fake_osrm
+
+    server = start_fake_osrm(latency_ms=latency_ms)
+    previous_url = osrm_client.OSRM_BASE_URL
+    osrm_client.OSRM_BASE_URL = server.base_url
+    try:
+        yield OSRMDistanceProvider()
+    finally:
+        osrm_client.OSRM_BASE_URL = previous_url
+        server.shutdown()
+        server.server_close()
+
+
+def run_pipeline_once(workload: Workload, payload: Dict[str, Any], products_list=None,
+                      index: Optional[OfferIndex] = None) -> int:
+    """Один расчёт без HTTP: сценарии + транспорт. Возвращает число сценариев."""
+    products_list = products_list if products_list is not None else workload.products_list
+    req = QuoteRequest(**payload)
+    items = [item.dict() for item in req.items]
+    scenarios = build_factory_scenarios_v2(products_list, items, index=index)
+    for sc in scenarios:
+        evaluate_scenario_transport(sc, req, workload.tariffs)
+    return len(scenarios)
+
+
+def bench_pipeline(workload: Workload) -> Dict[str, float]:
+    products_list = workload.products_list
+    # как в эндпоинте: индекс предложений строится один раз на версию каталога
+    index = OfferIndex(products_list)
+    latencies: List[float] = []
+    scenarios = 0
+    for payload in workload.baskets:
+        t0 = time.perf_counter()
+        scenarios += run_pipeline_once(workload, payload, products_list, index)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, scenarios)
+
+
+@contextlib.contextmanager
+def quote_http_client(workload: Workload) -> Iterator[Any]:
+    """TestClient полного приложения поверх временного storage с синтетическим каталогом."""
+    from fastapi.testclient import TestClient
+
+    from backend.app.main import app
+    from backend.core import data_loader
+
+    previous_storage = data_loader.STORAGE_PATH
+    with tempfile.TemporaryDirectory(prefix="bench-storage-") as tmp:
+        data_loader.set_storage_path(tmp)
+        try:
+            data_loader._save_factories(workload.products)
+            data_loader._save_tariffs(workload.tariffs)
+            # Без контекстного менеджера startup (пересборка из Google) не запускается
+            yield TestClient(app)
+        finally:
+            data_loader.set_storage_path(previous_storage)
+
+
+def bench_http(workload: Workload) -> Dict[str, float]:
+    latencies: List[float] = []
+    scenarios = 0
+    index = OfferIndex(workload.products_list)
+    with quote_http_client(workload) as client:
+        for payload in workload.baskets:
+            t0 = time.perf_counter()
+            response = client.post("/api/quote", json=payload)
+            latencies.append(time.perf_counter() - t0)
+            if response.status_code >= 500:
+                raise RuntimeError(f"/api/quote вернул {response.status_code}: {response.text[:200]}")
+        # Число сценариев считаем отдельно, чтобы не вмешиваться в ответ эндпоинта
+        for payload in workload.baskets:
+            req = QuoteRequest(**payload)
+            scenarios += len(build_factory_scenarios_v2([], [i.dict() for i in req.items], index=index))
+    return summarize(latencies, scenarios)
+
+
+def bench_serialization(workload: Workload, repeat: int = 20) -> Dict[str, float]:
+    """Время сериализации реальных ответов /quote: ``json`` против ``dumps_json``."""
+    with quote_http_client(workload) as client:
+        bodies = [client.post("/api/quote", json=payload).json() for payload in workload.baskets]
+
+    def timed(dumps) -> float:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for body in bodies:
+                dumps(body)
+        return (time.perf_counter() - t0) / (repeat * max(len(bodies), 1))
+
+    std_s, fast_s = timed(dumps_std), timed(dumps_json)
+    return {
+        "responses": len(bodies),
+        "mean_bytes": round(sum(len(dumps_std(b)) for b in bodies) / max(len(bodies), 1)),
+        "std_us": round(std_s * 1e6, 2),
+        "fast_us": round(fast_s * 1e6, 2),
+        "speedup": round(std_s / fast_s, 2) if fast_s else 0.0,
+    }
+
+
+def measure_peak_memory(workload: Workload, sample: int = 20) -> float:
+    """Пиковая аллокация Python (МБ) на расчёт самой тяжёлой из первых ``sample`` корзин."""
+    products_list = workload.products_list
+    peak = 0
+    tracemalloc.start()
+    try:
+        for payload in workload.baskets[:sample]:
+            tracemalloc.reset_peak()
+            run_pipeline_once(workload, payload, products_list)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 3)
+
+
+def run_benchmark(
+    workload: Workload,
+    stages: Sequence[str] = ("pipeline", "http"),
+    provider=None,
+    memory_sample: int = 20,
+) -> Dict[str, Any]:
+    provider = provider or HaversineDistanceProvider()
+    report: Dict[str, Any] = {
+        "config": {
+            "python": platform.python_version(),
+            "products": len(workload.products_list),
+            "tariffs": len(workload.tariffs),
+            "baskets": len(workload.baskets),
+            "provider": provider.name,
+        },
+    }
+    with use_distance_provider(provider):
+        # прогрев: импорты, ленивые кэши
+        if workload.baskets:
+            run_pipeline_once(workload, workload.baskets[0])
+        if "pipeline" in stages:
+            report["pipeline"] = bench_pipeline(workload)
+        if "http" in stages:
+            report["http"] = bench_http(workload)
+        if "serialize" in stages:
+            report["serialize"] = bench_serialization(workload)
+        if memory_sample:
+            report["peak_memory_mb"] = measure_peak_memory(workload, memory_sample)
+    return report
+
+
+# === БАЗОВЫЕ ЛИНИИ ===
+
+def save_baseline(report: Dict[str, Any], name: str, directory: Path = BASELINES_DIR) -> Path:
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def load_baseline(name: str, directory: Path = BASELINES_DIR) -> Dict[str, Any]:
+    return json.loads((directory / f"{name}.json").read_text(encoding="utf-8"))
+
+
+def compare_reports(
+    baseline: Dict[str, Any],
+    current: Dict[str, Any],
+    tolerance: float = 0.2,
+) -> List[Dict[str, Any]]:
+    """
+    Сравнивает метрики этапов. Регрессия — ухудшение больше чем на ``tolerance``
+    (доля: 0.2 = 20%). Возвращает строки сравнения с флагом ``regression``.
+    """
+    rows = []
+    for stage in ("pipeline", "http"):
+        old, new = baseline.get(stage), current.get(stage)
+        if not old or not new:
+            continue
+        for metric in _LOWER_IS_BETTER + _HIGHER_IS_BETTER:
+            before, after = old.get(metric), new.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = change > tolerance if metric in _LOWER_IS_BETTER else -change > tolerance
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": before,
+                "current": after,
+                "change_pct": round(change * 100, 1),
+                "regression": worse,
+            })
+
+    old_mem, new_mem = baseline.get("peak_memory_mb"), current.get("peak_memory_mb")
+    if old_mem and new_mem is not None:
+        change = (new_mem - old_mem) / old_mem
+        rows.append({
+            "stage": "memory",
+            "metric": "peak_memory_mb",
+            "baseline": old_mem,
+            "current": new_mem,
+            "change_pct": round(change * 100, 1),
+            "regression": change > tolerance,
+        })
+    return rows
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    cfg = report["config"]
+    print(
+        f"Каталог: {cfg['products']} предложений, {cfg['tariffs']} тарифов; "
+        f"корзин: {cfg['baskets']}; расстояния: {cfg['provider']}"
+    )
+    for stage in ("pipeline", "http"):
+        s = report.get(stage)
+        if not s:
+            continue
+        print(
+            f"{stage:>8}: p50 {s['p50_ms']:.2f} мс | p95 {s['p95_ms']:.2f} мс | "
+            f"p99 {s['p99_ms']:.2f} мс | {s['scenarios_per_s']:.0f} сценариев/с "
+            f"({s['scenarios']} всего)"
+        )
+    ser = report.get("serialize")
+    if ser:
+        print(
+            f"сериализация: json {ser['std_us']:.1f} мкс | быстрый {ser['fast_us']:.1f} мкс | "
+            f"×{ser['speedup']} (ответ ~{ser['mean_bytes']} байт)"
+        )
+    if "peak_memory_mb" in report:
+        print(f"  память: пик {report['peak_memory_mb']} МБ на корзину")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Бенчмарк расчёта /quote")
+    parser.add_argument("--factories", type=int, default=200)
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--subtypes", type=int, default=25)
+    parser.add_argument("--factories-per-category", type=int, default=8)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--baskets", type=int, default=50)
+    parser.add_argument("--max-items", type=int, default=10)
+    parser.add_argument("--max-combinations", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", default="pipeline,http,serialize", help="pipeline,http,serialize")
+    parser.add_argument("--osrm", choices=["haversine", "fake"], default="haversine",
+                        help="haversine — без сети; fake — локальный fake OSRM по HTTP")
+    parser.add_argument("--osrm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--memory-sample", type=int, default=20)
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--json", action="store_true", help="вывести полный отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    # Логи расчёта на каждый сценарий только мешают замерам
+    logging.getLogger().setLevel(logging.WARNING)
+
+    workload = generate_workload(
+        factories=args.factories,
+        categories=args.categories,
+        subtypes=args.subtypes,
+        factories_per_category=args.factories_per_category,
+        density=args.density,
+        baskets=args.baskets,
+        max_items=args.max_items,
+        max_combinations=args.max_combinations,
+        seed=args.seed,
+    )
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+
+    with contextlib.ExitStack() as stack:
+        provider = None
+        if args.osrm == "fake":
+            provider = stack.enter_context(fake_osrm_provider(args.osrm_latency_ms))
+        report = run_benchmark(workload, stages=stages, provider=provider,
+                               memory_sample=args.memory_sample)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+
+    if args.save_baseline:
+        print(f"Базовая линия сохранена: {save_baseline(report, args.save_baseline)}")
+
+    if args.compare:
+        rows = compare_reports(load_baseline(args.compare), report, args.tolerance)
+        regressions = [r for r in rows if r["regression"]]
+        for r in rows:
+            mark = "РЕГРЕССИЯ" if r["regression"] else "ok"
+            print(
+                f"  {r['stage']:>8}.{r['metric']:<16} {r['baseline']:>10} → {r['current']:>10} "
+                f"({r['change_pct']:+.1f}%) {mark}"
+            )
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,181 @@
+"""Воспроизведение записанного трафика /quote на текущем коде.
+
+Журнал пишет маршрут при заданном ``QUOTE_RECORD_FILE``
+(см. ``backend.service.traffic_recorder``). Каждый запрос считается заново
+через ``calculate_quote`` с расстояниями из журнала (``ReplayDistanceProvider``),
+без сети. Для каждого запроса выводится разница времени расчёта с записью и
+изменился ли топ-3 вариантов.
+
+Время в журнале — продовое, с OSRM и конкуренцией за CPU. Чтобы сравнить две
+версии кода на одной машине, сохраните отчёт (``--save``) и сравнивайте с ним
+(``--compare``).
+
+Примеры:
+    python -m backend.bench.replay storage/traffic.jsonl.gz
+    python -m backend.bench.replay traffic.jsonl --storage backend/storage --save before.json
+    python -m backend.bench.replay traffic.jsonl --compare before.json --repeat 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+from backend.bench.quote_bench import percentile, use_distance_provider
+from backend.core import data_loader
+from backend.core.catalog import get_catalog
+from backend.core.distance import clear_distance_cache
+from backend.models.dto import QuoteRequest
+from backend.service.distance_providers import PairKey, ReplayDistanceProvider, pair_key
+from backend.service.quote_service import calculate_quote
+from backend.service.traffic_recorder import data_version, read_records, top_signatures
+
+
+def replay_provider(records: Sequence[Dict[str, Any]]) -> ReplayDistanceProvider:
+    """Провайдер со всеми расстояниями журнала; ключ — завод и точка выгрузки записи."""
+    recordings: Dict[PairKey, float] = {}
+    for record in records:
+        dest_lon, dest_lat = record["request"]["upload_lon"], record["request"]["upload_lat"]
+        for lon, lat, km in record["distances"]:
+            recordings[pair_key(lon, lat, dest_lon, dest_lat)] = km
+    return ReplayDistanceProvider(recordings)
+
+
+def replay_record(record: Dict[str, Any], repeat: int = 1) -> Dict[str, Any]:
+    """Пересчитывает одну запись; время — лучшее из ``repeat`` прогонов с пустым кэшем расстояний."""
+    payload = dict(record["request"])
+    # расстояния сетки записаны как использованные — берём их из журнала, а не из таблицы
+    payload["distancePrecision"] = "exact"
+    req = QuoteRequest(**payload)
+
+    best_s = float("inf")
+    for _ in range(max(1, repeat)):
+        clear_distance_cache()
+        started = time.perf_counter()
+        status_code, content = calculate_quote(req, record.get("view", "full"))
+        best_s = min(best_s, time.perf_counter() - started)
+
+    top = top_signatures(content) if status_code == 200 else []
+    return {
+        "status": status_code,
+        "replay_ms": round(best_s * 1000.0, 3),
+        "top": top,
+        "status_changed": status_code != record["status"],
+        "top_changed": top != record["top"],
+    }
+
+
+def run_replay(records: Sequence[Dict[str, Any]], repeat: int = 1,
+               baseline: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Воспроизводит записи. Разница времени считается с ``baseline`` (прошлый
+    отчёт ``--save``), если он задан, иначе — с временем из журнала.
+    """
+    provider = replay_provider(records)
+    catalog_version = data_version(get_catalog())
+    reference = [row["replay_ms"] for row in baseline["requests"]] if baseline else None
+    if reference is not None and len(reference) != len(records):
+        raise ValueError(f"В базовом отчёте {len(reference)} запросов, в журнале {len(records)}")
+
+    rows: List[Dict[str, Any]] = []
+    with use_distance_provider(provider):
+        for i, record in enumerate(records):
+            row = replay_record(record, repeat)
+            before_ms = reference[i] if reference is not None else record["elapsed_ms"]
+            row.update({
+                "index": i,
+                "before_ms": before_ms,
+                "delta_ms": round(row["replay_ms"] - before_ms, 3),
+                "delta_pct": round((row["replay_ms"] / before_ms - 1.0) * 100.0, 1) if before_ms else 0.0,
+                "catalog_changed": record.get("catalog") != catalog_version,
+            })
+            rows.append(row)
+
+    before = sorted(r["before_ms"] for r in rows)
+    after = sorted(r["replay_ms"] for r in rows)
+    return {
+        "reference": "baseline" if baseline else "recorded",
+        "catalog": catalog_version,
+        "summary": {
+            "requests": len(rows),
+            "before_p50_ms": round(percentile(before, 50), 3),
+            "before_p95_ms": round(percentile(before, 95), 3),
+            "replay_p50_ms": round(percentile(after, 50), 3),
+            "replay_p95_ms": round(percentile(after, 95), 3),
+            "top_changed": sum(r["top_changed"] for r in rows),
+            "status_changed": sum(r["status_changed"] for r in rows),
+            "catalog_changed": sum(r["catalog_changed"] for r in rows),
+            # пары, которых не было в журнале (посчитаны по прямой)
+            "distance_misses": provider.misses,
+        },
+        "requests": rows,
+    }
+
+
+def _print_report(report: Dict[str, Any], show_all: bool) -> None:
+    summary = report["summary"]
+    label = "базовый отчёт" if report["reference"] == "baseline" else "журнал"
+    print(f"Запросов: {summary['requests']}, сравнение с: {label}")
+    print(f"  p50 {summary['before_p50_ms']} → {summary['replay_p50_ms']} мс, "
+          f"p95 {summary['before_p95_ms']} → {summary['replay_p95_ms']} мс")
+    for row in report["requests"]:
+        changed = row["top_changed"] or row["status_changed"]
+        if not (show_all or changed):
+            continue
+        mark = "ТОП-3 ИЗМЕНИЛСЯ" if changed else "ok"
+        print(f"  #{row['index']:<5} {row['before_ms']:>10} → {row['replay_ms']:>10} мс "
+              f"({row['delta_pct']:+.1f}%) {mark}")
+    print(f"Топ-3 изменился: {summary['top_changed']}, статус изменился: {summary['status_changed']}")
+    if summary["catalog_changed"]:
+        print(f"⚠️ {summary['catalog_changed']} записей сделаны на другой версии каталога ({report['catalog']} сейчас)")
+    if summary["distance_misses"]:
+        print(f"⚠️ {summary['distance_misses']} расстояний не было в журнале и оценены по прямой")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Воспроизведение записанного трафика /quote")
+    parser.add_argument("logs", nargs="+", help="журналы QUOTE_RECORD_FILE (.jsonl или .jsonl.gz)")
+    parser.add_argument("--storage", help="каталог с factories_products.json и tariffs.json")
+    parser.add_argument("--limit", type=int, help="воспроизвести только первые N записей")
+    parser.add_argument("--repeat", type=int, default=1, help="прогонов на запрос (берётся лучший)")
+    parser.add_argument("--save", metavar="PATH", help="сохранить отчёт для --compare")
+    parser.add_argument("--compare", metavar="PATH", help="сравнить время с сохранённым отчётом")
+    parser.add_argument("--all", action="store_true", help="выводить все запросы, а не только изменившиеся")
+    parser.add_argument("--json", action="store_true", help="вывести полный отчёт в JSON")
+    args = parser.parse_args(argv)
+
+    # Логи расчёта на каждый сценарий только мешают замерам
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.storage:
+        data_loader.set_storage_path(args.storage)
+    records = list(read_records(args.logs))
+    if args.limit:
+        records = records[: args.limit]
+    if not records:
+        print("Журнал пуст")
+        return 1
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    report = run_replay(records, repeat=args.repeat, baseline=baseline)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report, args.all)
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчёт сохранён: {args.save}")
+
+    return 1 if report["summary"]["top_changed"] or report["summary"]["status_changed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
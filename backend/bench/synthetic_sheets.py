@@ -0,0 +1,255 @@
+"""Генератор синтетических таблиц в формате Google Sheets для бенчмарков ингеста.
+
+Пример:
+    python -m backend.bench.synthetic_sheets --factories 3000 --subtypes 40 \
+        --out /tmp/sheets --measure
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from backend.service.factories_parser import (
+    LocalSheetSource,
+    LocalWorksheet,
+    SheetSource,
+    parse_google_sheet,
+    sheet_title_to_filename,
+)
+from backend.service.quote_records import OfferIndex
+
+Workbook = Dict[str, List[List[str]]]
+
+# Центр и разброс координат заводов — Москва и область
+_CENTER_LAT = 55.75
+_CENTER_LON = 37.62
+_SPREAD_DEG = 1.5
+
+# (название, грузоподъёмность, тег, весовое условие, ставка per_km)
+_VEHICLES = [
+    ("Манипулятор NEXT", 10, "manipulator", "any", 200),
+    ("Длинномер MAN TSG", 40, "long_haul", "≤20", 200),
+    ("Длинномер MAN TSG", 40, "long_haul", ">20", 230),
+    ("Длинномер DAF", 55, "long_haul", "≤20", 200),
+    ("Длинномер DAF", 55, "long_haul", ">20", 230),
+    ("Манипулятор SPECIAL", 40, "special", "any", 215),
+]
+_DISTANCE_STEPS = [(0, 30), (30, 60), (60, 80), (80, 100), (100, 120), (120, 120)]
+
+
+def _fmt(value: float) -> str:
+    # В живой таблице дробная часть пишется через запятую
+    return f"{value:g}".replace(".", ",")
+
+
+def generate_vehicles_sheet(rng: random.Random) -> List[List[str]]:
+    """Лист Vehicles: заголовок + ступени тарифов по дистанции."""
+    rows = [[
+        "Название", "Грузоподъёмность", "Тег", "Вес", "Мин", "Макс",
+        "База", "За км", "Описание", "Заметки",
+    ]]
+    for name, capacity, tag, weight_if, per_km in _VEHICLES:
+        base = rng.randrange(15000, 24000, 1000)
+        for min_d, max_d in _DISTANCE_STEPS:
+            is_tail = min_d == max_d
+            rows.append([
+                name,
+                _fmt(capacity),
+                tag,
+                weight_if,
+                _fmt(min_d),
+                _fmt(max_d),
+                _fmt(base),
+                _fmt(per_km if is_tail else 0),
+                f"{min_d}–{max_d} км / {name}",
+                "синтетика",
+            ])
+            if not is_tail:
+                base += 2000
+    return rows
+
+
+def generate_category_sheet(
+    rng: random.Random,
+    category: str,
+    factories: List[Dict[str, object]],
+    subtypes: int,
+    density: float,
+) -> List[List[str]]:
+    """
+    Лист категории в раскладке живой таблицы:
+    строки 0–2 — вес / special_threshold / max_per_trip по колонкам,
+    строка 3 — заголовок с подтипами, дальше — заводы и цены.
+    """
+    weights_row = ["Вес, т", "", ""]
+    special_row = ["Порог", "", ""]
+    max_row = ["Макс. в рейс", "", ""]
+    header_row = ["Завод", "Контакт", "Координаты"]
+
+    for i in range(subtypes):
+        weight = round(rng.uniform(0.5, 4.0), 2)
+        weights_row.append(_fmt(weight))
+        special_row.append(_fmt(rng.choice([0, 10, 15, 20])))
+        max_row.append(_fmt(max(1, int(25 / weight))))
+        header_row.append(f"{category} тип {i + 1}")
+
+    rows = [weights_row, special_row, max_row, header_row]
+    for factory in factories:
+        row = [
+            str(factory["name"]),
+            str(factory["contact"]),
+            f"{factory['lat']:.6f}, {factory['lon']:.6f}",
+        ]
+        for _ in range(subtypes):
+            if rng.random() < density:
+                row.append(str(rng.randrange(2000, 30000, 100)))
+            else:
+                row.append("")
+        rows.append(row)
+    return rows
+
+
+def generate_workbook(
+    factories: int = 1000,
+    categories: int = 4,
+    subtypes: int = 25,
+    density: float = 0.5,
+    factories_per_category: Optional[int] = None,
+    seed: int = 0,
+) -> Workbook:
+    """
+    Собирает синтетическую книгу {название листа: строки}.
+
+    ``factories`` — общий пул заводов, ``factories_per_category`` — сколько из
+    них попадает на каждый лист (по умолчанию все), ``subtypes`` — колонок
+    подтипов на лист, ``density`` — доля заполненных цен.
+    """
+    rng = random.Random(seed)
+    pool = [
+        {
+            "name": f"Завод {i + 1:05d}",
+            "contact": f"7 900 {rng.randrange(100, 999)}-{rng.randrange(10, 99)}-{rng.randrange(10, 99)}",
+            "lat": _CENTER_LAT + rng.uniform(-_SPREAD_DEG, _SPREAD_DEG),
+            "lon": _CENTER_LON + rng.uniform(-_SPREAD_DEG, _SPREAD_DEG) * 1.7,
+        }
+        for i in range(factories)
+    ]
+    per_category = min(factories_per_category or factories, factories)
+
+    workbook: Workbook = {}
+    for c in range(categories):
+        category = f"Категория {c + 1}"
+        members = rng.sample(pool, per_category)
+        workbook[category] = generate_category_sheet(rng, category, members, subtypes, density)
+    workbook["Vehicles"] = generate_vehicles_sheet(rng)
+    return workbook
+
+
+def write_csv_workbook(workbook: Workbook, path) -> Path:
+    """Записывает книгу каталогом CSV-файлов, понятным ``LocalSheetSource``."""
+    out = Path(path)
+    out.mkdir(parents=True, exist_ok=True)
+    for title, rows in workbook.items():
+        with open(out / sheet_title_to_filename(title), "w", encoding="utf-8", newline="") as f:
+            csv.writer(f).writerows(rows)
+    return out
+
+
+def write_xlsx_workbook(workbook: Workbook, path) -> Path:
+    """Записывает книгу в .xlsx (нужен ``openpyxl``)."""
+    import openpyxl
+
+    wb = openpyxl.Workbook(write_only=True)
+    for title, rows in workbook.items():
+        # Excel не допускает «/» в названиях листов
+        ws = wb.create_sheet(title.replace("/", "-")[:31])
+        for row in rows:
+            ws.append(row)
+    out = Path(path)
+    wb.save(out)
+    return out
+
+
+class InMemorySheetSource(SheetSource):
+    """SheetSource поверх уже сгенерированной книги (без записи на диск)."""
+
+    def __init__(self, workbook: Workbook):
+        self.workbook = workbook
+
+    def worksheets(self):
+        return [LocalWorksheet(title, rows) for title, rows in self.workbook.items()]
+
+
+def measure_ingest(path) -> Dict[str, float]:
+    """
+    Замеряет этапы ингеста локальной таблицы: чтение листов, парсинг,
+    сериализацию в storage-формат (как при reload) и построение индекса каталога.
+    """
+    source = LocalSheetSource(path)
+
+    t0 = time.perf_counter()
+    worksheets = source.worksheets()
+    t1 = time.perf_counter()
+
+    result = parse_google_sheet(source=InMemorySheetSource(
+        {ws.title: ws.get_all_values() for ws in worksheets}
+    ))
+    t2 = time.perf_counter()
+
+    json.dumps(result["products"], ensure_ascii=False, indent=2)
+    json.dumps(result["tariffs"], ensure_ascii=False, indent=2)
+    t3 = time.perf_counter()
+
+    products = [p for items in result["products"].values() for p in items]
+    index = OfferIndex(products)
+    t4 = time.perf_counter()
+
+    return {
+        "sheets": len(worksheets),
+        "products": len(products),
+        "catalog_keys": len(index.by_key),
+        "tariffs": len(result["tariffs"]),
+        "read_s": round(t1 - t0, 4),
+        "parse_s": round(t2 - t1, 4),
+        "serialize_s": round(t3 - t2, 4),
+        "index_s": round(t4 - t3, 4),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="каталог для CSV или путь к .xlsx")
+    parser.add_argument("--factories", type=int, default=1000)
+    parser.add_argument("--factories-per-category", type=int, default=None)
+    parser.add_argument("--categories", type=int, default=4)
+    parser.add_argument("--subtypes", type=int, default=25)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--measure", action="store_true", help="замерить ингест после генерации")
+    args = parser.parse_args(argv)
+
+    workbook = generate_workbook(
+        factories=args.factories,
+        categories=args.categories,
+        subtypes=args.subtypes,
+        density=args.density,
+        factories_per_category=args.factories_per_category,
+        seed=args.seed,
+    )
+    if args.out.lower().endswith(".xlsx"):
+        out = write_xlsx_workbook(workbook, args.out)
+    else:
+        out = write_csv_workbook(workbook, args.out)
+    print(f"Таблица записана: {out}")
+
+    if args.measure:
+        print(json.dumps(measure_ingest(out), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Синтетическая нагрузка для бенчмарков расчёта: каталог, тарифы и корзины."""
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from backend.bench.synthetic_sheets import InMemorySheetSource, generate_workbook
+from backend.service.factories_parser import parse_google_sheet
+from backend.service.quote_records import OfferIndex
+
+# Точки выгрузки — Москва и ближняя область
+_DEST_LAT = (55.3, 56.1)
+_DEST_LON = (36.9, 38.4)
+
+
+@dataclass
+class Workload:
+    products: Dict[str, List[Dict[str, Any]]]  # формат factories_products.json
+    tariffs: List[Dict[str, Any]]
+    baskets: List[Dict[str, Any]]  # тела запросов /api/quote
+
+    @property
+    def products_list(self) -> List[Dict[str, Any]]:
+        return [p for items in self.products.values() for p in items]
+
+
+def generate_catalog(
+    factories: int = 200,
+    categories: int = 4,
+    subtypes: int = 25,
+    factories_per_category: int = 8,
+    density: float = 0.5,
+    seed: int = 0,
+):
+    """
+    Каталог через настоящий парсер таблицы. Значения по умолчанию близки к
+    живым данным: ~4 завода-поставщика на подтип.
+    Возвращает (products по категориям, tariffs).
+    """
+    workbook = generate_workbook(
+        factories=factories,
+        categories=categories,
+        subtypes=subtypes,
+        density=density,
+        factories_per_category=factories_per_category,
+        seed=seed,
+    )
+    parsed = parse_google_sheet(source=InMemorySheetSource(workbook))
+    return parsed["products"], parsed["tariffs"]
+
+
+def generate_baskets(
+    products: Dict[str, List[Dict[str, Any]]],
+    count: int = 50,
+    min_items: int = 1,
+    max_items: int = 10,
+    max_combinations: int = 1000,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Случайные корзины 1–10 позиций со случайной точкой выгрузки.
+
+    ``max_combinations`` ограничивает произведение числа поставщиков по позициям,
+    чтобы одна корзина не превращалась в полный перебор на миллионы сценариев.
+    """
+    rng = random.Random(seed)
+    # поставщики считаются так же, как их перебирает build_factory_scenarios_v2
+    index = OfferIndex([p for items in products.values() for p in items])
+    suppliers = {key: len(index.cheapest_per_factory(*key)) for key in index.by_key}
+    keys = sorted(suppliers)
+    if not keys:
+        return []
+
+    baskets = []
+    for _ in range(count):
+        wanted = rng.randint(min_items, max_items)
+        chosen: List[tuple] = []
+        combinations = 1
+        for key in rng.sample(keys, min(wanted, len(keys))):
+            if combinations * suppliers[key] > max_combinations:
+                continue
+            combinations *= suppliers[key]
+            chosen.append(key)
+
+        baskets.append({
+            "upload_lat": round(rng.uniform(*_DEST_LAT), 6),
+            "upload_lon": round(rng.uniform(*_DEST_LON), 6),
+            "transport_type": rng.choice(["auto", "auto", "long_haul", "manipulator"]),
+            "addManipulator": rng.random() < 0.2,
+            "items": [
+                {"category": cat, "subtype": sub, "quantity": rng.randint(1, 40)}
+                for cat, sub in chosen
+            ],
+        })
+    return baskets
+
+
+def generate_workload(
+    factories: int = 200,
+    categories: int = 4,
+    subtypes: int = 25,
+    factories_per_category: int = 8,
+    density: float = 0.5,
+    baskets: int = 50,
+    max_items: int = 10,
+    max_combinations: int = 1000,
+    seed: int = 0,
+) -> Workload:
+    products, tariffs = generate_catalog(
+        factories=factories,
+        categories=categories,
+        subtypes=subtypes,
+        factories_per_category=factories_per_category,
+        density=density,
+        seed=seed,
+    )
+    return Workload(
+        products=products,
+        tariffs=tariffs,
+        baskets=generate_baskets(
+            products,
+            count=baskets,
+            max_items=max_items,
+            max_combinations=max_combinations,
+            seed=seed,
+        ),
+    )
@@ -0,0 +1,222 @@
+"""Допуск расчётов /quote по оценке их стоимости.
+
+Перед расчётом оценивается объём работы: число комбинаций заводов (произведение
+числа поставщиков по позициям, как в ``build_factory_scenarios_v2``) на число
+машин, которое потребует общий тоннаж. Оценка переводится в «вес» — сколько
+слотов из общего пула ``QUOTE_ADMISSION_SLOTS`` займёт расчёт.
+
+Лёгкие расчёты (вес 1) занимают любой свободный слот. Тяжёлые вместе могут
+держать не больше ``QUOTE_HEAVY_SHARE`` пула, поэтому всплеск больших заказов
+не вытесняет интерактивные. Кто не дождался слота за ``QUOTE_ADMISSION_WAIT_S``,
+получает 503 с ``Retry-After``.
+"""
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, Optional
+
+from backend.core.metrics import QUOTE_ADMISSION, QUOTE_SLOTS_IN_USE
+
+# Размер пула слотов на процесс (0 — допуск выключен)
+QUOTE_ADMISSION_SLOTS = int(os.getenv("QUOTE_ADMISSION_SLOTS", "16"))
+# Сколько единиц работы (комбинация × машина) приходится на один слот
+QUOTE_SLOT_WORK = float(os.getenv("QUOTE_SLOT_WORK", "2000"))
+# Доля пула, которую могут одновременно занять тяжёлые расчёты (вес > 1)
+QUOTE_HEAVY_SHARE = float(os.getenv("QUOTE_HEAVY_SHARE", "0.5"))
+# Сколько секунд расчёт может ждать слот, прежде чем получить 503
+QUOTE_ADMISSION_WAIT_S = float(os.getenv("QUOTE_ADMISSION_WAIT_S", "1.0"))
+# Тоннаж одной машины для оценки числа рейсов
+_TRUCK_TONS = 20.0
+
+
+def estimate_quote_work(index, items: Iterable[Dict[str, Any]]) -> float:
+    """
+    Оценка работы расчёта: комбинации заводов × машины на весь тоннаж.
+    ``index`` — ``OfferIndex`` текущего снимка каталога; позиции без поставщиков
+    дают 0 (такой расчёт сразу закончится ошибкой 400).
+    """
+    combinations = 1
+    tonnage = 0.0
+    for item in items:
+        offers = index.cheapest_per_factory(item.get("category"), item.get("subtype"))
+        if not offers:
+            return 0.0
+        combinations *= len(offers)
+        tonnage += (offers[0].weight_per_item or 0.0) * (item.get("quantity") or 0)
+    return float(combinations) * max(1.0, math.ceil(tonnage / _TRUCK_TONS))
+
+
+class AdmissionRejected(Exception):
+    """Расчёт не допущен; ``retry_after`` — через сколько секунд стоит повторить."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Сервер перегружен, повторите через {retry_after} с")
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("weight", "future", "loop")
+
+    def __init__(self, weight: int, future: asyncio.Future, loop: asyncio.AbstractEventLoop):
+        self.weight = weight
+        self.future = future
+        self.loop = loop
+
+
+class AdmissionController:
+    """
+    Пул взвешенных слотов. Состояние под ``threading.Lock``, ожидающие —
+    ``asyncio.Future`` своего event loop (тестовые клиенты могут жить в разных).
+    """
+
+    def __init__(self, slots: int, slot_work: float = QUOTE_SLOT_WORK,
+                 heavy_share: float = QUOTE_HEAVY_SHARE, wait_s: float = QUOTE_ADMISSION_WAIT_S):
+        self.slots = slots
+        self.slot_work = slot_work
+        self.heavy_limit = max(1, int(slots * heavy_share))
+        self.wait_s = wait_s
+        self._lock = threading.Lock()
+        self._waiters: Deque[_Waiter] = deque()
+        self.in_use = 0
+        self.heavy_in_use = 0
+        # сглаженное время удержания одного слота — для Retry-After
+        self._slot_seconds = 0.5
+
+    @property
+    def enabled(self) -> bool:
+        return self.slots > 0
+
+    def weight_for(self, work: float) -> int:
+        """Число слотов на расчёт; тяжёлые упираются в долю пула для тяжёлых."""
+        weight = max(1, math.ceil(work / self.slot_work)) if self.slot_work > 0 else 1
+        return min(weight, self.heavy_limit) if weight > 1 else 1
+
+    def _fits(self, weight: int) -> bool:
+        if self.in_use + weight > self.slots:
+            return False
+        return weight == 1 or self.heavy_in_use + weight <= self.heavy_limit
+
+    def _take(self, weight: int) -> None:
+        self.in_use += weight
+        if weight > 1:
+            self.heavy_in_use += weight
+        QUOTE_SLOTS_IN_USE.set(self.in_use)
+
+    def retry_after(self) -> int:
+        queued = sum(w.weight for w in self._waiters)
+        return max(1, math.ceil(self._slot_seconds * (self.in_use + queued) / max(self.slots, 1)))
+
+    async def acquire(self, weight: int) -> None:
+        """Занимает ``weight`` слотов или бросает ``AdmissionRejected``."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # тяжёлые не обгоняют очередь; лёгкий проходит сразу, если есть слот
+            if self._fits(weight) and (weight == 1 or not self._waiters):
+                self._take(weight)
+                QUOTE_ADMISSION.labels(result="admitted").inc()
+                return
+            if self.wait_s <= 0:
+                QUOTE_ADMISSION.labels(result="shed").inc()
+                raise AdmissionRejected(self.retry_after())
+            waiter = _Waiter(weight, loop.create_future(), loop)
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.wait_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            with self._lock:
+                # выданный слот мог ещё не дойти до future (call_soon_threadsafe)
+                granted = waiter not in self._waiters
+                if not granted:
+                    self._waiters.remove(waiter)
+                    retry_after = self.retry_after()
+            if granted:
+                # слот выдан в момент тайм-аута — возвращаем его
+                self.release(weight, 0.0)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            QUOTE_ADMISSION.labels(result="shed").inc()
+            raise AdmissionRejected(retry_after if not granted else 1) from None
+        QUOTE_ADMISSION.labels(result="queued").inc()
+
+    def release(self, weight: int, held_s: float) -> None:
+        with self._lock:
+            self.in_use -= weight
+            if weight > 1:
+                self.heavy_in_use -= weight
+            if held_s > 0:
+                self._slot_seconds = 0.9 * self._slot_seconds + 0.1 * held_s
+            self._wake()
+            QUOTE_SLOTS_IN_USE.set(self.in_use)
+
+    def _wake(self) -> None:
+        """Выдаёт слоты ожидающим по порядку; лёгкий может пройти мимо тяжёлого, не влезающего в долю."""
+        for waiter in list(self._waiters):
+            if self.in_use >= self.slots:
+                break
+            if not self._fits(waiter.weight):
+                continue
+            self._waiters.remove(waiter)
+            self._take(waiter.weight)
+            waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "slots": self.slots,
+                "in_use": self.in_use,
+                "heavy_in_use": self.heavy_in_use,
+                "heavy_limit": self.heavy_limit,
+                "waiting": len(self._waiters),
+                "slot_seconds": round(self._slot_seconds, 3),
+            }
+
+
+def _grant(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class admitted:
+    """``async with admitted(controller, work):`` — слоты на время расчёта."""
+
+    def __init__(self, controller: Optional[AdmissionController], work: float):
+        self.controller = controller if controller is not None and controller.enabled else None
+        self.weight = controller.weight_for(work) if self.controller else 0
+        self._started = 0.0
+
+    async def __aenter__(self):
+        if self.controller:
+            await self.controller.acquire(self.weight)
+            self._started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.controller:
+            held = (time.perf_counter() - self._started) / self.weight
+            self.controller.release(self.weight, held)
+        return False
+
+
+_controller = AdmissionController(QUOTE_ADMISSION_SLOTS)
+
+
+def get_admission() -> AdmissionController:
+    return _controller
+
+
+def set_admission(controller: AdmissionController) -> None:
+    """Подмена пула (тесты, бенчмарки)."""
+    global _controller
+    _controller = controller
+
+
+def _reset_after_fork() -> None:
+    # воркер начинает с пустым пулом: занятые слоты мастера к нему не относятся
+    set_admission(AdmissionController(QUOTE_ADMISSION_SLOTS))
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
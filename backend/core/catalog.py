@@ -0,0 +1,171 @@
+"""Снимок каталога (товары, заводы, тарифы) в памяти процесса.
+
+Файлы storage перечитываются только когда меняется их подпись (mtime + размер),
+то есть после перезагрузки из Google Sheets. Для справочных эндпоинтов ответы
+рендерятся один раз на версию данных: готовые байты JSON плюс gzip/brotli
+варианты и ETag, так что повторный GET почти не тратит CPU.
+"""
+import gzip
+import hashlib
+import os
+import signal
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+
+from backend.core import data_loader
+from backend.core.logger import get_logger
+from backend.core.responses import dumps_json
+
+try:  # brotli необязателен: без него отдаём gzip
+    import brotli
+except ImportError:  # pragma: no cover — зависит от окружения
+    brotli = None
+
+log = get_logger("catalog")
+
+# Сколько секунд браузер может не перепроверять справочники (0 — всегда через ETag)
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "0"))
+# Меньше этого размера сжатие не окупается
+_COMPRESS_MIN_BYTES = 512
+
+
+class RenderedResponse:
+    """Готовое тело ответа во всех кодировках и его ETag."""
+
+    __slots__ = ("body", "gzip", "br", "etag")
+
+    def __init__(self, payload: Any):
+        self.body = dumps_json(payload)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        compress = len(self.body) >= _COMPRESS_MIN_BYTES
+        self.gzip = gzip.compress(self.body, compresslevel=9, mtime=0) if compress else None
+        self.br = brotli.compress(self.body) if compress and brotli is not None else None
+
+
+class CatalogSnapshot:
+    def __init__(self, signature: Tuple, factories_products: Any, tariffs: Any):
+        self.signature = signature
+        self.version = hashlib.sha1(repr(signature).encode("utf-8")).hexdigest()[:12]
+        self.factories_products = factories_products
+        self.tariffs = tariffs
+        self._memo: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def memo(self, name: str, build: Callable[["CatalogSnapshot"], Any]) -> Any:
+        """Производные данные ``name`` (индексы, ответы) для этой версии; строятся один раз."""
+        cached = self._memo.get(name)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._memo.get(name)
+            if cached is None:
+                cached = self._memo[name] = build(self)
+            return cached
+
+    def rendered(self, name: str, build: Callable[["CatalogSnapshot"], Any]) -> RenderedResponse:
+        """Ответ ``name`` для этой версии данных; строится при первом обращении."""
+        return self.memo("render:" + name, lambda snap: RenderedResponse(build(snap)))
+
+
+_snapshot: Optional[CatalogSnapshot] = None
+_snapshot_lock = threading.Lock()
+
+
+def _file_signature(path: str) -> Tuple:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None, None)
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _current_signature() -> Tuple:
+    return (_file_signature(data_loader.FACTORIES_FILE), _file_signature(data_loader.TARIFFS_FILE))
+
+
+def get_catalog() -> CatalogSnapshot:
+    """Актуальный снимок каталога; файлы читаются заново только после их изменения."""
+    global _snapshot
+    signature = _current_signature()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.signature == signature:
+        return snapshot
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.signature != signature:
+            factories_products, tariffs = data_loader.load_factories_and_tariffs()
+            _snapshot = CatalogSnapshot(signature, factories_products, tariffs)
+            log.info("Каталог загружен, версия %s", _snapshot.version)
+        return _snapshot
+
+
+def invalidate_catalog() -> None:
+    """Сбрасывает снимок (следующее обращение перечитает файлы)."""
+    global _snapshot
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def broadcast_reload() -> None:
+    """
+    Сбрасывает снимок после перезагрузки данных. Под ``backend.app.serve``
+    вдобавок просит мастер-процесс (SIGHUP) загрузить новый снимок один раз
+    и перезапустить всех воркеров с ним.
+    """
+    invalidate_catalog()
+    master_pid = int(os.getenv("SERVE_MASTER_PID") or 0)
+    if master_pid and master_pid != os.getpid():
+        try:
+            os.kill(master_pid, signal.SIGHUP)
+        except OSError as exc:
+            log.warning("Не удалось уведомить мастер-процесс %s: %s", master_pid, exc)
+
+
+def _reset_after_fork() -> None:
+    global _snapshot_lock
+    _snapshot_lock = threading.Lock()
+    if _snapshot is not None:
+        _snapshot._lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _pick_encoding(accept_encoding: str, rendered: RenderedResponse) -> Tuple[Optional[str], bytes]:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if rendered.br is not None and "br" in accepted:
+        return "br", rendered.br
+    if rendered.gzip is not None and "gzip" in accepted:
+        return "gzip", rendered.gzip
+    return None, rendered.body
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return etag in tags
+
+
+def catalog_response(request: Request, name: str, build: Callable[[CatalogSnapshot], Any]) -> Response:
+    """
+    Отдаёт заранее отрендеренный справочник с ETag/Cache-Control:
+    304 при совпадении If-None-Match, иначе готовые байты в лучшей
+    поддерживаемой клиентом кодировке.
+    """
+    rendered = get_catalog().rendered(name, build)
+    headers = {
+        "ETag": rendered.etag,
+        "Cache-Control": f"public, max-age={CATALOG_CACHE_MAX_AGE}, must-revalidate",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, rendered.etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding, body = _pick_encoding(request.headers.get("accept-encoding", ""), rendered)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
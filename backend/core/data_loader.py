@@ -1,26 +1,79 @@
 import os
 import json
 from backend.core.logger import get_logger
+from backend.core.metrics import track_reload
 from backend.service.factories_parser import parse_google_sheet
+from backend.service.osrm_client import (
+    OSRM_SNAP_HINTS,
+    get_distance_provider,
+    register_hints,
+    resolve_snap_hints,
+)
 
 __all__ = [
     "load_factories_from_google",
     "load_tariffs_from_google",
     "rebuild_factories_and_tariffs_from_google",
     "load_factories_and_tariffs",
+    "set_storage_path",
 ]
 
 log = get_logger("data_loader")
 
-# Папка и имена файлов в storage
-STORAGE_PATH = os.path.join("backend", "storage")
+# Папка и имена файлов в storage (STORAGE_PATH можно переопределить из окружения)
+STORAGE_PATH = os.getenv("STORAGE_PATH", os.path.join("backend", "storage"))
 FACTORIES_FILE = os.path.join(STORAGE_PATH, "factories_products.json")
 TARIFFS_FILE = os.path.join(STORAGE_PATH, "tariffs.json")
 
+
+def set_storage_path(path: str) -> None:
+    """Переключает каталог storage на лету (бенчмарки, тесты)."""
+    global STORAGE_PATH, FACTORIES_FILE, TARIFFS_FILE
+    STORAGE_PATH = path
+    FACTORIES_FILE = os.path.join(STORAGE_PATH, "factories_products.json")
+    TARIFFS_FILE = os.path.join(STORAGE_PATH, "tariffs.json")
+
 def _ensure_storage_dir() -> None:
     os.makedirs(STORAGE_PATH, exist_ok=True)
 
 
+def _iter_factories(factories_products: dict):
+    """Словари ``factory`` с координатами из всех товаров каталога."""
+    if not isinstance(factories_products, dict):
+        return
+    for items in factories_products.values():
+        if not isinstance(items, list):
+            continue
+        for product in items:
+            factory = product.get("factory") if isinstance(product, dict) else None
+            if isinstance(factory, dict) and factory.get("lat") is not None and factory.get("lon") is not None:
+                yield factory
+
+
+def _attach_snap_hints(factories_products: dict) -> None:
+    """
+    Привязывает каждый завод к дорожному графу OSRM (``/nearest``) один раз
+    при загрузке и сохраняет результат в поле ``osrm_hint``. Включается
+    ``OSRM_SNAP_HINTS=1``; запросы идут параллельно (``OSRM_SNAP_HINTS_CONCURRENCY``).
+    """
+    if not OSRM_SNAP_HINTS or getattr(get_distance_provider(), "name", None) != "osrm":
+        return
+    factories = list(_iter_factories(factories_products))
+    hints = resolve_snap_hints((f["lon"], f["lat"]) for f in factories)
+    for factory in factories:
+        hint = hints.get((factory["lon"], factory["lat"]))
+        if hint:
+            factory["osrm_hint"] = hint
+    register_hints(hints)
+    log.info("📍 Привязка к OSRM: %s из %s точек", len(hints), len({(f["lon"], f["lat"]) for f in factories}))
+
+
+def _register_snap_hints(factories_products: dict) -> None:
+    register_hints({
+        (f["lon"], f["lat"]): f["osrm_hint"] for f in _iter_factories(factories_products) if f.get("osrm_hint")
+    })
+
+
 def _save_factories(factories_products: dict) -> None:
     _ensure_storage_dir()
     with open(FACTORIES_FILE, "w", encoding="utf-8") as f:
@@ -33,12 +86,14 @@ def _save_tariffs(tariffs: list) -> None:
         json.dump(tariffs, f, ensure_ascii=False, indent=2)
 
 
-def load_factories_from_google():
+def load_factories_from_google(source=None):
     """Загружает товары+заводы из Google Sheets и сохраняет их в storage."""
-    result = parse_google_sheet()
-    factories_products = result.get("products", {})
+    with track_reload("factories"):
+        result = parse_google_sheet(source=source)
+        factories_products = result.get("products", {})
+        _attach_snap_hints(factories_products)
 
-    _save_factories(factories_products)
+        _save_factories(factories_products)
     log.info(
         "✅ Обновлены factories_products.json из Google Sheets (%s записей)",
         len(factories_products),
@@ -47,23 +102,25 @@ def load_factories_from_google():
     return factories_products
 
 
-def load_tariffs_from_google():
+def load_tariffs_from_google(source=None):
     """Загружает тарифы из Google Sheets и сохраняет их в storage."""
-    result = parse_google_sheet()
-    tariffs = result.get("tariffs", [])
+    with track_reload("tariffs"):
+        result = parse_google_sheet(source=source)
+        tariffs = result.get("tariffs", [])
 
-    _save_tariffs(tariffs)
+        _save_tariffs(tariffs)
     log.info("✅ Обновлены tariffs.json из Google Sheets (%s тарифов)", len(tariffs))
 
     return tariffs
 
 
 
-def rebuild_factories_and_tariffs_from_google(google_sheet_id: str) -> None:
+def rebuild_factories_and_tariffs_from_google(google_sheet_id: str, source=None) -> None:
     """
     Пересоздаёт factories_products.json и tariffs.json из Google Sheets.
     google_sheet_id сюда пробрасываем только для логов — фактически
     вся логика подключения и чтения сидит внутри factories_parser.parse_google_sheet().
+    ``source`` позволяет подставить другой SheetSource (например, локальные CSV).
     """
     try:
         log.info(
@@ -71,22 +128,24 @@ def rebuild_factories_and_tariffs_from_google(google_sheet_id: str) -> None:
             f"(GOOGLE_SHEET_ID={google_sheet_id})"
         )
 
-        # Парсим таблицу. Функция САМА сохраняет factories_products.json и tariffs.json,
-        # и возвращает структуру {"products": parsed_products, "tariffs": parsed_tariffs}
-        result = parse_google_sheet()
-        factories_products = result.get("products", {})
-        tariffs = result.get("tariffs", [])
+        with track_reload("all"):
+            # Парсим таблицу. Функция САМА сохраняет factories_products.json и tariffs.json,
+            # и возвращает структуру {"products": parsed_products, "tariffs": parsed_tariffs}
+            result = parse_google_sheet(source=source)
+            factories_products = result.get("products", {})
+            tariffs = result.get("tariffs", [])
+            _attach_snap_hints(factories_products)
 
-        # На всякий случай создаём папку storage (если вдруг её нет)
-        os.makedirs(STORAGE_PATH, exist_ok=True)
+            # На всякий случай создаём папку storage (если вдруг её нет)
+            os.makedirs(STORAGE_PATH, exist_ok=True)
 
-        # Дополнительно дублируем сохранение, чтобы быть уверенными,
-        # что файлы лежат именно там, где ждут остальные части бэка.
-        with open(FACTORIES_FILE, "w", encoding="utf-8") as f:
-            json.dump(factories_products, f, ensure_ascii=False, indent=2)
+            # Дополнительно дублируем сохранение, чтобы быть уверенными,
+            # что файлы лежат именно там, где ждут остальные части бэка.
+            with open(FACTORIES_FILE, "w", encoding="utf-8") as f:
+                json.dump(factories_products, f, ensure_ascii=False, indent=2)
 
-        with open(TARIFFS_FILE, "w", encoding="utf-8") as f:
-            json.dump(tariffs, f, ensure_ascii=False, indent=2)
+            with open(TARIFFS_FILE, "w", encoding="utf-8") as f:
+                json.dump(tariffs, f, ensure_ascii=False, indent=2)
 
         log.info(
             f"✅ Успешно обновлены данные: "
@@ -110,6 +169,7 @@ def load_factories_and_tariffs():
         try:
             with open(FACTORIES_FILE, "r", encoding="utf-8") as f:
                 factories_products = json.load(f)
+            _register_snap_hints(factories_products)
         except Exception as e:
             log.error(f"❌ Ошибка при чтении {FACTORIES_FILE}: {e}")
             factories_products = {}
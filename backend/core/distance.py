@@ -1,17 +1,240 @@
-from functools import lru_cache
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
 
-from backend.service.osrm_client import OSRMUnavailableError, get_osrm_distance_km
+from backend.core.logger import get_logger
+from backend.core.metrics import DISTANCE_CACHE_LOOKUPS, DISTANCE_COALESCED, DISTANCE_ESTIMATED
+from backend.core.singleflight import AsyncSingleFlight, SingleFlight
+from backend.core.tracing import incr, span
+from backend.service.distance_dispatcher import batching_enabled, get_dispatcher
+from backend.service.distance_providers import HaversineDistanceProvider, PairKey, pair_key
+from backend.service.osrm_client import (
+    Coord,
+    OSRMUnavailableError,
+    get_distance_provider,
+    get_osrm_distance_km,
+)
 
-@lru_cache(maxsize=1000)
-def get_cached_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Кэшированное получение дистанции между точками через OSRM."""
-    return calculate_road_distance(lat1, lon1, lat2, lon2)
+log = get_logger("distance")
 
+# Сколько пар «завод → точка выгрузки» держим в памяти процесса
+DISTANCE_CACHE_SIZE = int(os.getenv("DISTANCE_CACHE_SIZE", "20000"))
+# При недоступном OSRM отдавать оценку по прямой (с флагом в ответе) вместо 503
+OSRM_STALE_FALLBACK = os.getenv("OSRM_STALE_FALLBACK", "1").lower() in ("1", "true", "yes")
+
+SOURCE_CACHE = "cache"
+SOURCE_PROVIDER = "provider"
+SOURCE_ESTIMATE = "estimate"
+SOURCE_GRID = "grid"
+
+
+class DistanceCache:
+    """Потокобезопасный LRU-кэш расстояний по округлённому ключу пары точек."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[PairKey, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: PairKey) -> Optional[float]:
+        with self._lock:
+            km = self._data.get(key)
+            if km is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return km
+
+    def peek(self, key: PairKey) -> Optional[float]:
+        """Чтение без учёта в статистике попаданий и без изменения порядка LRU."""
+        with self._lock:
+            return self._data.get(key)
+
+    def put(self, key: PairKey, km: float) -> None:
+        with self._lock:
+            self._data[key] = km
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+_distance_cache = DistanceCache(DISTANCE_CACHE_SIZE)
+_CACHE_HIT = DISTANCE_CACHE_LOOKUPS.labels(result="hit")
+_CACHE_MISS = DISTANCE_CACHE_LOOKUPS.labels(result="miss")
+_estimator = HaversineDistanceProvider()
+_flights = SingleFlight()
+_async_flights = AsyncSingleFlight()
+_COALESCED_THREAD = DISTANCE_COALESCED.labels(path="thread")
+_COALESCED_ASYNC = DISTANCE_COALESCED.labels(path="async")
+
+
+def lookup_distance(
+    lon_from: float,
+    lat_from: float,
+    lon_to: float,
+    lat_to: float,
+) -> Tuple[float, str]:
+    """
+    Дорожное расстояние в км и его источник:
+    ``cache`` — последнее известное значение, ``provider`` — свежий ответ,
+    ``estimate`` — оценка по прямой, когда OSRM недоступен (OSRM_STALE_FALLBACK).
+    Оценки в кэш не попадают, чтобы после восстановления OSRM считать точно.
+
+    Одновременные промахи по одной паре объединяются: в провайдер идёт один запрос.
+    """
+    key = pair_key(lon_from, lat_from, lon_to, lat_to)
+    km = _distance_cache.get(key)
+    if km is not None:
+        incr("distance_cache_hits")
+        _CACHE_HIT.inc()
+        return km, SOURCE_CACHE
+
+    incr("distance_cache_misses")
+    _CACHE_MISS.inc()
+    return _lookup_miss(key, lon_from, lat_from, lon_to, lat_to)
+
+
+def _lookup_miss(key: PairKey, lon_from, lat_from, lon_to, lat_to) -> Tuple[float, str]:
+    result, shared = _flights.do(key, _resolve_distance, key, lon_from, lat_from, lon_to, lat_to)
+    if shared:
+        incr("distance_coalesced")
+        _COALESCED_THREAD.inc()
+    return result
+
+
+def _resolve_distance(key: PairKey, lon_from, lat_from, lon_to, lat_to) -> Tuple[float, str]:
+    # Пока мы становились ведущим, предыдущий ведущий мог уже положить значение в кэш
+    km = _distance_cache.peek(key)
+    if km is not None:
+        return km, SOURCE_CACHE
 
-def calculate_road_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Получает дорожное расстояние через OSRM или бросает OSRMUnavailableError."""
     try:
-        return round(get_osrm_distance_km(lon1, lat1, lon2, lat2), 2)
-    except OSRMUnavailableError:
-        # Перебрасываем исключение без глушения, чтобы фронт показал корректное сообщение
-        raise
\ No newline at end of file
+        with span("distance_lookup"):
+            km = _fetch_distance_km(lon_from, lat_from, lon_to, lat_to)
+    except OSRMUnavailableError as exc:
+        if not OSRM_STALE_FALLBACK:
+            raise
+        incr("distance_estimated")
+        DISTANCE_ESTIMATED.inc()
+        log.warning("Расстояние оценено по прямой, OSRM недоступен: %s", exc)
+        return _estimator.distance_km(lon_from, lat_from, lon_to, lat_to), SOURCE_ESTIMATE
+
+    _distance_cache.put(key, km)
+    return km, SOURCE_PROVIDER
+
+
+def _fetch_distance_km(lon_from, lat_from, lon_to, lat_to) -> float:
+    """Запрос к провайдеру: через общий батч-диспетчер, если он включён."""
+    if batching_enabled():
+        incr("distance_batched")
+        return get_dispatcher().submit((lon_from, lat_from), (lon_to, lat_to)).result()
+    return get_osrm_distance_km(lon_from, lat_from, lon_to, lat_to)
+
+
+def prefetch_distances(sources: Iterable[Coord], destination: Coord) -> int:
+    """
+    Заранее кладёт в кэш расстояния от всех ``sources`` до ``destination``
+    одним запросом ``/table`` (или через батч-диспетчер), чтобы перебор
+    сценариев дальше шёл по кэшу. Ошибки не пробрасываются: недостающие
+    пары потом досчитает обычный ``lookup_distance`` со своим fallback.
+    Возвращает число пар, положенных в кэш.
+    """
+    lon_to, lat_to = destination
+    missing: Dict[PairKey, Coord] = {}
+    for lon, lat in sources:
+        key = pair_key(lon, lat, lon_to, lat_to)
+        if key not in missing and _distance_cache.peek(key) is None:
+            missing[key] = (lon, lat)
+    if not missing:
+        return 0
+
+    fetched = 0
+    with span("distance_prefetch"):
+        try:
+            if batching_enabled():
+                dispatcher = get_dispatcher()
+                futures = {key: dispatcher.submit(src, destination) for key, src in missing.items()}
+                for key, future in futures.items():
+                    try:
+                        _distance_cache.put(key, future.result())
+                        fetched += 1
+                    except OSRMUnavailableError:
+                        continue
+            else:
+                matrix = get_distance_provider().table_km(list(missing.values()), [destination])
+                for key, row in zip(missing, matrix):
+                    if row[0] is not None:
+                        _distance_cache.put(key, row[0])
+                        fetched += 1
+        except OSRMUnavailableError as exc:
+            log.warning("Предзагрузка расстояний не удалась: %s", exc)
+    incr("distance_prefetched", fetched)
+    return fetched
+
+
+def get_distance_km(lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> float:
+    """Дорожное расстояние в км с кэшированием; промах идёт в текущий провайдер."""
+    return lookup_distance(lon_from, lat_from, lon_to, lat_to)[0]
+
+
+async def alookup_distance(
+    lon_from: float,
+    lat_from: float,
+    lon_to: float,
+    lat_to: float,
+) -> Tuple[float, str]:
+    """
+    Асинхронный вариант ``lookup_distance`` для корутин: запрос к провайдеру
+    выполняется в потоке, одновременные ожидания одной пары делят одну Future.
+    """
+    key = pair_key(lon_from, lat_from, lon_to, lat_to)
+    km = _distance_cache.get(key)
+    if km is not None:
+        incr("distance_cache_hits")
+        _CACHE_HIT.inc()
+        return km, SOURCE_CACHE
+
+    incr("distance_cache_misses")
+    _CACHE_MISS.inc()
+    result, shared = await _async_flights.do(
+        key, asyncio.to_thread, _lookup_miss, key, lon_from, lat_from, lon_to, lat_to
+    )
+    if shared:
+        incr("distance_coalesced")
+        _COALESCED_ASYNC.inc()
+    return result
+
+
+def _reset_after_fork() -> None:
+    # блокировки могли быть захвачены другими потоками родителя в момент fork
+    global _flights, _async_flights
+    _distance_cache._lock = threading.Lock()
+    _flights = SingleFlight()
+    _async_flights = AsyncSingleFlight()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def clear_distance_cache() -> None:
+    """Сбрасывает кэш (например, после смены провайдера расстояний)."""
+    _distance_cache.clear()
+
+
+def distance_cache_stats() -> Dict[str, int]:
+    return _distance_cache.stats()
@@ -1,18 +1,161 @@
+"""Логирование бэкенда.
+
+Обработчики не пишут в stdout из потока запроса: в потоке запроса только
+подставляются аргументы сообщения (как в стандартном QueueHandler — иначе
+изменённый позже аргумент попал бы в лог уже новым), а сборку JSON, поля
+``extra`` и вывод делает фоновый поток ``QueueListener``. Формат — JSON-строки
+(LOG_STYLE=json) или привычный текст (LOG_STYLE=text).
+
+Дорогие аргументы можно передавать через ``lazy(...)`` — они вычисляются
+только если запись не отброшена уровнем или прореживанием. Отладочные записи
+прореживаются: LOG_DEBUG_SAMPLE_RATE задаёт долю сохраняемых DEBUG-записей,
+а ``extra={"sample_rate": 0.01}`` — долю для конкретного вызова.
+"""
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 
 LOG_FORMAT = (
     "%(asctime)s | %(levelname)-8s | "
     "%(name)s | %(message)s"
 )
 
-logging.basicConfig(
-    level=logging.INFO,
-    format=LOG_FORMAT,
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_STYLE = os.getenv("LOG_STYLE", "json").lower()
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+
+# Стандартные атрибуты LogRecord — всё остальное пришло из extra и попадает в JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName", "sample_rate"}
+
+
+class lazy:  # noqa: N801 — используется как функция: lazy(req.dict)
+    """Откладывает вычисление аргумента лога до подстановки в сообщение (после фильтров)."""
+
+    __slots__ = ("_fn", "_args")
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+
+    def __str__(self) -> str:
+        return str(self._fn(*self._args))
+
+    __repr__ = __str__
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна JSON-строка; поля из ``extra`` идут на верхний уровень."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text or record.exc_info:
+            entry["exc"] = record.exc_text or self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю ``rate`` DEBUG-записей (или ``record.sample_rate``, если задан)."""
+
+    def __init__(self, rate: float = LOG_DEBUG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            if record.levelno > logging.DEBUG:
+                return True
+            rate = self.rate
+        return rate >= 1.0 or random.random() < rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Как стандартный QueueHandler, фиксирует текст сообщения в потоке запроса
+    (``getMessage()``), но не форматирует всю запись: JSON со структурными
+    полями из ``extra`` собирается уже в QueueListener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        if record.exc_info:
+            # трейсбек держит кадры стека живыми, пока запись в очереди
+            record.exc_text = record.exc_text or _EXC_FORMATTER.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_EXC_FORMATTER = logging.Formatter()
+
+_listener = None
+
+
+def setup_logging() -> None:
+    """Настраивает корневой логгер один раз на процесс."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(JsonFormatter() if LOG_STYLE == "json" else logging.Formatter(LOG_FORMAT))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    root.setLevel(LOG_LEVEL)
+    root.handlers = [h for h in root.handlers if not isinstance(h, _DeferredQueueHandler)]
+    root.addHandler(handler)
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    # при выходе дописываем всё, что осталось в очереди
+    atexit.register(_listener.stop)
+
+
+def flush_logging() -> None:
+    """Дописывает очередь и останавливает фоновый поток (перед ``os._exit``)."""
+    global _listener
+    if _listener is None:
+        return
+    atexit.unregister(_listener.stop)
+    _listener.stop()
+    _listener = None
+    sys.stdout.flush()
+
+
+def _restart_after_fork() -> None:
+    """Поток QueueListener не переживает fork: в дочернем процессе запускаем свой."""
+    global _listener
+    if _listener is None:
+        return
+    atexit.unregister(_listener.stop)
+    _listener = None
+    setup_logging()
+
+
+setup_logging()
+os.register_at_fork(after_in_child=_restart_after_fork)
 
 
 def get_logger(name: str):
@@ -0,0 +1,179 @@
+"""Prometheus-метрики бэкенда.
+
+При запуске нескольких воркеров uvicorn задайте PROMETHEUS_MULTIPROC_DIR
+(пустой каталог, очищается перед стартом): каждый процесс пишет значения в свои
+mmap-файлы, а ``/metrics`` агрегирует их по всем воркерам.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+QUOTE_LATENCY = Histogram(
+    "quote_latency_seconds",
+    "Время расчёта /api/quote по HTTP-статусу ответа",
+    ["status"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+QUOTE_SCENARIOS = Histogram(
+    "quote_scenarios",
+    "Число сценариев, построенных для одного расчёта",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000),
+)
+OSRM_REQUEST_LATENCY = Histogram(
+    "osrm_request_seconds",
+    "Время одного HTTP-запроса к OSRM (каждая попытка и дубль отдельно)",
+    ["backend", "outcome"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+OSRM_RETRIES = Counter("osrm_retries", "Повторные попытки запросов к OSRM")
+OSRM_FAILURES = Counter("osrm_failures", "Запросы к OSRM, не удавшиеся после всех попыток")
+OSRM_SHORT_CIRCUITED = Counter(
+    "osrm_short_circuited",
+    "Запросы к OSRM, отклонённые разомкнутым предохранителем",
+)
+OSRM_CIRCUIT_STATE = Gauge(
+    "osrm_circuit_state",
+    "Состояние предохранителя OSRM: 0 — замкнут, 1 — пробный запрос, 2 — разомкнут",
+    ["backend"],
+    # только живые воркеры: разомкнутая цепь упавшего воркера не должна висеть вечно
+    multiprocess_mode="livemax",
+)
+OSRM_OUTSTANDING = Gauge(
+    "osrm_outstanding_requests",
+    "Запросы к бэкенду OSRM, ожидающие ответа",
+    ["backend"],
+    multiprocess_mode="livesum",
+)
+OSRM_HEDGED = Counter(
+    "osrm_hedged",
+    "Дублирующие запросы к другому бэкенду OSRM после превышения p95 (sent/won)",
+    ["result"],
+)
+OSRM_RATE_LIMITED = Counter(
+    "osrm_rate_limited",
+    "Запросы к OSRM, отклонённые общим лимитом OSRM_RATE_LIMIT_RPS",
+)
+OSRM_BATCH_SIZE = Histogram(
+    "osrm_batch_pairs",
+    "Пар «источник → назначение» в одном батч-запросе /table",
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250, 500),
+)
+DISTANCE_ESTIMATED = Counter(
+    "distance_estimated",
+    "Расстояния, оценённые по прямой из-за недоступности OSRM",
+)
+DISTANCE_COALESCED = Counter(
+    "distance_coalesced",
+    "Промахи кэша расстояний, дождавшиеся уже идущего запроса той же пары",
+    ["path"],
+)
+DISTANCE_CACHE_LOOKUPS = Counter(
+    "distance_cache_lookups",
+    "Обращения к кэшу расстояний (доля попаданий = hit / все)",
+    ["result"],
+)
+DISTANCE_GRID_LOOKUPS = Counter(
+    "distance_grid_lookups",
+    "Обращения к сетке расстояний при distancePrecision=cell (miss — точка вне сетки)",
+    ["result"],
+)
+QUOTE_ADMISSION = Counter(
+    "quote_admission",
+    "Решения допуска расчётов /quote: admitted — сразу, queued — после ожидания, shed — 503",
+    ["result"],
+)
+QUOTE_SLOTS_IN_USE = Gauge(
+    "quote_slots_in_use",
+    "Занятые слоты допуска расчётов /quote (вес по оценке работы)",
+    multiprocess_mode="livesum",
+)
+CATALOG_RELOAD_DURATION = Histogram(
+    "catalog_reload_seconds",
+    "Длительность перезагрузки данных из таблицы",
+    ["target", "outcome"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+CATALOG_LAST_RELOAD = Gauge(
+    "catalog_last_reload_timestamp_seconds",
+    "Время последней успешной перезагрузки данных (unix time)",
+    multiprocess_mode="max",
+)
+
+
+class CatalogAgeCollector:
+    """Возраст файлов storage считается в момент сбора, поэтому одинаков для всех воркеров."""
+
+    @staticmethod
+    def _family():
+        return GaugeMetricFamily(
+            "catalog_data_age_seconds",
+            "Сколько секунд назад обновлялись файлы данных",
+            labels=["file"],
+        )
+
+    def describe(self):
+        # Без describe() реестр вызвал бы collect() прямо при регистрации
+        yield self._family()
+
+    def collect(self):
+        from backend.core import data_loader
+
+        gauge = self._family()
+        now = time.time()
+        for name, path in (
+            ("factories_products", data_loader.FACTORIES_FILE),
+            ("tariffs", data_loader.TARIFFS_FILE),
+        ):
+            try:
+                gauge.add_metric([name], max(now - os.path.getmtime(path), 0.0))
+            except OSError:
+                continue
+        yield gauge
+
+
+_catalog_age = CatalogAgeCollector()
+if not MULTIPROC_DIR:
+    REGISTRY.register(_catalog_age)
+
+
+@contextmanager
+def track_reload(target: str):
+    """Замеряет перезагрузку данных; исключение учитывается как outcome=error."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        CATALOG_RELOAD_DURATION.labels(target=target, outcome="error").observe(
+            time.perf_counter() - started
+        )
+        raise
+    CATALOG_RELOAD_DURATION.labels(target=target, outcome="ok").observe(
+        time.perf_counter() - started
+    )
+    CATALOG_LAST_RELOAD.set(time.time())
+
+
+def render_metrics():
+    """Текст метрик в формате Prometheus и его Content-Type."""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(_catalog_age)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
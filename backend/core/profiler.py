@@ -0,0 +1,114 @@
+"""Профилирование работающего процесса по запросу (``GET /admin/profile``).
+
+CPU: выборочный профилировщик — раз в ``interval`` секунд снимает стеки всех
+потоков через ``sys._current_frames()`` и считает одинаковые стеки. Результат —
+«свёрнутые» стеки (``поток;модуль:функция;… N``), которые понимают
+flamegraph.pl, speedscope и inferno. Накладные расходы — один обход стеков на
+выборку, трассировка функций не включается.
+
+Память: снимок ``tracemalloc`` в начале и в конце окна и разница между ними —
+какие строки кода нарастили выделения за это время.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Интервал выборки CPU-профиля по умолчанию (мс)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Глубина стеков, которые запоминает tracemalloc в режиме memory
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "10"))
+
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """В процессе уже идёт профилирование."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+    return f"{module}:{code.co_name}"
+
+
+def _collapse(frame, thread_name: str) -> str:
+    labels: List[str] = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    return ";".join(reversed(labels))
+
+
+def sample_stacks(seconds: float, interval_s: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Снимает стеки всех потоков, кроме своего, в течение ``seconds``.
+    Возвращает ``{"samples", "stacks": Counter[свёрнутый стек → число выборок]}``.
+    """
+    interval_s = interval_s if interval_s is not None else PROFILE_INTERVAL_MS / 1000.0
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("Профилирование уже запущено")
+    try:
+        own = threading.get_ident()
+        stacks: Counter = Counter()
+        samples = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident != own:
+                    stacks[_collapse(frame, names.get(ident, f"thread-{ident}"))] += 1
+            # не держим кадры чужих потоков между выборками
+            frames = frame = None
+            samples += 1
+            time.sleep(interval_s)
+        return {"samples": samples, "stacks": stacks}
+    finally:
+        _busy.release()
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """Текст для flamegraph: строка ``стек число`` на каждый уникальный стек."""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def memory_diff(seconds: float, limit: int = 30, group_by: str = "lineno") -> Dict[str, Any]:
+    """
+    Разница снимков ``tracemalloc`` за ``seconds``: ``limit`` мест с наибольшим
+    приростом памяти. Если tracemalloc не был включён, включается на время окна
+    (выделения до начала окна в разницу не попадают).
+    """
+    if not _busy.acquire(blocking=False):
+        raise ProfilerBusy("Профилирование уже запущено")
+    started_here = not tracemalloc.is_tracing()
+    try:
+        if started_here:
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+        ignore = (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        )
+        before = tracemalloc.take_snapshot().filter_traces(ignore)
+        time.sleep(seconds)
+        after = tracemalloc.take_snapshot().filter_traces(ignore)
+        current, peak = tracemalloc.get_traced_memory()
+
+        top = []
+        for stat in after.compare_to(before, group_by)[:limit]:
+            top.append({
+                "size_diff": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size": stat.size,
+                "count": stat.count,
+                "traceback": [f"{frame.filename}:{frame.lineno}" for frame in stat.traceback],
+            })
+        return {"traced_bytes": current, "traced_peak_bytes": peak, "top": top}
+    finally:
+        if started_here:
+            tracemalloc.stop()
+        _busy.release()
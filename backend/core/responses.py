@@ -0,0 +1,76 @@
+"""Быстрая JSON-сериализация ответов API.
+
+По умолчанию используется orjson (если установлен): он в разы быстрее
+стандартного ``json`` на вложенных словарях с float и кириллицей. Всё, что
+orjson не умеет (целые длиннее 64 бит, нестандартные типы), молча уходит
+в стандартный энкодер. JSON_SERIALIZER=json отключает orjson целиком.
+
+NaN и ±Infinity оба энкодера отвергают одинаково (ValueError, как
+``allow_nan=False`` у стандартного): orjson сам пишет их как ``null``, поэтому
+при ``null`` в результате содержимое проверяется отдельно.
+"""
+import json
+import math
+import os
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:  # orjson необязателен: без него работает стандартный json
+    import orjson
+except ImportError:  # pragma: no cover — зависит от окружения
+    orjson = None
+
+JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "orjson").lower()
+
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+def dumps_std(content: Any) -> bytes:
+    """Стандартный энкодер в тех же настройках, что и у JSONResponse."""
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def _reject_non_finite(value: Any) -> None:
+    """ValueError, если где-то внутри ``value`` есть NaN или ±Infinity."""
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            raise ValueError("Out of range float values are not JSON compliant")
+    elif isinstance(value, dict):
+        for item in value.values():
+            _reject_non_finite(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _reject_non_finite(item)
+
+
+def dumps_json(content: Any) -> bytes:
+    """Сериализует ``content`` в UTF-8 JSON быстрым энкодером с запасным вариантом."""
+    if orjson is not None and JSON_SERIALIZER == "orjson":
+        try:
+            body = orjson.dumps(content, option=_ORJSON_OPTIONS)
+        except TypeError:
+            # например, int больше 64 бит — стандартный json с ним справляется
+            pass
+        else:
+            # orjson молча пишет NaN/Infinity как null; без null в теле их точно нет
+            if b"null" in body:
+                _reject_non_finite(content)
+            return body
+    return dumps_std(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse на ``dumps_json``. Обработчики возвращают его с уже готовыми
+    словарями из str/int/float/list/dict, без прохода ``jsonable_encoder``.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps_json(content)
@@ -0,0 +1,87 @@
+"""Журнал медленных расчётов /quote.
+
+Расчёт дольше ``QUOTE_SLOW_MS`` записывается JSON-строкой в отдельный файл с
+ротацией (``QUOTE_SLOW_LOG``): тело запроса, тайминги этапов и счётчики
+сценариев из трассы (``backend.core.tracing``) — для разбора задним числом.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from backend.core import data_loader
+
+# Порог медленного расчёта (мс); 0 — журнал выключен. Пока он включён,
+# трассировка этапов работает для всех запросов /quote
+QUOTE_SLOW_MS = float(os.getenv("QUOTE_SLOW_MS", "0"))
+# Файл журнала (по умолчанию — slow_quotes.log в STORAGE_PATH);
+# у воркеров backend.app.serve — свой файл с суффиксом pid
+QUOTE_SLOW_LOG = os.getenv("QUOTE_SLOW_LOG")
+# Размер файла до ротации (байт) и число хранимых архивов
+QUOTE_SLOW_LOG_MAX_BYTES = int(os.getenv("QUOTE_SLOW_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+QUOTE_SLOW_LOG_BACKUPS = int(os.getenv("QUOTE_SLOW_LOG_BACKUPS", "5"))
+
+_handler: Optional[RotatingFileHandler] = None
+_lock = threading.Lock()
+
+
+def slow_log_enabled() -> bool:
+    return QUOTE_SLOW_MS > 0
+
+
+def is_slow_quote(elapsed_ms: float) -> bool:
+    return slow_log_enabled() and elapsed_ms >= QUOTE_SLOW_MS
+
+
+def _log_path() -> str:
+    path = QUOTE_SLOW_LOG or os.path.join(data_loader.STORAGE_PATH, "slow_quotes.log")
+    if os.getenv("SERVE_MASTER_PID"):
+        # ротация одного файла из нескольких процессов теряет записи
+        return f"{path}.{os.getpid()}"
+    return path
+
+
+def _get_handler() -> RotatingFileHandler:
+    global _handler
+    if _handler is None:
+        path = _log_path()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        _handler = RotatingFileHandler(
+            path, maxBytes=QUOTE_SLOW_LOG_MAX_BYTES, backupCount=QUOTE_SLOW_LOG_BACKUPS, encoding="utf-8"
+        )
+        _handler.setFormatter(logging.Formatter("%(message)s"))
+    return _handler
+
+
+def record_slow_quote(
+    elapsed_ms: float, status: int, view: str, request: Dict[str, Any], trace: Dict[str, Any]
+) -> bool:
+    """Пишет расчёт в журнал, если он медленнее порога. Возвращает True, если записан."""
+    if not is_slow_quote(elapsed_ms):
+        return False
+    entry = {
+        "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        "pid": os.getpid(),
+        "elapsed_ms": round(elapsed_ms, 3),
+        "status": status,
+        "view": view,
+        "request": request,
+        **trace,
+    }
+    record = logging.makeLogRecord({"msg": json.dumps(entry, ensure_ascii=False, default=str)})
+    with _lock:
+        _get_handler().handle(record)
+    return True
+
+
+def _reset_after_fork() -> None:
+    # дочерний процесс пишет в свой файл (см. _log_path)
+    global _handler, _lock
+    _handler = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,111 @@
+"""Лёгкая трассировка этапов расчёта в пределах одного запроса.
+
+Трасса живёт в ContextVar: пока она не включена, ``span()`` и ``incr()`` сводятся
+к одному чтению ContextVar, поэтому их можно оставлять в горячих циклах.
+Повторяющиеся спаны с одним именем суммируются (время + количество).
+"""
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("request_trace", default=None)
+
+
+class Trace:
+    __slots__ = ("started", "spans", "counters")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans: Dict[str, List[float]] = {}  # имя -> [сумма секунд, количество]
+        self.counters: Dict[str, int] = {}
+
+    def add_span(self, name: str, duration_s: float) -> None:
+        slot = self.spans.get(name)
+        if slot is None:
+            self.spans[name] = [duration_s, 1]
+        else:
+            slot[0] += duration_s
+            slot[1] += 1
+
+    def incr(self, name: str, value: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "total_ms": round(self.elapsed_ms(), 3),
+            "timings_ms": {
+                name: {"total": round(total * 1000.0, 3), "count": int(count)}
+                for name, (total, count) in self.spans.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing (https://w3c.github.io/server-timing/)."""
+        parts = [
+            f'{name};dur={total * 1000.0:.3f};desc="x{int(count)}"'
+            for name, (total, count) in self.spans.items()
+        ]
+        parts.append(f"total;dur={self.elapsed_ms():.3f}")
+        return ", ".join(parts)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.add_span(self.name, time.perf_counter() - self.started)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+
+def start_trace():
+    """Включает трассировку в текущем контексте. Возвращает (trace, token для end_trace)."""
+    trace = Trace()
+    return trace, _current.set(trace)
+
+
+def end_trace(token) -> None:
+    _current.reset(token)
+
+
+def span(name: str):
+    """Контекстный менеджер замера этапа; без активной трассы ничего не делает."""
+    trace = _current.get()
+    if trace is None:
+        return _NOOP_SPAN
+    return _Span(trace, name)
+
+
+def incr(name: str, value: int = 1) -> None:
+    """Увеличивает счётчик активной трассы."""
+    trace = _current.get()
+    if trace is not None:
+        trace.incr(name, value)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 
 class QuoteItem(BaseModel):
@@ -17,3 +17,10 @@ class QuoteRequest(BaseModel):
 
     add_manipulator: bool = Field(False, alias="addManipulator")
     selected_special: Optional[str] = Field(None, alias="selectedSpecial")
+    # cell — расстояния до ячейки сетки точки выгрузки из заранее посчитанной таблицы
+    distance_precision: Literal["exact", "cell"] = Field("exact", alias="distancePrecision")
+
+
+class QuoteVariantRequest(QuoteRequest):
+    # ключ варианта из ответа /quote (variantKey)
+    variant_key: str = Field(..., alias="variantKey")
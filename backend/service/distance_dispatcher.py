@@ -0,0 +1,137 @@
+"""Микробатчинг запросов расстояний между всеми текущими расчётами.
+
+Пары (источник, назначение) от разных запросов копятся короткое окно
+(OSRM_BATCH_WINDOW_MS) или до OSRM_BATCH_MAX_PAIRS пар, затем уходят одним
+вызовом ``/table``; результаты раздаются ожидающим через Future.
+"""
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from backend.core.logger import get_logger
+from backend.core.metrics import OSRM_BATCH_SIZE
+from backend.service.osrm_client import Coord, OSRMUnavailableError, get_distance_provider
+
+log = get_logger("distance_dispatcher")
+
+# 0 — батчинг выключен, каждая пара запрашивается сразу
+OSRM_BATCH_WINDOW_MS = float(os.getenv("OSRM_BATCH_WINDOW_MS", "0"))
+OSRM_BATCH_MAX_PAIRS = int(os.getenv("OSRM_BATCH_MAX_PAIRS", "100"))
+# Ограничение OSRM на размер /table (--max-table-size, по умолчанию 100 точек)
+OSRM_TABLE_MAX_COORDS = int(os.getenv("OSRM_TABLE_MAX_COORDS", "100"))
+OSRM_BATCH_CONCURRENCY = int(os.getenv("OSRM_BATCH_CONCURRENCY", "4"))
+
+_Pending = Tuple[Coord, Coord, Future]
+
+
+class DistanceDispatcher:
+    def __init__(
+        self,
+        window_ms: float = OSRM_BATCH_WINDOW_MS,
+        max_pairs: int = OSRM_BATCH_MAX_PAIRS,
+        max_coords: int = OSRM_TABLE_MAX_COORDS,
+        concurrency: int = OSRM_BATCH_CONCURRENCY,
+        provider_getter=get_distance_provider,
+    ):
+        self.window_s = window_ms / 1000.0
+        self.max_pairs = max(1, max_pairs)
+        self.max_coords = max(2, max_coords)
+        self._provider_getter = provider_getter
+        self._cond = threading.Condition()
+        self._pending: List[_Pending] = []
+        self._first_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="osrm-batch")
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+
+    def submit(self, source: Coord, destination: Coord) -> Future:
+        """Ставит пару в очередь; Future вернёт расстояние в км."""
+        future: Future = Future()
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="osrm-dispatcher", daemon=True)
+                self._thread.start()
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append((source, destination, future))
+            self._cond.notify()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # ждём конца окна или заполнения батча
+                while len(self._pending) < self.max_pairs:
+                    left = self._first_at + self.window_s - time.monotonic()
+                    if left <= 0:
+                        break
+                    self._cond.wait(left)
+                batch, self._pending = self._take_batch(self._pending)
+                if self._pending:
+                    self._first_at = time.monotonic()
+            self.batches += 1
+            self._executor.submit(self._dispatch, batch)
+
+    def _take_batch(self, pending: List[_Pending]) -> Tuple[List[_Pending], List[_Pending]]:
+        """Отрезает батч так, чтобы уникальных точек было не больше max_coords."""
+        sources, destinations = set(), set()
+        for i, (src, dst, _) in enumerate(pending):
+            if i >= self.max_pairs:
+                return pending[:i], pending[i:]
+            coords = len(sources | {src}) + len(destinations | {dst})
+            if i and coords > self.max_coords:
+                return pending[:i], pending[i:]
+            sources.add(src)
+            destinations.add(dst)
+        return pending, []
+
+    def _dispatch(self, batch: List[_Pending]) -> None:
+        sources = list(dict.fromkeys(src for src, _, _ in batch))
+        destinations = list(dict.fromkeys(dst for _, dst, _ in batch))
+        OSRM_BATCH_SIZE.observe(len(batch))
+        try:
+            matrix = self._provider_getter().table_km(sources, destinations)
+        except Exception as exc:  # noqa: BLE001 — ошибку получают все ожидающие
+            log.warning("Батч из %s пар не удался: %s", len(batch), exc)
+            for _, _, future in batch:
+                future.set_exception(exc)
+            return
+
+        src_idx: Dict[Coord, int] = {c: i for i, c in enumerate(sources)}
+        dst_idx: Dict[Coord, int] = {c: i for i, c in enumerate(destinations)}
+        for src, dst, future in batch:
+            km = matrix[src_idx[src]][dst_idx[dst]]
+            if km is None:
+                future.set_exception(OSRMUnavailableError(f"OSRM не нашёл маршрут {src} → {dst}"))
+            else:
+                future.set_result(km)
+
+
+_dispatcher: Optional[DistanceDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def batching_enabled() -> bool:
+    return OSRM_BATCH_WINDOW_MS > 0
+
+
+def get_dispatcher() -> DistanceDispatcher:
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = DistanceDispatcher()
+        return _dispatcher
+
+
+def _reset_after_fork() -> None:
+    # поток сборщика батчей остался в родителе — в дочернем процессе диспетчер создаётся заново
+    global _dispatcher, _dispatcher_lock
+    _dispatcher = None
+    _dispatcher_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,432 @@
+"""Сетка заранее посчитанных расстояний «завод → ячейка» для частых регионов.
+
+Регионы (DISTANCE_GRID_REGIONS) покрываются сеткой ячеек со стороной
+DISTANCE_GRID_CELL_KM. Фоновая задача считает дорожные расстояния от каждого
+завода до центра каждой ячейки пачками через ``/table``, сохраняет таблицу в
+storage и пересчитывает её, когда меняется набор заводов в каталоге (для уже
+известных заводов строки переиспользуются).
+
+Расчёт с ``distancePrecision: "cell"`` берёт расстояние до ячейки точки выгрузки
+из таблицы без сетевых запросов; точки вне сетки считаются как обычно.
+"""
+import hashlib
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from backend.core import data_loader
+from backend.core.logger import get_logger
+from backend.core.metrics import DISTANCE_GRID_LOOKUPS
+from backend.core.tracing import incr
+from backend.service.distance_dispatcher import OSRM_TABLE_MAX_COORDS
+from backend.service.osrm_client import Coord, OSRMUnavailableError, get_distance_provider
+
+log = get_logger("distance_grid")
+
+# Регионы через «;»: имя:lat_min,lon_min,lat_max,lon_max (пусто — сетка выключена)
+DISTANCE_GRID_REGIONS = os.getenv("DISTANCE_GRID_REGIONS", "")
+DISTANCE_GRID_CELL_KM = float(os.getenv("DISTANCE_GRID_CELL_KM", "2.0"))
+# Как часто проверять, не поменялся ли набор заводов (0 — только при старте и по сигналу)
+DISTANCE_GRID_REFRESH_S = float(os.getenv("DISTANCE_GRID_REFRESH_S", "300"))
+# Файл таблицы (по умолчанию storage/distance_grid.bin)
+DISTANCE_GRID_FILE = os.getenv("DISTANCE_GRID_FILE")
+
+_KM_PER_DEG_LAT = 111.32
+_FILE_MAGIC = b"DGRID1\n"
+_KEY_PRECISION = 5
+
+Cell = Tuple[int, int]
+
+_HIT = DISTANCE_GRID_LOOKUPS.labels(result="hit")
+_MISS = DISTANCE_GRID_LOOKUPS.labels(result="miss")
+
+
+# === ГЕОМЕТРИЯ СЕТКИ ===
+
+class GridRegion:
+    __slots__ = ("name", "lat_min", "lon_min", "lat_max", "lon_max")
+
+    def __init__(self, name: str, lat_min: float, lon_min: float, lat_max: float, lon_max: float):
+        self.name = name
+        self.lat_min, self.lat_max = min(lat_min, lat_max), max(lat_min, lat_max)
+        self.lon_min, self.lon_max = min(lon_min, lon_max), max(lon_min, lon_max)
+
+    def spec(self) -> str:
+        return f"{self.name}:{self.lat_min},{self.lon_min},{self.lat_max},{self.lon_max}"
+
+
+def parse_regions(spec: str) -> List[GridRegion]:
+    """Разбирает DISTANCE_GRID_REGIONS; некорректные записи пропускаются с предупреждением."""
+    regions = []
+    for part in (spec or "").split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, bbox = part.rpartition(":")
+        try:
+            lat_min, lon_min, lat_max, lon_max = (float(x) for x in bbox.split(","))
+        except ValueError:
+            log.warning("Некорректный регион сетки расстояний: %r", part)
+            continue
+        regions.append(GridRegion(name or f"region{len(regions) + 1}", lat_min, lon_min, lat_max, lon_max))
+    return regions
+
+
+def configured_regions() -> List[GridRegion]:
+    return parse_regions(DISTANCE_GRID_REGIONS)
+
+
+def _lon_step(row: int, cell_km: float) -> float:
+    # Ширина ячейки в градусах долготы зависит от широты её ряда
+    center_lat = (row + 0.5) * cell_km / _KM_PER_DEG_LAT
+    return cell_km / (_KM_PER_DEG_LAT * max(math.cos(math.radians(center_lat)), 1e-6))
+
+
+@lru_cache(maxsize=4096)
+def cell_of(lat: float, lon: float, cell_km: float) -> Cell:
+    """Ячейка (ряд, столбец) глобальной сетки, в которую попадает точка."""
+    row = math.floor(lat / (cell_km / _KM_PER_DEG_LAT))
+    return row, math.floor(lon / _lon_step(row, cell_km))
+
+
+def cell_centroid(cell: Cell, cell_km: float) -> Coord:
+    """Центр ячейки как (lon, lat)."""
+    row, col = cell
+    return (col + 0.5) * _lon_step(row, cell_km), (row + 0.5) * cell_km / _KM_PER_DEG_LAT
+
+
+def region_cells(regions: Iterable[GridRegion], cell_km: float) -> List[Cell]:
+    """Все ячейки, пересекающие регионы (без повторов для перекрывающихся регионов)."""
+    cells: Dict[Cell, None] = {}
+    for region in regions:
+        row_min = cell_of(region.lat_min, region.lon_min, cell_km)[0]
+        row_max = cell_of(region.lat_max, region.lon_min, cell_km)[0]
+        for row in range(row_min, row_max + 1):
+            step = _lon_step(row, cell_km)
+            for col in range(math.floor(region.lon_min / step), math.floor(region.lon_max / step) + 1):
+                cells[(row, col)] = None
+    return list(cells)
+
+
+def _point_key(lon: float, lat: float) -> Tuple[float, float]:
+    return round(float(lon), _KEY_PRECISION), round(float(lat), _KEY_PRECISION)
+
+
+def grid_signature(factories: Sequence[Coord], regions: Sequence[GridRegion], cell_km: float) -> str:
+    payload = json.dumps(
+        [cell_km, [r.spec() for r in regions], sorted(_point_key(lon, lat) for lon, lat in factories)]
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+# === ТАБЛИЦА ===
+
+class DistanceGrid:
+    """
+    Расстояния «завод → центр ячейки»: по строке ``array('f')`` на завод,
+    NaN — OSRM не нашёл маршрут.
+    """
+
+    def __init__(
+        self,
+        cell_km: float,
+        regions: Sequence[GridRegion],
+        factories: Sequence[Coord],
+        cells: Sequence[Cell],
+        rows: Sequence[array],
+        built_at: Optional[float] = None,
+    ):
+        self.cell_km = cell_km
+        self.regions = list(regions)
+        self.factories = [tuple(f) for f in factories]
+        self.cells = [tuple(c) for c in cells]
+        self.rows = list(rows)
+        self.built_at = built_at if built_at is not None else time.time()
+        self.signature = grid_signature(self.factories, self.regions, cell_km)
+        self._factory_index = {_point_key(lon, lat): i for i, (lon, lat) in enumerate(self.factories)}
+        self._cell_index = {cell: i for i, cell in enumerate(self.cells)}
+
+    def row_for(self, lon: float, lat: float) -> Optional[array]:
+        idx = self._factory_index.get(_point_key(lon, lat))
+        return self.rows[idx] if idx is not None else None
+
+    def lookup(self, lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> Optional[float]:
+        """Расстояние от завода до ячейки точки выгрузки или None, если их нет в таблице."""
+        row = self.row_for(lon_from, lat_from)
+        if row is None:
+            return None
+        idx = self._cell_index.get(cell_of(lat_to, lon_to, self.cell_km))
+        if idx is None:
+            return None
+        km = row[idx]
+        return None if math.isnan(km) else km
+
+    def snapshot(self) -> Dict:
+        return {
+            "regions": [r.spec() for r in self.regions],
+            "cell_km": self.cell_km,
+            "factories": len(self.factories),
+            "cells": len(self.cells),
+            "built_at": self.built_at,
+            "signature": self.signature,
+        }
+
+    def save(self, path: str) -> None:
+        """Заголовок JSON + float32-строки; пишется во временный файл и атомарно подменяет старый."""
+        header = {
+            "cell_km": self.cell_km,
+            "regions": [r.spec() for r in self.regions],
+            "factories": self.factories,
+            "cells": self.cells,
+            "built_at": self.built_at,
+            "byteorder": sys.byteorder,
+        }
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # своё имя временного файла у каждого писателя: воркеры и мастер могут сохранять одновременно
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=directory, prefix=f"{os.path.basename(path)}.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = f.name
+            try:
+                f.write(_FILE_MAGIC)
+                f.write(json.dumps(header).encode("utf-8") + b"\n")
+                for row in self.rows:
+                    row.tofile(f)
+            except BaseException:
+                f.close()
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DistanceGrid":
+        with open(path, "rb") as f:
+            if f.readline() != _FILE_MAGIC:
+                raise ValueError(f"{path}: неизвестный формат сетки расстояний")
+            header = json.loads(f.readline())
+            rows = []
+            for _ in header["factories"]:
+                row = array("f")
+                row.fromfile(f, len(header["cells"]))
+                if header["byteorder"] != sys.byteorder:
+                    row.byteswap()
+                rows.append(row)
+        return cls(
+            header["cell_km"],
+            parse_regions(";".join(header["regions"])),
+            header["factories"],
+            header["cells"],
+            rows,
+            built_at=header["built_at"],
+        )
+
+
+def build_grid(
+    factories: Sequence[Coord],
+    regions: Sequence[GridRegion],
+    cell_km: float,
+    provider=None,
+    previous: Optional[DistanceGrid] = None,
+    max_coords: int = OSRM_TABLE_MAX_COORDS,
+) -> DistanceGrid:
+    """
+    Считает таблицу пачками ``/table`` (источники + назначения не больше
+    ``max_coords``). Строки заводов из ``previous`` с той же сеткой не пересчитываются.
+    """
+    provider = provider or get_distance_provider()
+    cells = region_cells(regions, cell_km)
+    centroids = [cell_centroid(cell, cell_km) for cell in cells]
+    reusable = previous if previous is not None and previous.cell_km == cell_km and previous.cells == cells else None
+
+    rows: List[array] = []
+    missing: List[int] = []
+    for idx, (lon, lat) in enumerate(factories):
+        row = reusable.row_for(lon, lat) if reusable is not None else None
+        if row is None:
+            missing.append(idx)
+            row = array("f", [math.nan]) * len(cells)
+        rows.append(row)
+
+    max_coords = max(2, max_coords)
+    src_chunk = max(1, min(len(missing), max_coords // 4))
+    dst_chunk = max(1, max_coords - src_chunk)
+    for i in range(0, len(missing), src_chunk):
+        batch = missing[i:i + src_chunk]
+        sources = [factories[k] for k in batch]
+        for j in range(0, len(cells), dst_chunk):
+            matrix = provider.table_km(sources, centroids[j:j + dst_chunk])
+            for k, values in zip(batch, matrix):
+                row = rows[k]
+                for offset, km in enumerate(values):
+                    if km is not None:
+                        row[j + offset] = km
+
+    log.info(
+        "Сетка расстояний: %s заводов × %s ячеек, пересчитано заводов: %s",
+        len(factories), len(cells), len(missing),
+    )
+    return DistanceGrid(cell_km, regions, factories, cells, rows)
+
+
+def catalog_factory_coords(factories_products) -> List[Coord]:
+    """Уникальные координаты (lon, lat) заводов каталога."""
+    coords: Dict[Tuple[float, float], Coord] = {}
+    for factory in data_loader._iter_factories(factories_products):
+        lon, lat = float(factory["lon"]), float(factory["lat"])
+        coords.setdefault(_point_key(lon, lat), (lon, lat))
+    return list(coords.values())
+
+
+# === ТЕКУЩАЯ СЕТКА И ФОНОВОЕ ОБНОВЛЕНИЕ ===
+
+_grid: Optional[DistanceGrid] = None
+_grid_loaded = False
+_refresh_lock = threading.Lock()
+_wake = threading.Event()
+_refresher: Optional[threading.Thread] = None
+_refresh_listeners: List[Callable[[DistanceGrid], None]] = []
+
+
+def grid_file() -> str:
+    return DISTANCE_GRID_FILE or os.path.join(data_loader.STORAGE_PATH, "distance_grid.bin")
+
+
+def get_grid() -> Optional[DistanceGrid]:
+    """Текущая таблица; при первом обращении читается из storage, если совпадает с настройками."""
+    global _grid, _grid_loaded
+    if _grid_loaded:
+        return _grid
+    regions = configured_regions()
+    path = grid_file()
+    if regions and os.path.exists(path):
+        try:
+            grid = DistanceGrid.load(path)
+        except (OSError, ValueError, KeyError) as exc:
+            log.warning("Не удалось прочитать %s: %s", path, exc)
+        else:
+            if grid.cell_km == DISTANCE_GRID_CELL_KM and [r.spec() for r in grid.regions] == [r.spec() for r in regions]:
+                _grid = grid
+    _grid_loaded = True
+    return _grid
+
+
+def set_grid(grid: Optional[DistanceGrid]) -> None:
+    """Подменяет таблицу (тесты); ``None`` — сброс с повторным чтением из storage."""
+    global _grid, _grid_loaded
+    _grid = grid
+    _grid_loaded = grid is not None
+
+
+def grid_distance_km(lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> Optional[float]:
+    """Расстояние «завод → ячейка точки выгрузки» из таблицы, без сети; None — нет в сетке."""
+    grid = get_grid()
+    km = grid.lookup(lon_from, lat_from, lon_to, lat_to) if grid is not None else None
+    if km is None:
+        incr("distance_grid_misses")
+        _MISS.inc()
+    else:
+        incr("distance_grid_hits")
+        _HIT.inc()
+    return km
+
+
+def uncovered_sources(sources: Iterable[Coord], destination: Coord) -> List[Coord]:
+    """Источники, для которых в таблице нет расстояния до ячейки ``destination``."""
+    grid = get_grid()
+    lon_to, lat_to = destination
+    if grid is None:
+        return list(sources)
+    return [(lon, lat) for lon, lat in sources if grid.lookup(lon, lat, lon_to, lat_to) is None]
+
+
+def refresh_grid(force: bool = False) -> bool:
+    """
+    Пересчитывает таблицу, если поменялся набор заводов (или настройки сетки).
+    Возвращает True, если таблица обновлена. Ошибки OSRM оставляют прежнюю таблицу.
+    """
+    global _grid, _grid_loaded
+    regions = configured_regions()
+    if not regions:
+        return False
+
+    from backend.core.catalog import get_catalog
+
+    with _refresh_lock:
+        factories = catalog_factory_coords(get_catalog().factories_products)
+        current = get_grid()
+        signature = grid_signature(factories, regions, DISTANCE_GRID_CELL_KM)
+        if not force and current is not None and current.signature == signature:
+            return False
+
+        started = time.perf_counter()
+        try:
+            grid = build_grid(factories, regions, DISTANCE_GRID_CELL_KM, previous=current)
+        except OSRMUnavailableError as exc:
+            log.warning("Сетка расстояний не обновлена, OSRM недоступен: %s", exc)
+            return False
+        grid.save(grid_file())
+        _grid, _grid_loaded = grid, True
+        log.info("Сетка расстояний обновлена за %.1f с", time.perf_counter() - started)
+    for listener in list(_refresh_listeners):
+        listener(grid)
+    return True
+
+
+def add_refresh_listener(listener: Callable[[DistanceGrid], None]) -> None:
+    """Вызывается после каждого пересчёта сетки (мастер-процесс перезапускает воркеров)."""
+    _refresh_listeners.append(listener)
+
+
+def schedule_grid_refresh() -> None:
+    """Будит фоновую задачу (например, после перезагрузки каталога)."""
+    _wake.set()
+
+
+def _refresh_loop() -> None:
+    while True:
+        try:
+            refresh_grid()
+        except Exception:
+            log.exception("Ошибка обновления сетки расстояний")
+        _wake.wait(DISTANCE_GRID_REFRESH_S if DISTANCE_GRID_REFRESH_S > 0 else None)
+        _wake.clear()
+
+
+def start_grid_refresher() -> bool:
+    """Запускает фоновое обновление сетки, если заданы регионы. Повторный вызов ничего не делает."""
+    global _refresher
+    if _refresher is not None or not configured_regions():
+        return False
+    _refresher = threading.Thread(target=_refresh_loop, name="distance-grid", daemon=True)
+    _refresher.start()
+    return True
+
+
+def _reset_after_fork() -> None:
+    # фоновая задача остаётся в родителе; воркеры только читают унаследованную таблицу
+    global _refresher, _refresh_lock, _wake
+    _refresher = None
+    _refresh_lock = threading.Lock()
+    _wake = threading.Event()
+    _refresh_listeners.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def grid_status() -> Dict:
+    grid = get_grid()
+    return {
+        "enabled": bool(configured_regions()),
+        "file": grid_file(),
+        "refresh_s": DISTANCE_GRID_REFRESH_S,
+        "grid": grid.snapshot() if grid is not None else None,
+    }
@@ -0,0 +1,196 @@
+"""Провайдеры дорожных расстояний: OSRM, оценка по прямой и воспроизведение записей."""
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.core.logger import get_logger
+from backend.service.osrm_client import (
+    Coord,
+    OSRMUnavailableError,
+    osrm_route_distance_km,
+    osrm_table_distances_km,
+)
+
+log = get_logger("distance_providers")
+
+EARTH_RADIUS_KM = 6371.0088
+# Средний коэффициент извилистости дорог относительно прямой (Подмосковье)
+DEFAULT_DETOUR_FACTOR = float(os.getenv("DISTANCE_DETOUR_FACTOR", "1.3"))
+DISTANCE_REPLAY_FILE = os.getenv("DISTANCE_REPLAY_FILE")
+# Точность ключа записи: 5 знаков ≈ 1 м
+_KEY_PRECISION = 5
+
+PairKey = Tuple[float, float, float, float]
+
+
+def haversine_km(lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> float:
+    """Расстояние по большому кругу в километрах."""
+    phi1 = math.radians(lat_from)
+    phi2 = math.radians(lat_to)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon_to - lon_from)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def pair_key(lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> PairKey:
+    """Округлённый ключ пары точек для записей и кэшей."""
+    return (
+        round(float(lon_from), _KEY_PRECISION),
+        round(float(lat_from), _KEY_PRECISION),
+        round(float(lon_to), _KEY_PRECISION),
+        round(float(lat_to), _KEY_PRECISION),
+    )
+
+
+class DistanceProvider(ABC):
+    """Интерфейс источника дорожных расстояний (км). Координаты — (lon, lat)."""
+
+    name = "base"
+
+    @abstractmethod
+    def distance_km(self, lon_from: float, lat_from: float, lon_to: float, lat_to: float) -> float:
+        ...
+
+    def table_km(
+        self,
+        sources: Sequence[Coord],
+        destinations: Sequence[Coord],
+    ) -> List[List[Optional[float]]]:
+        """Матрица расстояний; по умолчанию — попарными вызовами ``distance_km``."""
+        return [
+            [self.distance_km(s_lon, s_lat, d_lon, d_lat) for d_lon, d_lat in destinations]
+            for s_lon, s_lat in sources
+        ]
+
+
+class OSRMDistanceProvider(DistanceProvider):
+    """Настоящий OSRM по OSRM_BASE_URL."""
+
+    name = "osrm"
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        return osrm_route_distance_km(lon_from, lat_from, lon_to, lat_to)
+
+    def table_km(self, sources, destinations):
+        return osrm_table_distances_km(sources, destinations)
+
+
+class HaversineDistanceProvider(DistanceProvider):
+    """Оценка: расстояние по прямой × коэффициент извилистости. Без сети."""
+
+    name = "haversine"
+
+    def __init__(self, detour_factor: float = DEFAULT_DETOUR_FACTOR):
+        self.detour_factor = detour_factor
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        return haversine_km(lon_from, lat_from, lon_to, lat_to) * self.detour_factor
+
+
+class ReplayDistanceProvider(DistanceProvider):
+    """
+    Отдаёт заранее записанные расстояния (см. ``RecordingDistanceProvider``).
+    Для незаписанных пар обращается к ``fallback`` или бросает OSRMUnavailableError.
+    """
+
+    name = "replay"
+
+    def __init__(
+        self,
+        recordings: Optional[Dict[PairKey, float]] = None,
+        fallback: Optional[DistanceProvider] = None,
+    ):
+        self.recordings: Dict[PairKey, float] = dict(recordings or {})
+        self.fallback = fallback
+        self.misses = 0
+
+    @classmethod
+    def from_file(cls, path, fallback: Optional[DistanceProvider] = None) -> "ReplayDistanceProvider":
+        return cls(load_recordings(path), fallback=fallback)
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        key = pair_key(lon_from, lat_from, lon_to, lat_to)
+        km = self.recordings.get(key)
+        if km is not None:
+            return km
+
+        self.misses += 1
+        if self.fallback is None:
+            raise OSRMUnavailableError(f"Нет записанного расстояния для {key}")
+        return self.fallback.distance_km(lon_from, lat_from, lon_to, lat_to)
+
+
+class RecordingDistanceProvider(DistanceProvider):
+    """Обёртка, запоминающая все ответы ``inner`` для последующего replay."""
+
+    name = "recording"
+
+    def __init__(self, inner: DistanceProvider):
+        self.inner = inner
+        self.recordings: Dict[PairKey, float] = {}
+        self._lock = threading.Lock()
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        km = self.inner.distance_km(lon_from, lat_from, lon_to, lat_to)
+        with self._lock:
+            self.recordings[pair_key(lon_from, lat_from, lon_to, lat_to)] = km
+        return km
+
+    def table_km(self, sources, destinations):
+        matrix = self.inner.table_km(sources, destinations)
+        with self._lock:
+            for (s_lon, s_lat), row in zip(sources, matrix):
+                for (d_lon, d_lat), km in zip(destinations, row):
+                    if km is not None:
+                        self.recordings[pair_key(s_lon, s_lat, d_lon, d_lat)] = km
+        return matrix
+
+    def save(self, path) -> Path:
+        with self._lock:
+            snapshot = dict(self.recordings)
+        return save_recordings(snapshot, path)
+
+
+# === ФАЙЛ ЗАПИСЕЙ (JSON lines) ===
+
+def save_recordings(recordings: Dict[PairKey, float], path) -> Path:
+    out = Path(path)
+    with open(out, "w", encoding="utf-8") as f:
+        for (lon_from, lat_from, lon_to, lat_to), km in recordings.items():
+            f.write(json.dumps({"from": [lon_from, lat_from], "to": [lon_to, lat_to], "km": km}))
+            f.write("\n")
+    return out
+
+
+def load_recordings(path) -> Dict[PairKey, float]:
+    recordings: Dict[PairKey, float] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            row = json.loads(line)
+            recordings[pair_key(*row["from"], *row["to"])] = float(row["km"])
+    return recordings
+
+
+def create_distance_provider(name: str) -> DistanceProvider:
+    """Фабрика по имени из переменной DISTANCE_PROVIDER."""
+    name = (name or "osrm").strip().lower()
+    if name == "osrm":
+        return OSRMDistanceProvider()
+    if name == "haversine":
+        return HaversineDistanceProvider()
+    if name == "replay":
+        if not DISTANCE_REPLAY_FILE:
+            raise ValueError("Для DISTANCE_PROVIDER=replay задайте DISTANCE_REPLAY_FILE")
+        log.info("Расстояния воспроизводятся из %s", DISTANCE_REPLAY_FILE)
+        return ReplayDistanceProvider.from_file(DISTANCE_REPLAY_FILE)
+    raise ValueError(f"Неизвестный DISTANCE_PROVIDER: {name}")
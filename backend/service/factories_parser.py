@@ -1,41 +1,145 @@
+import csv
 import os
-import gspread
+from abc import ABC, abstractmethod
+from pathlib import Path
+from urllib.parse import unquote
+
 from dotenv import load_dotenv
-from functools import lru_cache
 import re
-from backend.service.osrm_client import get_osrm_distance_km
+from backend.core.logger import get_logger
 
 load_dotenv()
+log = get_logger("factories_parser")
 
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 CREDENTIALS_PATH = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+# Если задан путь к локальной копии таблицы (каталог CSV или .xlsx),
+# парсер читает её вместо Google Sheets — нужно для CI и бенчмарков.
+SHEETS_LOCAL_PATH = os.getenv("SHEETS_LOCAL_PATH")
+
+
+# === ИСТОЧНИКИ ЛИСТОВ ===
+
+class SheetSource(ABC):
+    """
+    Источник листов таблицы. Повторяет нужный парсеру кусок API gspread:
+    ``worksheets()`` возвращает объекты с ``title`` и ``get_all_values()``.
+    """
+
+    @abstractmethod
+    def worksheets(self):
+        ...
+
+
+class GoogleSheetSource(SheetSource):
+    """Живая таблица Google через сервисный аккаунт."""
+
+    def __init__(self, sheet_id=None, credentials_path=None):
+        self.sheet_id = sheet_id or SHEET_ID
+        self.credentials_path = credentials_path or CREDENTIALS_PATH
+
+    def worksheets(self):
+        # gspread тянет за собой google-auth и requests (~150 мс импорта) —
+        # грузим только когда действительно идём в Google
+        import gspread
+
+        gc = gspread.service_account(filename=self.credentials_path)
+        return gc.open_by_key(self.sheet_id).worksheets()
 
 
-def parse_google_sheet(ALLOWED_SHEETS=None):
+class LocalWorksheet:
+    """Лист, уже прочитанный в память (список строк из ячеек-строк)."""
+
+    def __init__(self, title, rows):
+        self.title = title
+        self._rows = rows
+
+    def get_all_values(self):
+        return [list(row) for row in self._rows]
+
+
+def sheet_title_to_filename(title: str) -> str:
+    """Имя CSV-файла для листа: «/» в названиях категорий экранируем."""
+    return title.replace("%", "%25").replace("/", "%2F") + ".csv"
+
+
+class LocalSheetSource(SheetSource):
     """
-    Загружает данные из Google Sheets и возвращает структуру:
+    Локальная копия таблицы в том же формате, что и Google Sheets:
+    - каталог с CSV-файлами, по одному на лист (имя файла = название листа,
+      см. ``sheet_title_to_filename``);
+    - или книга .xlsx (нужен ``openpyxl``).
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def worksheets(self):
+        if self.path.is_dir():
+            return self._read_csv_dir()
+        if self.path.suffix.lower() in (".xlsx", ".xlsm"):
+            return self._read_xlsx()
+        raise ValueError(f"Неизвестный формат локальной таблицы: {self.path}")
+
+    def _read_csv_dir(self):
+        sheets = []
+        for file in sorted(self.path.glob("*.csv")):
+            with open(file, "r", encoding="utf-8-sig", newline="") as f:
+                rows = list(csv.reader(f))
+            sheets.append(LocalWorksheet(unquote(file.stem), rows))
+        return sheets
+
+    def _read_xlsx(self):
+        try:
+            import openpyxl
+        except ImportError as exc:  # pragma: no cover — зависит от окружения
+            raise RuntimeError("Для чтения .xlsx установите openpyxl") from exc
+
+        wb = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        sheets = []
+        for ws in wb.worksheets:
+            rows = [
+                ["" if cell is None else str(cell) for cell in row]
+                for row in ws.iter_rows(values_only=True)
+            ]
+            sheets.append(LocalWorksheet(ws.title, rows))
+        wb.close()
+        return sheets
+
+
+def get_default_sheet_source() -> SheetSource:
+    """Локальная копия, если задан SHEETS_LOCAL_PATH, иначе Google Sheets."""
+    if SHEETS_LOCAL_PATH:
+        return LocalSheetSource(SHEETS_LOCAL_PATH)
+    return GoogleSheetSource()
+
+
+def parse_google_sheet(ALLOWED_SHEETS=None, source=None):
+    """
+    Загружает данные из Google Sheets (или другого ``SheetSource``)
+    и возвращает структуру:
     {
         "products": {...},  # словарь категорий и заводов
         "tariffs": [...]    # список тарифов машин
     }
     """
-    gc = gspread.service_account(filename=CREDENTIALS_PATH)
-    sh = gc.open_by_key(SHEET_ID)
+    if source is None:
+        source = get_default_sheet_source()
 
     parsed_products = {}
     parsed_tariffs = []
 
-    for worksheet in sh.worksheets():
+    for worksheet in source.worksheets():
         category_name = worksheet.title.strip()
         if ALLOWED_SHEETS and category_name not in ALLOWED_SHEETS:
-            print(f"⚙️ Пропускаем лист {category_name} — не входит в ALLOWED_SHEETS")
+            log.info("⚙️ Пропускаем лист %s — не входит в ALLOWED_SHEETS", category_name)
             continue
 
-        print(f"📄 Загружаем лист: {category_name}")
+        log.info("📄 Загружаем лист: %s", category_name)
         data = worksheet.get_all_values()
 
         if not data or len(data) < 3:
-            print(f"⚠️ Пропущен лист {category_name} — слишком мало строк.")
+            log.warning("⚠️ Пропущен лист %s — слишком мало строк.", category_name)
             continue
 
         if category_name.lower() == "vehicles":
@@ -65,15 +169,15 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
                     }
                     vehicles.append(vehicle)
                 except Exception as e:
-                    print(f"⚠️ Ошибка парсинга строки в Vehicles: {e}")
+                    log.warning("⚠️ Ошибка парсинга строки в Vehicles: %s", e)
             parsed_tariffs.extend(vehicles)
-            print(f"🚛 Vehicles: добавлено {len(vehicles)} тарифов")
+            log.info("🚛 Vehicles: добавлено %s тарифов", len(vehicles))
             continue
 
 
         # === Парсинг товаров и заводов ===
         if len(data) < 5:
-            print(f"⚠️ Пропущен лист {category_name} — недостаточно строк для парсинга.")
+            log.warning("⚠️ Пропущен лист %s — недостаточно строк для парсинга.", category_name)
             continue
 
         weights_row = data[0]
@@ -145,7 +249,7 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
                 })
 
         parsed_products[category_name] = category_items
-        print(f"🔹 {category_name}: добавлено {len(category_items)} связок 'товар+завод'")
+        log.info("🔹 %s: добавлено %s связок 'товар+завод'", category_name, len(category_items))
 
     return {"products": parsed_products, "tariffs": parsed_tariffs}
 
@@ -186,10 +290,3 @@ def _to_float(x):
         return float(str(x).replace(" ", "").replace("\xa0", "").replace(",", "."))
     except Exception:
         return 0.0
-
-
-# === Гео-хелперы ===
-
-@lru_cache(maxsize=2000)
-def get_cached_distance(lat1, lon1, lat2, lon2):
-    return round(get_osrm_distance_km(lon1, lat1, lon2, lat2), 2)
\ No newline at end of file
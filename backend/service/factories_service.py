@@ -1,9 +1,9 @@
 import os
-import gspread
 from dotenv import load_dotenv
-from backend.service.osrm_client import get_osrm_distance_km
+from backend.core.logger import get_logger
 
 load_dotenv()
+log = get_logger("factories_service")
 
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")
 CREDENTIALS_PATH = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
@@ -18,6 +18,8 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
         "vehicles": [...]
     }
     """
+    import gspread  # тяжёлый импорт (google-auth, requests) — только при загрузке таблицы
+
     gc = gspread.service_account(filename=CREDENTIALS_PATH)
     sh = gc.open_by_key(SHEET_ID)
 
@@ -26,14 +28,14 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
     for worksheet in sh.worksheets():
         category_name = worksheet.title.strip()
         if ALLOWED_SHEETS and category_name not in ALLOWED_SHEETS:
-            print(f"⚙️ Пропускаем лист {category_name} — не входит в ALLOWED_SHEETS")
+            log.info("⚙️ Пропускаем лист %s — не входит в ALLOWED_SHEETS", category_name)
             continue
 
-        print(f"📄 Загружаем лист: {category_name}")
+        log.info("📄 Загружаем лист: %s", category_name)
         data = worksheet.get_all_values()
 
         if len(data) < 6 and category_name.lower() != "vehicles":
-            print(f"⚠️ Пропущен лист {category_name} — слишком мало строк.")
+            log.warning("⚠️ Пропущен лист %s — слишком мало строк.", category_name)
             continue
 
         # === Парсинг тарифов (Vehicles) ===
@@ -54,9 +56,9 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
                     }
                     vehicles.append(vehicle)
                 except Exception as e:
-                    print(f"⚠️ Ошибка парсинга строки в Vehicles: {e}")
+                    log.warning("⚠️ Ошибка парсинга строки в Vehicles: %s", e)
             parsed_data["vehicles"] = vehicles
-            print(f"🚛 Vehicles: добавлено {len(vehicles)} тарифов")
+            log.info("🚛 Vehicles: добавлено %s тарифов", len(vehicles))
             continue
 
         # === Парсинг товаров и заводов ===
@@ -119,14 +121,12 @@ def parse_google_sheet(ALLOWED_SHEETS=None):
                 })
 
         parsed_data[category_name] = category_items
-        print(f"🔹 {category_name}: добавлено {len(category_items)} связок 'товар+завод'")
+        log.info("🔹 %s: добавлено %s связок 'товар+завод'", category_name, len(category_items))
 
     return parsed_data
 
 
 
-from functools import lru_cache
-
 # === ПРОСТЫЕ ХЕЛПЕРЫ ======================================================
 
 def _norm_str(s):
@@ -163,13 +163,6 @@ def _detect_standard_for_factory_items(name: str) -> str:
     return ""
 
 
-# === РАССТОЯНИЕ ===========================================================
-
-@lru_cache(maxsize=2000)
-def get_cached_distance(lat1, lon1, lat2, lon2):
-    """Дорожное расстояние через OSRM."""
-    return round(get_osrm_distance_km(lon1, lat1, lon2, lat2), 2)
-
 # === ТАРИФЫ (ПРОСТАЯ ОБЁРТКА) ============================================
 
 _CURRENT_TARIFFS = []
@@ -182,7 +175,7 @@ def set_current_tariffs(tariffs):
 def calculate_tariff_cost(tag, distance_km, load_ton):
     """Простейший расчёт тарифа по совпадению тега."""
     if not _CURRENT_TARIFFS:
-        print("⚠️ Нет доступных тарифов для расчёта.")
+        log.warning("⚠️ Нет доступных тарифов для расчёта.")
         return None, None
 
     candidates = [
@@ -192,7 +185,7 @@ def calculate_tariff_cost(tag, distance_km, load_ton):
     ]
 
     if not candidates:
-        print(f"⚠️ Нет подходящих тарифов для тега '{tag}' при дистанции {distance_km} км.")
+        log.warning("⚠️ Нет подходящих тарифов для тега '%s' при дистанции %s км.", tag, distance_km)
         return None, None
 
     best = min(
@@ -1,26 +1,287 @@
-"""Вычисление чисел Фибоначчи для вспомогательных эндпоинтов."""
+"""Вычисление чисел Фибоначчи для вспомогательных эндпоинтов.
+
+Первые ``FIBONACCI_TABLE_SIZE`` чисел считаются один раз на процесс и
+хранятся в общей таблице вместе с готовым JSON-текстом: ответ на
+``/api/fibonacci?count=N`` — срез этого текста без пересчёта и без
+преобразования больших целых в строки. Отдельные ``F(n)`` за пределами
+таблицы (и по модулю) считаются быстрым удвоением за O(log n) умножений.
+
+Длинные диапазоны отдаются потоком (``iter_fibonacci_json``): числа
+складываются сразу в ``decimal.Decimal``, где сложение и вывод в строку
+линейны по числу цифр, — без квадратичного ``int → str`` на каждом шаге
+и без материализации всего списка.
+"""
 from __future__ import annotations
 
-from typing import List
+import decimal
+import math
+import os
+import threading
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
 
+# Сколько первых чисел держать в общей таблице (они же — предел count)
+FIBONACCI_TABLE_SIZE = int(os.getenv("FIBONACCI_TABLE_SIZE", "1000"))
+# Предел n для F(n) без модуля: F(20000) — ~4200 цифр, дальше упираемся
+# в лимит Python на преобразование int → str (sys.get_int_max_str_digits)
+FIBONACCI_MAX_N = int(os.getenv("FIBONACCI_MAX_N", "20000"))
+# Размер куска потокового ответа (байт): меньше — чаще отдаём клиенту
+FIBONACCI_STREAM_CHUNK = int(os.getenv("FIBONACCI_STREAM_CHUNK", "65536"))
 
-def fibonacci_sequence(count: int) -> List[int]:
-    """Возвращает последовательность Фибоначчи длиной ``count``.
 
-    Используется итеративный подход, чтобы избежать переполнения стека и
-    обеспечить предсказуемое время выполнения даже для больших ``count``.
-    Значение ``count`` должно быть положительным.
+class FibonacciTable:
+    """
+    Префикс последовательности: значения ``values`` и их JSON-текст ``body``
+    (числа через запятую). ``offsets[i]`` — конец числа ``F(i)`` в ``body``,
+    поэтому текст первых ``count`` чисел — ``body[:offsets[count - 1]]``.
     """
 
+    __slots__ = ("values", "body", "offsets", "_view")
+
+    def __init__(self, size: int):
+        size = max(2, size)
+        values = [0, 1]
+        for _ in range(2, size):
+            values.append(values[-1] + values[-2])
+
+        parts = [str(v).encode("ascii") for v in values]
+        offsets = array("Q")
+        end = -1
+        for part in parts:
+            end += len(part) + 1
+            offsets.append(end)
+
+        self.values: Tuple[int, ...] = tuple(values)
+        self.body = b",".join(parts)
+        self.offsets = offsets
+        self._view = memoryview(self.body)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def json_prefix(self, count: int) -> memoryview:
+        """JSON-текст первых ``count`` чисел (без скобок) — срез без копирования."""
+        return self._view[: self.offsets[count - 1]]
+
+    def json_value(self, index: int) -> memoryview:
+        """JSON-текст одного числа ``F(index)``."""
+        start = self.offsets[index - 1] + 1 if index else 0
+        return self._view[start: self.offsets[index]]
+
+
+_table: Optional[FibonacciTable] = None
+_table_lock = threading.Lock()
+
+
+def fibonacci_table() -> FibonacciTable:
+    """Общая на процесс таблица; строится при первом обращении."""
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = FibonacciTable(FIBONACCI_TABLE_SIZE)
+    return _table
+
+
+def _validate_count(count: int) -> None:
     if count <= 0:
         raise ValueError("Количество чисел должно быть положительным")
 
-    sequence = [0]
-    if count == 1:
-        return sequence
 
-    sequence.append(1)
-    for _ in range(2, count):
+def fibonacci_sequence(count: int) -> List[int]:
+    """Возвращает последовательность Фибоначчи длиной ``count``.
+
+    Значения в пределах таблицы берутся из неё, остальные досчитываются
+    итеративно. Значение ``count`` должно быть положительным.
+    """
+
+    _validate_count(count)
+    table = fibonacci_table()
+    sequence = list(table.values[:count])
+    while len(sequence) < count:
         sequence.append(sequence[-1] + sequence[-2])
+    return sequence
+
+
+def render_sequence(count: int) -> bytes:
+    """
+    Готовое тело ответа ``/api/fibonacci`` для ``count`` в пределах таблицы —
+    те же байты, что дал бы JSON-энкодер на ``{"count", "sequence", "last"}``.
+    """
+
+    _validate_count(count)
+    table = fibonacci_table()
+    if count > len(table):
+        raise ValueError(f"count больше таблицы ({len(table)})")
+    return b"".join((
+        b'{"count":%d,"sequence":[' % count,
+        table.json_prefix(count),
+        b'],"last":',
+        table.json_value(count - 1),
+        b"}",
+    ))
+
+
+def _fast_doubling(n: int, mod: Optional[int]) -> Tuple[int, int]:
+    """(F(n), F(n+1)) по формулам F(2k) = F(k)(2F(k+1) − F(k)), F(2k+1) = F(k)² + F(k+1)²."""
+    a, b = 0, 1
+    for bit in bin(n)[2:]:
+        c = a * (2 * b - a)
+        d = a * a + b * b
+        if mod is not None:
+            c %= mod
+            d %= mod
+        if bit == "1":
+            a, b = d, c + d
+            if mod is not None:
+                b %= mod
+        else:
+            a, b = c, d
+    return a, b
+
+
+def fibonacci(n: int, mod: Optional[int] = None) -> int:
+    """
+    ``F(n)``, а при заданном ``mod`` — ``F(n) mod mod``. Без модуля ``n``
+    ограничено ``FIBONACCI_MAX_N``; по модулю — только размером целого.
+    """
+
+    if n < 0:
+        raise ValueError("Номер числа должен быть неотрицательным")
+    if mod is not None and mod < 1:
+        raise ValueError("Модуль должен быть положительным")
+
+    table = fibonacci_table()
+    if n < len(table):
+        value = table.values[n]
+        return value % mod if mod is not None else value
+    if mod is None and n > FIBONACCI_MAX_N:
+        raise ValueError(f"Без mod номер ограничен {FIBONACCI_MAX_N}")
+    return _fast_doubling(n, mod)[0]
+
+
+# === ПОТОКОВАЯ ВЫДАЧА ===
+
+# Десятичных цифр на единицу номера: F(n) ≈ φⁿ/√5
+_DIGITS_PER_INDEX = math.log10((1 + math.sqrt(5)) / 2)
+
+
+def estimate_range_digits(start: int, count: int) -> int:
+    """Оценка суммарного числа цифр в ``F(start) … F(start + count - 1)`` (с запасом в одну цифру на число)."""
+    mean_index = start + (count - 1) / 2
+    return math.ceil(count * (1 + _DIGITS_PER_INDEX * mean_index))
+
+
+# Ниже этого числа бит Decimal строится напрямую из int
+_DECIMAL_DIRECT_BITS = 512
+
+
+def _exact_context() -> decimal.Context:
+    """Контекст без округления: сложение и умножение целых Decimal точные."""
+    return decimal.Context(
+        prec=decimal.MAX_PREC, Emax=decimal.MAX_EMAX, Emin=decimal.MIN_EMIN, traps=[decimal.Inexact]
+    )
+
+
+def int_to_decimal(value: int) -> decimal.Decimal:
+    """
+    Неотрицательное целое → ``Decimal`` «разделяй и властвуй»: число режется
+    на двоичные половины (сдвиги — линейно), половины собираются обратно
+    умножением на степени двойки в Decimal (у libmpdec оно субквадратичное).
+    Обходит и квадратичный ``str(int)``, и лимит ``sys.get_int_max_str_digits``.
+    """
+    if value < 0:
+        raise ValueError("Ожидается неотрицательное число")
+    powers: Dict[int, decimal.Decimal] = {}
+
+    def pow2(bits: int) -> decimal.Decimal:
+        result = powers.get(bits)
+        if result is None:
+            if bits <= _DECIMAL_DIRECT_BITS:
+                result = decimal.Decimal(1 << bits)
+            else:
+                half = bits >> 1
+                result = pow2(half) * pow2(bits - half)
+            powers[bits] = result
+        return result
+
+    def convert(n: int, bits: int) -> decimal.Decimal:
+        if bits <= _DECIMAL_DIRECT_BITS:
+            return decimal.Decimal(n)
+        half = bits >> 1
+        hi = n >> half
+        lo = n - (hi << half)
+        return convert(hi, bits - half) * pow2(half) + convert(lo, half)
+
+    with decimal.localcontext(_exact_context()):
+        return convert(value, value.bit_length())
+
+
+def int_to_str(value: int) -> str:
+    """Десятичная запись целого любой длины (см. ``int_to_decimal``)."""
+    if -(1 << _DECIMAL_DIRECT_BITS) < value < (1 << _DECIMAL_DIRECT_BITS):
+        return str(value)
+    if value < 0:
+        return "-" + int_to_str(-value)
+    return str(int_to_decimal(value))
+
+
+def iter_fibonacci_text(start: int, count: int) -> Iterator[str]:
+    """
+    Десятичные записи ``F(start) … F(start + count - 1)`` по одной.
+    В памяти одновременно только два соседних числа и текущая строка.
+    """
+    if start < 0:
+        raise ValueError("Номер числа должен быть неотрицательным")
+    _validate_count(count)
+
+    table = fibonacci_table()
+    if start + 1 < len(table):
+        a_int, b_int = table.values[start], table.values[start + 1]
+    else:
+        a_int, b_int = _fast_doubling(start, None)
+
+    context = _exact_context()
+    a, b = int_to_decimal(a_int), int_to_decimal(b_int)
+    del a_int, b_int
+    for _ in range(count):
+        yield str(a)
+        a, b = b, context.add(a, b)
+
+
+def iter_fibonacci_json(start: int, count: int, fmt: str = "ndjson") -> Iterator[bytes]:
+    """
+    Потоковое тело ответа кусками около ``FIBONACCI_STREAM_CHUNK`` байт.
+
+    ``ndjson`` — строка ``{"n":…,"value":…}`` на число;
+    ``json`` — один массив ``[F(start),…]``, выдаваемый по частям.
+    """
+    if fmt not in ("ndjson", "json"):
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+    parts: List[str] = []
+    size = 0
+    if fmt == "json":
+        parts.append("[")
+    for offset, text in enumerate(iter_fibonacci_text(start, count)):
+        if fmt == "ndjson":
+            item = f'{{"n":{start + offset},"value":{text}}}\n'
+        else:
+            item = text if offset == 0 else "," + text
+        parts.append(item)
+        size += len(item)
+        if size >= FIBONACCI_STREAM_CHUNK:
+            yield "".join(parts).encode("ascii")
+            parts, size = [], 0
+    if fmt == "json":
+        parts.append("]")
+    if parts:
+        yield "".join(parts).encode("ascii")
+
+
+def _reset_after_fork() -> None:
+    global _table_lock
+    _table_lock = threading.Lock()
+
 
-    return sequence
\ No newline at end of file
+os.register_at_fork(after_in_child=_reset_after_fork)
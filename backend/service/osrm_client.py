@@ -1,9 +1,22 @@
 import logging
 import os
+import threading
 import time
-from typing import Optional
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-import requests
+from backend.core.metrics import (
+    OSRM_CIRCUIT_STATE,
+    OSRM_FAILURES,
+    OSRM_HEDGED,
+    OSRM_OUTSTANDING,
+    OSRM_RATE_LIMITED,
+    OSRM_REQUEST_LATENCY,
+    OSRM_RETRIES,
+    OSRM_SHORT_CIRCUITED,
+)
+from backend.core.tracing import incr, span
 
 logger = logging.getLogger(__name__)
 
@@ -12,41 +25,618 @@ class OSRMUnavailableError(RuntimeError):
     """Сигнализирует о недоступности сервиса OSRM."""
 
 
+class OSRMCircuitOpenError(OSRMUnavailableError):
+    """OSRM недавно падал подряд — запрос отклонён без обращения к сети."""
+
+
+class OSRMRateLimitedError(OSRMUnavailableError):
+    """Превышен общий лимит запросов к OSRM (OSRM_RATE_LIMIT_RPS)."""
+
+
+class _OSRMRejectedError(OSRMUnavailableError):
+    """OSRM ответил 4xx — сервер жив, повторять запрос бессмысленно."""
+
+
 # Позволяем переопределять URL через переменную окружения, чтобы
 # на проде указывать собственный инстанс OSRM.
 OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "https://router.project-osrm.org")
+# Несколько инстансов через запятую; если задано — OSRM_BASE_URL не используется
+OSRM_BASE_URLS = [
+    url.strip().rstrip("/") for url in os.getenv("OSRM_BASE_URLS", "").split(",") if url.strip()
+]
+
+# Источник расстояний: osrm | haversine | replay (см. distance_providers)
+DISTANCE_PROVIDER = os.getenv("DISTANCE_PROVIDER", "osrm")
+
+# Предохранитель: сколько неудач подряд размыкают цепь и через сколько секунд пробуем снова
+OSRM_BREAKER_FAILURES = int(os.getenv("OSRM_BREAKER_FAILURES", "5"))
+OSRM_BREAKER_RESET_S = float(os.getenv("OSRM_BREAKER_RESET_S", "30"))
+# Границы адаптивного таймаута (выводится из EWMA латентности)
+OSRM_TIMEOUT_MIN_S = float(os.getenv("OSRM_TIMEOUT_MIN_S", "0.5"))
+OSRM_TIMEOUT_MAX_S = float(os.getenv("OSRM_TIMEOUT_MAX_S", "5.0"))
+# Общий лимит запросов ко всем бэкендам (0 — без лимита) и сколько можно ждать токен
+OSRM_RATE_LIMIT_RPS = float(os.getenv("OSRM_RATE_LIMIT_RPS", "0"))
+OSRM_RATE_LIMIT_WAIT_S = float(os.getenv("OSRM_RATE_LIMIT_WAIT_S", "1.0"))
+# Дублировать запрос на другой бэкенд, если ответа нет дольше p95 латентности
+OSRM_HEDGE = os.getenv("OSRM_HEDGE", "1").lower() in ("1", "true", "yes")
+# Активная проверка бэкендов раз в N секунд (0 — только по результатам запросов)
+OSRM_HEALTHCHECK_INTERVAL_S = float(os.getenv("OSRM_HEALTHCHECK_INTERVAL_S", "0"))
+OSRM_HEALTHCHECK_COORD = os.getenv("OSRM_HEALTHCHECK_COORD", "37.6173,55.7558")
+# Передавать в /route и /table заранее вычисленные привязки заводов к графу (/nearest);
+# выключено по умолчанию: привязка — по запросу /nearest на каждый завод при загрузке каталога
+OSRM_SNAP_HINTS = os.getenv("OSRM_SNAP_HINTS", "0").lower() in ("1", "true", "yes")
+# Сколько запросов /nearest выполняется одновременно при привязке каталога
+OSRM_SNAP_HINTS_CONCURRENCY = max(1, int(os.getenv("OSRM_SNAP_HINTS_CONCURRENCY", "4")))
+
+_OSRM_ATTEMPTS = 3
+_OSRM_RETRY_PAUSE_S = 0.3
+# p95 считается по последним запросам; до набора выборки дубли не шлём
+_LATENCY_WINDOW = 200
+_HEDGE_MIN_SAMPLES = 20
+
+Coord = Tuple[float, float]  # (lon, lat) — порядок как в OSRM
+
+
+# === ПРЕДОХРАНИТЕЛЬ И АДАПТИВНЫЙ ТАЙМАУТ ===
+
+class CircuitBreaker:
+    """
+    Классический предохранитель closed → open → half_open:
+    после ``failure_threshold`` неудач подряд запросы отклоняются сразу,
+    через ``reset_timeout_s`` пропускается один пробный запрос.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    _STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        reset_timeout_s: float,
+        clock=time.monotonic,
+        name: str = "osrm",
+    ):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout_s = reset_timeout_s
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def allow_request(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout_s:
+                    return False
+                self._set_state(self.HALF_OPEN)
+            # half_open: пропускаем ровно один пробный запрос
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._state != self.CLOSED:
+                logger.info("OSRM %s снова доступен — предохранитель замкнут", self.name)
+                self._set_state(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                logger.warning(
+                    "OSRM %s: %s неудач подряд — предохранитель разомкнут на %s с",
+                    self.name,
+                    self._failures,
+                    self.reset_timeout_s,
+                )
+                self._opened_at = self._clock()
+                self._set_state(self.OPEN)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {"state": self._state, "consecutive_failures": self._failures}
+
+    def _set_state(self, state: str) -> None:
+        self._state = state
+        OSRM_CIRCUIT_STATE.labels(backend=self.name).set(self._STATE_CODES[state])
+
+
+class LatencyEstimator:
+    """
+    EWMA латентности и её разброса (как RTO в TCP):
+    таймаут = среднее + 4 × отклонение, в границах [min_s, max_s].
+    Последние ``window`` замеров хранятся для перцентилей (порог дублирования).
+    """
+
+    def __init__(self, min_s: float, max_s: float, alpha: float = 0.2, window: int = _LATENCY_WINDOW):
+        self.min_s = min_s
+        self.max_s = max_s
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._mean: Optional[float] = None
+        self._dev = 0.0
+        self._recent: "deque[float]" = deque(maxlen=window)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._recent.append(seconds)
+            if self._mean is None:
+                self._mean = seconds
+                self._dev = seconds / 2
+                return
+            self._dev += self.alpha * (abs(seconds - self._mean) - self._dev)
+            self._mean += self.alpha * (seconds - self._mean)
+
+    @property
+    def mean(self) -> Optional[float]:
+        with self._lock:
+            return self._mean
+
+    def timeout(self) -> float:
+        with self._lock:
+            if self._mean is None:
+                return self.max_s
+            return min(self.max_s, max(self.min_s, self._mean + 4 * self._dev))
+
+    def percentile(self, q: float, min_samples: int = _HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """Перцентиль по последним замерам или ``None``, пока их мало."""
+        with self._lock:
+            if len(self._recent) < min_samples:
+                return None
+            ordered = sorted(self._recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        with self._lock:
+            return {"ewma_s": self._mean, "deviation_s": self._dev}
+
+
+class TokenBucket:
+    """Общий лимит запросов в секунду; ``burst`` — сколько можно отправить разом."""
 
+    def __init__(self, rate: float, burst: Optional[float] = None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._updated = clock()
 
-def _request_osrm(url: str, timeout: float = 5.0) -> dict:
-    """Выполняет запрос к OSRM с небольшой ретри-логикой."""
-    last_error: Optional[Exception] = None
-    for attempt in range(3):
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def acquire(self, max_wait_s: float) -> bool:
+        """Ждёт токен не дольше ``max_wait_s``; False — лимит исчерпан."""
+        deadline = self._clock() + max_wait_s
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait_s = (1 - self._tokens) / self.rate
+            if self._clock() + wait_s > deadline:
+                return False
+            time.sleep(wait_s)
+
+
+# === БЭКЕНДЫ OSRM ===
+
+class OSRMBackend:
+    """Один инстанс OSRM: свой предохранитель, оценка латентности и счётчики."""
+
+    def __init__(self, base_url: str, clock=time.monotonic):
+        self.base_url = base_url.rstrip("/")
+        self.breaker = CircuitBreaker(OSRM_BREAKER_FAILURES, OSRM_BREAKER_RESET_S, clock, name=self.base_url)
+        self.latency = LatencyEstimator(OSRM_TIMEOUT_MIN_S, OSRM_TIMEOUT_MAX_S)
+        self._lock = threading.Lock()
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        self.hedges_won = 0
+        self._outstanding_gauge = OSRM_OUTSTANDING.labels(backend=self.base_url)
+
+    def get(self, path: str, timeout: Optional[float] = None) -> dict:
+        """GET ``base_url + path`` с учётом в предохранителе и статистике бэкенда."""
+        # requests импортируется при первом обращении к OSRM, а не при старте приложения;
+        # до учёта запроса в полёте — ошибка импорта не оставит счётчики завышенными
+        import requests
+
+        with self._lock:
+            self.outstanding += 1
+            self.requests += 1
+        self._outstanding_gauge.inc()
+        started = time.perf_counter()
         try:
-            resp = requests.get(url, timeout=timeout)
+            resp = requests.get(self.base_url + path, timeout=timeout or self.latency.timeout())
             resp.raise_for_status()
-            return resp.json()
-        except Exception as exc:  # noqa: PERF203 — оставляем ради отладки
-            last_error = exc
-            logger.warning("OSRM попытка %s не удалась: %s", attempt + 1, exc)
-            time.sleep(0.3)
+            data = resp.json()
+        except requests.HTTPError as exc:
+            self._observe("error", started)
+            if exc.response is not None and exc.response.status_code < 500:
+                self.breaker.record_success()
+                raise _OSRMRejectedError(f"OSRM отклонил запрос: {exc}") from exc
+            self._record_error()
+            raise
+        except Exception:
+            self._observe("error", started)
+            self._record_error()
+            raise
+        else:
+            self.latency.observe(self._observe("ok", started))
+            self.breaker.record_success()
+            return data
+        finally:
+            with self._lock:
+                self.outstanding -= 1
+            self._outstanding_gauge.dec()
 
-    raise OSRMUnavailableError(f"OSRM недоступен: {last_error}")
+    def _observe(self, outcome: str, started: float) -> float:
+        elapsed = time.perf_counter() - started
+        OSRM_REQUEST_LATENCY.labels(backend=self.base_url, outcome=outcome).observe(elapsed)
+        return elapsed
 
+    def _record_error(self) -> None:
+        with self._lock:
+            self.errors += 1
+        self.breaker.record_failure()
 
-def get_osrm_distance_km(
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            counters = {
+                "outstanding": self.outstanding,
+                "requests": self.requests,
+                "errors": self.errors,
+                "hedges_won": self.hedges_won,
+            }
+        return {
+            "url": self.base_url,
+            **self.breaker.snapshot(),
+            **counters,
+            **self.latency.snapshot(),
+            "p95_s": self.latency.percentile(0.95, min_samples=1),
+            "timeout_s": self.latency.timeout(),
+        }
+
+
+_hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="osrm-hedge")
+
+
+class OSRMBackendPool:
+    """
+    Балансировка между инстансами OSRM: запрос уходит на исправный бэкенд
+    с наименьшим числом ожидающих ответа запросов (при равенстве — с меньшей
+    латентностью), повтор — на другой бэкенд. Если ответа нет дольше p95
+    латентности выбранного бэкенда, тот же запрос дублируется на соседний
+    и берётся первый ответ.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        rate_limit_rps: float = OSRM_RATE_LIMIT_RPS,
+        hedge: bool = OSRM_HEDGE,
+        healthcheck_interval_s: float = OSRM_HEALTHCHECK_INTERVAL_S,
+    ):
+        self.urls = tuple(urls)
+        self.backends = [OSRMBackend(url) for url in self.urls]
+        self.rate_limiter = TokenBucket(rate_limit_rps) if rate_limit_rps > 0 else None
+        self.hedge = hedge and len(self.backends) > 1
+        if healthcheck_interval_s > 0:
+            threading.Thread(
+                target=self._healthcheck_loop,
+                args=(healthcheck_interval_s,),
+                name="osrm-healthcheck",
+                daemon=True,
+            ).start()
+
+    def pick(self, exclude: Sequence[OSRMBackend] = ()) -> Optional[OSRMBackend]:
+        """Наименее загруженный бэкенд, чей предохранитель пропускает запрос."""
+        candidates = sorted(
+            (b for b in self.backends if b not in exclude),
+            key=lambda b: (
+                b.breaker.state != CircuitBreaker.CLOSED,
+                b.outstanding,
+                b.latency.mean or 0.0,
+            ),
+        )
+        for backend in candidates:
+            if backend.breaker.allow_request():
+                return backend
+        return None
+
+    def request(self, path: str, timeout: Optional[float] = None) -> dict:
+        last_error: Optional[Exception] = None
+        tried: List[OSRMBackend] = []
+        for attempt in range(_OSRM_ATTEMPTS):
+            if self.rate_limiter is not None and not self.rate_limiter.acquire(OSRM_RATE_LIMIT_WAIT_S):
+                incr("osrm_rate_limited")
+                OSRM_RATE_LIMITED.inc()
+                raise OSRMRateLimitedError("Превышен лимит запросов к OSRM")
+
+            backend = self.pick(exclude=tried) or self.pick()
+            if backend is None:
+                incr("osrm_short_circuited")
+                OSRM_SHORT_CIRCUITED.inc()
+                if last_error is None:
+                    raise OSRMCircuitOpenError("OSRM временно недоступен (предохранитель разомкнут)")
+                break
+            tried.append(backend)
+
+            incr("osrm_calls")
+            if attempt:
+                incr("osrm_retries")
+                OSRM_RETRIES.inc()
+            try:
+                with span("osrm"):
+                    return self._send(backend, path, timeout)
+            except _OSRMRejectedError:
+                raise
+            except Exception as exc:  # noqa: PERF203 — оставляем ради отладки
+                last_error = exc
+
+            logger.warning("OSRM %s: попытка %s не удалась: %s", backend.base_url, attempt + 1, last_error)
+            # пауза нужна, только если все бэкенды уже пробовали
+            if attempt + 1 < _OSRM_ATTEMPTS and len(set(tried)) >= len(self.backends):
+                time.sleep(_OSRM_RETRY_PAUSE_S)
+
+        OSRM_FAILURES.inc()
+        raise OSRMUnavailableError(f"OSRM недоступен: {last_error}")
+
+    def _send(self, backend: OSRMBackend, path: str, timeout: Optional[float]) -> dict:
+        hedge_after = backend.latency.percentile(0.95) if self.hedge else None
+        if hedge_after is None:
+            return backend.get(path, timeout)
+
+        primary = _hedge_executor.submit(backend.get, path, timeout)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        # дубль тоже расходует общий лимит; нет токена — просто ждём основной ответ
+        if self.rate_limiter is not None and not self.rate_limiter.try_acquire():
+            return primary.result()
+        spare = self.pick(exclude=[backend])
+        if spare is None:
+            return primary.result()
+
+        incr("osrm_hedged")
+        OSRM_HEDGED.labels(result="sent").inc()
+        hedged = _hedge_executor.submit(spare.get, path, timeout)
+        pending = {primary, hedged}
+        first_error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is not None:
+                    first_error = first_error or error
+                    continue
+                if future is hedged:
+                    OSRM_HEDGED.labels(result="won").inc()
+                    with spare._lock:
+                        spare.hedges_won += 1
+                return future.result()
+        raise first_error
+
+    def check_health(self) -> None:
+        """Пробный маршрут нулевой длины к каждому бэкенду, в обход предохранителя."""
+        path = f"/route/v1/driving/{OSRM_HEALTHCHECK_COORD};{OSRM_HEALTHCHECK_COORD}?overview=false"
+        for backend in self.backends:
+            try:
+                backend.get(path, timeout=OSRM_TIMEOUT_MAX_S)
+            except Exception as exc:  # noqa: BLE001 — результат уже учтён в предохранителе
+                logger.warning("OSRM %s не прошёл проверку: %s", backend.base_url, exc)
+
+    def _healthcheck_loop(self, interval_s: float) -> None:
+        while True:
+            time.sleep(interval_s)
+            self.check_health()
+
+    def snapshot(self) -> Dict[str, object]:
+        return {
+            "backends": [b.snapshot() for b in self.backends],
+            "rate_limit_rps": self.rate_limiter.rate if self.rate_limiter else None,
+            "hedging": self.hedge,
+        }
+
+
+_pool: Optional[OSRMBackendPool] = None
+_pool_lock = threading.Lock()
+
+
+def configured_osrm_urls() -> Tuple[str, ...]:
+    return tuple(OSRM_BASE_URLS) or (OSRM_BASE_URL.rstrip("/"),)
+
+
+def get_backend_pool() -> OSRMBackendPool:
+    """Пул бэкендов; пересоздаётся, если список URL поменяли (тесты, бенчмарки)."""
+    global _pool
+    urls = configured_osrm_urls()
+    with _pool_lock:
+        if _pool is None or _pool.urls != urls:
+            _pool = OSRMBackendPool(urls)
+        return _pool
+
+
+def _reset_after_fork() -> None:
+    """
+    Потоки родителя (проверки здоровья, исполнитель дублей) в дочернем
+    процессе не существуют: пул и исполнитель создаются заново.
+    """
+    global _hedge_executor, _pool, _pool_lock, _hints_lock
+    _hedge_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="osrm-hedge")
+    _pool = None
+    _pool_lock = threading.Lock()
+    _hints_lock = threading.Lock()
+    _hints_refreshing.clear()
+
+
+def osrm_health() -> Dict[str, object]:
+    """Состояние, латентность и счётчики ошибок каждого бэкенда OSRM."""
+    return get_backend_pool().snapshot()
+
+
+def _request_osrm(path: str, timeout: Optional[float] = None) -> dict:
+    """
+    Запрос ``path`` (например ``/route/v1/...``) к одному из бэкендов OSRM.
+    Таймаут по умолчанию выводится из латентности бэкенда; если все
+    предохранители разомкнуты, бросает OSRMCircuitOpenError, не трогая сеть.
+    """
+    return get_backend_pool().request(path, timeout)
+
+
+# === ПОДСКАЗКИ ПРИВЯЗКИ К ГРАФУ (hints) ===
+# Заводы между перезагрузками не двигаются: привязку к дороге считаем один раз
+# через /nearest и передаём её в hints=, чтобы OSRM не искал ближайшее ребро заново.
+
+_hints: Dict[Coord, str] = {}
+_hints_lock = threading.Lock()
+_hints_refreshing: set = set()
+# Отклонённые OSRM hints: не принимаем их повторно из сохранённого каталога
+_rejected_hints: set = set()
+
+
+def _hint_key(lon: float, lat: float) -> Coord:
+    return (round(float(lon), 5), round(float(lat), 5))
+
+
+def register_hints(hints: Dict[Coord, str]) -> None:
+    """Запоминает hints для координат (lon, lat)."""
+    with _hints_lock:
+        for (lon, lat), hint in hints.items():
+            if hint and hint not in _rejected_hints:
+                _hints[_hint_key(lon, lat)] = hint
+
+
+def get_hint(lon: float, lat: float) -> Optional[str]:
+    with _hints_lock:
+        return _hints.get(_hint_key(lon, lat))
+
+
+def clear_hints() -> None:
+    with _hints_lock:
+        _hints.clear()
+        _rejected_hints.clear()
+
+
+def osrm_nearest_hint(lon: float, lat: float) -> Optional[str]:
+    """Привязка точки к дорожному графу через ``/nearest`` (строка hint OSRM)."""
+    data = _request_osrm(f"/nearest/v1/driving/{lon},{lat}?number=1")
+    waypoints = data.get("waypoints") or []
+    return waypoints[0].get("hint") if waypoints else None
+
+
+def resolve_snap_hints(coords: Iterable[Coord]) -> Dict[Coord, str]:
+    """
+    Hints для набора точек. Если OSRM недоступен, возвращает то, что успели
+    получить: без hints расчёт работает как раньше, просто дороже для OSRM.
+    """
+    hints: Dict[Coord, str] = {}
+    points = list(dict.fromkeys(coords))
+    if not points:
+        return hints
+    # /nearest — по запросу на точку; не больше OSRM_SNAP_HINTS_CONCURRENCY одновременно
+    executor = ThreadPoolExecutor(
+        max_workers=min(OSRM_SNAP_HINTS_CONCURRENCY, len(points)), thread_name_prefix="osrm-nearest"
+    )
+    try:
+        futures = [executor.submit(osrm_nearest_hint, lon, lat) for lon, lat in points]
+        for point, future in zip(points, futures):
+            try:
+                hint = future.result()
+            except OSRMUnavailableError as exc:
+                logger.warning("OSRM: hints получены не для всех точек (готово %s): %s", len(hints), exc)
+                break
+            if hint:
+                hints[point] = hint
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    return hints
+
+
+def _refresh_hints(coords: List[Coord]) -> None:
+    try:
+        register_hints(resolve_snap_hints(coords))
+    finally:
+        with _hints_lock:
+            _hints_refreshing.difference_update(_hint_key(*c) for c in coords)
+
+
+def _invalidate_hints(coords: Sequence[Coord]) -> None:
+    """Сбрасывает отклонённые hints и в фоне запрашивает новые (OSRM обновил данные)."""
+    stale: List[Coord] = []
+    with _hints_lock:
+        for lon, lat in coords:
+            key = _hint_key(lon, lat)
+            hint = _hints.pop(key, None)
+            if hint is None:
+                continue
+            _rejected_hints.add(hint)
+            if key not in _hints_refreshing:
+                _hints_refreshing.add(key)
+                stale.append((lon, lat))
+    if stale:
+        logger.info("OSRM отклонил hints для %s точек — обновляем привязку", len(stale))
+        threading.Thread(target=_refresh_hints, args=(stale,), name="osrm-hints", daemon=True).start()
+
+
+def _request_with_hints(path: str, coords: Sequence[Coord]) -> dict:
+    """Запрос с hints= (если они известны); при отказе OSRM — повтор без них."""
+    hints = [get_hint(lon, lat) or "" for lon, lat in coords] if OSRM_SNAP_HINTS else []
+    if any(hints):
+        try:
+            return _request_osrm(f"{path}&hints={';'.join(hints)}")
+        except _OSRMRejectedError as exc:
+            logger.warning("OSRM: запрос с hints отклонён (%s), повторяем без них", exc)
+            _invalidate_hints([c for c, h in zip(coords, hints) if h])
+    return _request_osrm(path)
+
+
+def _format_coords(coords: Sequence[Coord]) -> str:
+    return ";".join(f"{lon},{lat}" for lon, lat in coords)
+
+
+def osrm_route_distance_km(
     lon_from: float,
     lat_from: float,
     lon_to: float,
     lat_to: float,
 ) -> float:
-    """Возвращает дорожное расстояние через OSRM в километрах."""
+    """Дорожное расстояние одним запросом ``/route`` к OSRM, в километрах."""
 
-    url = (
-        f"{OSRM_BASE_URL}/route/v1/driving/"
-        f"{lon_from},{lat_from};{lon_to},{lat_to}?overview=false"
-    )
+    path = f"/route/v1/driving/{lon_from},{lat_from};{lon_to},{lat_to}?overview=false"
 
-    data = _request_osrm(url)
+    data = _request_with_hints(path, [(lon_from, lat_from), (lon_to, lat_to)])
 
     routes = data.get("routes") or []
     if not routes:
@@ -62,4 +652,69 @@ def get_osrm_distance_km(
         return float(distance_m) / 1000.0
     except Exception as exc:  # noqa: PERF203 — единоразовая обработка
         logger.warning("OSRM: не удалось преобразовать distance: %s", exc)
-        raise OSRMUnavailableError("OSRM вернул некорректное расстояние") from exc
\ No newline at end of file
+        raise OSRMUnavailableError("OSRM вернул некорректное расстояние") from exc
+
+
+def osrm_table_distances_km(
+    sources: Sequence[Coord],
+    destinations: Sequence[Coord],
+) -> List[List[Optional[float]]]:
+    """
+    Матрица расстояний ``sources × destinations`` одним запросом ``/table``.
+    Недостижимые пары OSRM возвращает как null — отдаём их как ``None``.
+    """
+    if not sources or not destinations:
+        return [[] for _ in sources]
+
+    coords = list(sources) + list(destinations)
+    src_idx = ";".join(str(i) for i in range(len(sources)))
+    dst_idx = ";".join(str(i) for i in range(len(sources), len(coords)))
+    path = (
+        f"/table/v1/driving/{_format_coords(coords)}"
+        f"?sources={src_idx}&destinations={dst_idx}&annotations=distance"
+    )
+
+    data = _request_with_hints(path, coords)
+    matrix = data.get("distances")
+    if not matrix or len(matrix) != len(sources):
+        logger.warning("OSRM: некорректный ответ table: %s", data)
+        raise OSRMUnavailableError("OSRM вернул некорректную матрицу расстояний")
+
+    return [
+        [None if d is None else float(d) / 1000.0 for d in row]
+        for row in matrix
+    ]
+
+
+# === ПРОВАЙДЕР РАССТОЯНИЙ ===
+
+_provider = None
+
+
+def get_distance_provider():
+    """Текущий провайдер расстояний (создаётся по DISTANCE_PROVIDER при первом вызове)."""
+    global _provider
+    if _provider is None:
+        from backend.service.distance_providers import create_distance_provider
+
+        _provider = create_distance_provider(DISTANCE_PROVIDER)
+    return _provider
+
+
+def set_distance_provider(provider) -> None:
+    """Подменяет провайдер расстояний (тесты, бенчмарки, replay). ``None`` — сброс."""
+    global _provider
+    _provider = provider
+
+
+def get_osrm_distance_km(
+    lon_from: float,
+    lat_from: float,
+    lon_to: float,
+    lat_to: float,
+) -> float:
+    """Возвращает дорожное расстояние в километрах через текущий провайдер."""
+    return get_distance_provider().distance_km(lon_from, lat_from, lon_to, lat_to)
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
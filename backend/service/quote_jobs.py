@@ -0,0 +1,300 @@
+"""Фоновые задания расчёта /quote для тяжёлых заказов.
+
+``POST /api/quote/jobs`` кладёт запрос в очередь и сразу возвращает id;
+расчёт выполняет ограниченный пул потоков (``QUOTE_JOB_WORKERS``) тем же
+``calculate_quote``, что и синхронный маршрут, и пишет прогресс — сколько
+сценариев оценено из скольких.
+
+Очередь и результаты хранятся в SQLite (``QUOTE_JOBS_DB``, по умолчанию рядом
+с данными в storage), поэтому переживают перезапуск. Задание забирается
+транзакцией ``BEGIN IMMEDIATE``, так что воркеры ``backend.app.serve`` делят
+одну очередь; задания умершего процесса возвращаются в очередь.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from backend.core import data_loader
+from backend.core.logger import get_logger
+from backend.models.dto import QuoteRequest
+from backend.service.quote_service import calculate_quote
+
+log = get_logger("quote_jobs")
+
+# Файл базы заданий (по умолчанию — quote_jobs.sqlite3 в STORAGE_PATH)
+QUOTE_JOBS_DB = os.getenv("QUOTE_JOBS_DB")
+# Потоков-исполнителей на процесс
+QUOTE_JOB_WORKERS = int(os.getenv("QUOTE_JOB_WORKERS", "2"))
+# Сколько заданий может ждать в очереди; дальше — 503
+QUOTE_JOBS_MAX_QUEUED = int(os.getenv("QUOTE_JOBS_MAX_QUEUED", "100"))
+# Сколько секунд хранить завершённые задания
+QUOTE_JOBS_TTL_S = float(os.getenv("QUOTE_JOBS_TTL_S", "86400"))
+# Как часто исполнитель проверяет очередь, если его не разбудили (задания других процессов)
+_POLL_S = 1.0
+# Не чаще этого пишем прогресс в базу
+_PROGRESS_EVERY_S = 0.25
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+FINISHED = (STATUS_DONE, STATUS_FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS quote_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    view TEXT NOT NULL,
+    request TEXT NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    owner INTEGER,
+    done INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    http_status INTEGER,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS quote_jobs_queue ON quote_jobs (status, created);
+"""
+
+
+class QueueFull(Exception):
+    """Очередь заданий заполнена."""
+
+
+class JobStore:
+    """Таблица заданий в SQLite; соединение на каждую операцию — потоки и процессы не делят его."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def submit(self, payload: Dict[str, Any], view: str, max_queued: int = QUOTE_JOBS_MAX_QUEUED) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = conn.execute("SELECT COUNT(*) FROM quote_jobs WHERE status = ?", (STATUS_QUEUED,)).fetchone()[0]
+            if queued >= max_queued:
+                conn.execute("ROLLBACK")
+                raise QueueFull(f"В очереди уже {queued} заданий")
+            conn.execute(
+                "INSERT INTO quote_jobs (id, status, view, request, created) VALUES (?, ?, ?, ?, ?)",
+                (job_id, STATUS_QUEUED, view, json.dumps(payload, ensure_ascii=False), time.time()),
+            )
+            conn.execute("COMMIT")
+        return job_id
+
+    def claim(self) -> Optional[sqlite3.Row]:
+        """Забирает самое старое задание из очереди (атомарно между процессами)."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT * FROM quote_jobs WHERE status = ? ORDER BY created LIMIT 1", (STATUS_QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE quote_jobs SET status = ?, started = ?, owner = ? WHERE id = ?",
+                    (STATUS_RUNNING, time.time(), os.getpid(), row["id"]),
+                )
+            conn.execute("COMMIT")
+        return row
+
+    def progress(self, job_id: str, done: int, total: int) -> None:
+        with self._connect() as conn:
+            conn.execute("UPDATE quote_jobs SET done = ?, total = ? WHERE id = ?", (done, total, job_id))
+
+    def finish(self, job_id: str, status: str, http_status: int, result: Dict[str, Any]) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE quote_jobs SET status = ?, finished = ?, http_status = ?, result = ? WHERE id = ?",
+                (status, time.time(), http_status, json.dumps(result, ensure_ascii=False), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM quote_jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row["status"] == STATUS_QUEUED:
+                position = conn.execute(
+                    "SELECT COUNT(*) FROM quote_jobs WHERE status = ? AND created < ?",
+                    (STATUS_QUEUED, row["created"]),
+                ).fetchone()[0]
+        return _job_view(row, position)
+
+    def requeue_orphans(self) -> int:
+        """Возвращает в очередь задания, чей процесс-исполнитель больше не существует."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute("SELECT id, owner FROM quote_jobs WHERE status = ?", (STATUS_RUNNING,)).fetchall()
+            orphans = [row["id"] for row in rows if not _process_alive(row["owner"])]
+            conn.executemany(
+                "UPDATE quote_jobs SET status = ?, owner = NULL, done = 0 WHERE id = ?",
+                [(STATUS_QUEUED, job_id) for job_id in orphans],
+            )
+            conn.execute("COMMIT")
+        return len(orphans)
+
+    def purge(self, ttl_s: float = QUOTE_JOBS_TTL_S) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "DELETE FROM quote_jobs WHERE status IN (?, ?) AND finished < ?",
+                (*FINISHED, time.time() - ttl_s),
+            )
+
+
+def _process_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _job_view(row: sqlite3.Row, position: Optional[int] = None) -> Dict[str, Any]:
+    job: Dict[str, Any] = {
+        "id": row["id"],
+        "status": row["status"],
+        "view": row["view"],
+        "progress": {"done": row["done"], "total": row["total"]},
+        "createdAt": row["created"],
+        "startedAt": row["started"],
+        "finishedAt": row["finished"],
+    }
+    if position is not None:
+        job["queuePosition"] = position
+    if row["status"] in FINISHED:
+        job["httpStatus"] = row["http_status"]
+        job["result"] = json.loads(row["result"]) if row["result"] else None
+    return job
+
+
+class JobRunner:
+    """Пул потоков-исполнителей одного процесса."""
+
+    def __init__(self, store: JobStore, workers: int = QUOTE_JOB_WORKERS):
+        self.store = store
+        self.workers = max(1, workers)
+        self._wakeup = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        requeued = self.store.requeue_orphans()
+        if requeued:
+            log.warning("Возвращено в очередь заданий прерванных процессов: %s", requeued)
+        self.store.purge()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._loop, name=f"quote-job-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stopping = True
+        self.notify()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def notify(self) -> None:
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _loop(self) -> None:
+        while not self._stopping:
+            row = self.store.claim()
+            if row is None:
+                with self._wakeup:
+                    self._wakeup.wait(_POLL_S)
+                continue
+            self._run(row)
+
+    def _run(self, row: sqlite3.Row) -> None:
+        job_id = row["id"]
+        last_write = 0.0
+
+        def progress(done: int, total: int) -> None:
+            nonlocal last_write
+            now = time.monotonic()
+            if done == total or now - last_write >= _PROGRESS_EVERY_S:
+                last_write = now
+                self.store.progress(job_id, done, total)
+
+        started = time.perf_counter()
+        try:
+            req = QuoteRequest(**json.loads(row["request"]))
+            http_status, content = calculate_quote(req, row["view"], progress=progress)
+        except Exception as exc:
+            log.exception("Задание %s завершилось ошибкой", job_id)
+            self.store.finish(job_id, STATUS_FAILED, 500, {"detail": f"Ошибка расчёта: {exc}"})
+            return
+        status = STATUS_DONE if http_status == 200 else STATUS_FAILED
+        self.store.finish(job_id, status, http_status, content)
+        log.info(
+            "Задание выполнено",
+            extra={"job": job_id, "status": http_status, "seconds": round(time.perf_counter() - started, 3)},
+        )
+
+
+_runner: Optional[JobRunner] = None
+_runner_lock = threading.Lock()
+
+
+def jobs_db_path() -> str:
+    return QUOTE_JOBS_DB or os.path.join(data_loader.STORAGE_PATH, "quote_jobs.sqlite3")
+
+
+def get_job_runner() -> JobRunner:
+    """Пул исполнителей процесса; создаётся и запускается при первом обращении."""
+    global _runner
+    path = jobs_db_path()
+    with _runner_lock:
+        if _runner is None or _runner.store.path != path:
+            if _runner is not None:
+                _runner.stop()
+            _runner = JobRunner(JobStore(path))
+            _runner.start()
+        return _runner
+
+
+def submit_job(payload: Dict[str, Any], view: str) -> str:
+    runner = get_job_runner()
+    job_id = runner.store.submit(payload, view)
+    runner.notify()
+    return job_id
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    return get_job_runner().store.get(job_id)
+
+
+def _reset_after_fork() -> None:
+    # потоки исполнителей не переживают fork — воркер запустит свои
+    global _runner, _runner_lock
+    _runner = None
+    _runner_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
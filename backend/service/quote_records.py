@@ -0,0 +1,370 @@
+"""Компактные записи для расчёта: заводы, предложения, сценарии, рейсы.
+
+Перебор сценариев создаёт десятки тысяч объектов на один расчёт, поэтому
+внутри конвейера используются классы со ``__slots__`` и ссылками на общие
+(интернированные) строки вместо вложенных словарей. В прежний формат словарей
+(его ждут build_shipment_details_from_result и фронтенд) переводятся только
+лучшие варианты — методом ``to_dict()`` на границе API.
+"""
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.service.factories_service import _norm_str, _to_float
+
+_UNKNOWN_FACTORY = "Неизвестно"
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+# === КАТАЛОГ ===
+
+class FactoryRef:
+    """Завод из каталога; одинаковые заводы разных товаров — один объект."""
+
+    __slots__ = ("id", "name", "lat", "lon", "contact")
+
+    def __init__(self, id: int, name: str, lat, lon, contact):
+        self.id = id
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.contact = contact
+
+
+class Offer:
+    """Предложение товара (category, subtype) конкретным заводом."""
+
+    __slots__ = (
+        "factory",
+        "category",
+        "subtype",
+        "price",
+        "sort_price",
+        "weight_per_item",
+        "special_threshold",
+        "max_per_trip",
+        "name_key",
+    )
+
+    def __init__(self, factory: FactoryRef, product: Dict[str, Any], raw_name: Optional[str]):
+        factory_info = product.get("factory") or {}
+        self.factory = factory
+        self.category = _intern(product.get("category"))
+        self.subtype = _intern(product.get("subtype"))
+        self.price = factory_info.get("price") or 0.0
+        self.sort_price = float(factory_info.get("price") or 0.0)
+        self.weight_per_item = product.get("weight_per_item") or 0.0
+        self.special_threshold = product.get("special_threshold") or 0.0
+        self.max_per_trip = product.get("max_per_trip") or 0.0
+        self.name_key = (raw_name or "").lower()
+
+
+class OfferIndex:
+    """
+    Предложения по (category, subtype) и по категории. Отсортированные по цене
+    списки «одно предложение на завод» считаются один раз на ключ и переиспользуются.
+    """
+
+    def __init__(self, factories_products: List[Dict[str, Any]]):
+        self.factories: List[FactoryRef] = []
+        self.by_key: Dict[Tuple[Any, Any], List[Offer]] = {}
+        self.by_category: Dict[Any, List[Offer]] = {}
+        self._cheapest: Dict[Tuple[Any, ...], List[Offer]] = {}
+
+        refs: Dict[Tuple[Any, ...], FactoryRef] = {}
+        for prod in factories_products:
+            factory_info = prod.get("factory") or {}
+            raw_name = factory_info.get("name")
+            ref_key = (raw_name, factory_info.get("lat"), factory_info.get("lon"), factory_info.get("contact"))
+            ref = refs.get(ref_key)
+            if ref is None:
+                ref = refs[ref_key] = FactoryRef(
+                    len(self.factories),
+                    _intern(raw_name or _UNKNOWN_FACTORY),
+                    factory_info.get("lat"),
+                    factory_info.get("lon"),
+                    factory_info.get("contact"),
+                )
+                self.factories.append(ref)
+
+            offer = Offer(ref, prod, raw_name)
+            self.by_key.setdefault((offer.category, offer.subtype), []).append(offer)
+            if offer.category:
+                self.by_category.setdefault(offer.category, []).append(offer)
+
+    def cheapest_per_factory(self, category, subtype) -> List[Offer]:
+        """Предложения по возрастанию цены, по одному (самому дешёвому) на завод."""
+        cache_key = (category, subtype)
+        cached = self._cheapest.get(cache_key)
+        if cached is not None:
+            return cached
+
+        offers = self.by_key.get(cache_key, [])
+        # Если subtype не указан, пробуем взять любые товары этой категории
+        if not offers and not subtype:
+            offers = self.by_category.get(category, [])
+
+        best: Dict[str, Offer] = {}
+        for offer in sorted(offers, key=lambda o: o.sort_price):
+            current = best.get(offer.name_key)
+            if current is None or offer.sort_price < current.sort_price:
+                best[offer.name_key] = offer
+        result = self._cheapest[cache_key] = list(best.values())
+        return result
+
+
+# === СЦЕНАРИИ ===
+
+class Selection:
+    """Позиция заказа, закреплённая за предложением завода."""
+
+    __slots__ = (
+        "factory",
+        "category",
+        "subtype",
+        "quantity",
+        "price_per_item",
+        "weight_per_item",
+        "special_threshold",
+        "max_per_trip",
+        "weight_total",
+        "item_index",
+    )
+
+    def __init__(self, offer: Offer, quantity, item_index: int = 0):
+        self.factory = offer.factory
+        self.category = offer.category
+        self.subtype = offer.subtype
+        self.quantity = quantity
+        self.price_per_item = offer.price
+        self.weight_per_item = offer.weight_per_item
+        self.special_threshold = offer.special_threshold
+        self.max_per_trip = offer.max_per_trip
+        self.weight_total = offer.weight_per_item * quantity
+        # номер позиции в запросе — по нему вариант восстанавливается из ключа
+        self.item_index = item_index
+
+    def to_dict(self) -> Dict[str, Any]:
+        f = self.factory
+        return {
+            "factory": {
+                "name": f.name,
+                "lat": f.lat,
+                "lon": f.lon,
+                "contact": f.contact,
+                "price": self.price_per_item,
+            },
+            "category": self.category,
+            "subtype": self.subtype,
+            "quantity": self.quantity,
+            "price_per_item": self.price_per_item,
+            "weight_per_item": self.weight_per_item,
+            "special_threshold": self.special_threshold,
+            "max_per_trip": self.max_per_trip,
+            "lat": f.lat,
+            "lon": f.lon,
+            "weight_total": self.weight_total,
+        }
+
+
+class Scenario:
+    """Распределение позиций по заводам: ``factories`` — имя завода → позиции."""
+
+    __slots__ = ("scenario_id", "factories", "total_material_cost", "total_weight")
+
+    def __init__(self, scenario_id: int, factories: Dict[str, List[Selection]],
+                 total_material_cost: float, total_weight: float):
+        self.scenario_id = scenario_id
+        self.factories = factories
+        self.total_material_cost = total_material_cost
+        self.total_weight = total_weight
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "scenario_id": self.scenario_id,
+            "factories": {
+                name: [sel.to_dict() for sel in items] for name, items in self.factories.items()
+            },
+            "total_material_cost": self.total_material_cost,
+            "total_weight": self.total_weight,
+        }
+
+
+# === ТАРИФЫ И РЕЙСЫ ===
+
+class Tariff:
+    """Строка тарифа с заранее разобранными числами (исходный словарь — в ``raw``)."""
+
+    __slots__ = (
+        "raw",
+        "tag",
+        "name_norm",
+        "capacity",
+        "min_d",
+        "max_d",
+        "base",
+        "per_km",
+        "weight_if",
+        "_label",
+    )
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        self.tag = _norm_str(raw.get("tag"))
+        self.name_norm = _norm_str(raw.get("название") or raw.get("name") or "")
+        self.capacity = _to_float(raw.get("грузоподъёмность"))
+        self.min_d = _to_float(raw.get("min_distance"))
+        self.max_d = _to_float(raw.get("max_distance"))
+        self.base = _to_float(raw.get("base"))
+        self.per_km = _to_float(raw.get("per_km"))
+        self.weight_if = _norm_str(raw.get("weight_if") or "any")
+        self._label: Optional[str] = None
+
+    def in_range(self, distance_km: float) -> bool:
+        """Попадает ли расстояние в диапазон тарифа."""
+        min_d, max_d = self.min_d, self.max_d
+        if max_d and max_d != min_d:
+            return min_d <= distance_km <= max_d
+        if max_d == min_d and max_d > 0:
+            return distance_km >= max_d
+        return True
+
+    def trip_cost(self, distance_km: float) -> float:
+        """Стоимость рейса с учётом per_km на перерасстояние."""
+        if self.per_km and self.max_d == self.min_d and distance_km > self.max_d:
+            extra_km = max(distance_km - self.max_d, 0)
+            return self.base + self.per_km * extra_km
+        return self.base
+
+    @property
+    def label(self) -> str:
+        if self._label is None:
+            from backend.service.transport_calc import _tariff_label
+
+            self._label = _tariff_label(self.raw)
+        return self._label
+
+
+_compiled_tariffs: Tuple[Any, List[Tariff]] = (None, [])
+
+
+def compile_tariffs(tariffs) -> List[Tariff]:
+    """Тарифы в виде записей; результат для последнего списка запоминается."""
+    global _compiled_tariffs
+    source, compiled = _compiled_tariffs
+    if source is tariffs:
+        return compiled
+    compiled = [t if isinstance(t, Tariff) else Tariff(t) for t in tariffs or []]
+    _compiled_tariffs = (tariffs, compiled)
+    return compiled
+
+
+class Trip:
+    """
+    Один рейс. Подписи товаров не форматируются заранее: ``loads`` хранит
+    (category, subtype, количество), строка собирается в ``to_dict()``.
+    """
+
+    __slots__ = ("tag", "tariff", "tariff_name", "trip_cost", "load_ton", "distance_km", "loads", "note")
+
+    def __init__(self, tag: str, tariff: Tariff, tariff_name: str, trip_cost: float,
+                 load_ton: float, distance_km: float, loads: Tuple = (), note: Optional[str] = None):
+        self.tag = tag
+        self.tariff = tariff
+        self.tariff_name = tariff_name
+        self.trip_cost = trip_cost
+        self.load_ton = load_ton
+        self.distance_km = distance_km
+        self.loads = loads
+        self.note = note
+
+    @property
+    def items(self) -> List[str]:
+        if self.loads:
+            return [f"{category} {subtype}: {qty} шт" for category, subtype, qty in self.loads]
+        return [self.note] if self.note else []
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tag": self.tag,
+            "tariff_name": self.tariff_name,
+            "tariff_label": self.tariff.label,
+            "trip_cost": self.trip_cost,
+            "load_ton": self.load_ton,
+            "distance_km": self.distance_km,
+            "items": self.items,
+        }
+
+
+class FactoryPlan:
+    __slots__ = ("factory_name", "distance_km", "distance_estimated", "transport_cost", "trips", "material_cost")
+
+    def __init__(self, factory_name: str, distance_km: float, distance_estimated: bool,
+                 transport_cost: float, trips: List[Trip], material_cost: float):
+        self.factory_name = factory_name
+        self.distance_km = distance_km
+        self.distance_estimated = distance_estimated
+        self.transport_cost = transport_cost
+        self.trips = trips
+        self.material_cost = material_cost
+
+
+class QuoteResult:
+    """Итог оценки сценария; ``to_dict()`` — прежний формат результата."""
+
+    __slots__ = ("scenario", "material_sum", "delivery_cost", "total_cost", "factory_plans")
+
+    def __init__(self, scenario: Scenario, material_sum: float, delivery_cost: float,
+                 total_cost: float, factory_plans: List[FactoryPlan]):
+        self.scenario = scenario
+        self.material_sum = material_sum
+        self.delivery_cost = delivery_cost
+        self.total_cost = total_cost
+        self.factory_plans = factory_plans
+
+    @property
+    def distance_estimated(self) -> bool:
+        return any(p.distance_estimated for p in self.factory_plans)
+
+    @property
+    def trip_count(self) -> int:
+        return sum(len(p.trips) for p in self.factory_plans)
+
+    @property
+    def transport_name(self) -> str:
+        names = {t.tariff.label or t.tariff_name or t.tag for p in self.factory_plans for t in p.trips}
+        return ", ".join(sorted(names))
+
+    def to_dict(self) -> Dict[str, Any]:
+        plans = []
+        factories_output = []
+        for plan in self.factory_plans:
+            trips = [trip.to_dict() for trip in plan.trips]
+            plans.append({
+                "factory_name": plan.factory_name,
+                "distance_km": plan.distance_km,
+                "distance_estimated": plan.distance_estimated,
+                "transport_cost": plan.transport_cost,
+                "trips": trips,
+                "material_cost": plan.material_cost,
+            })
+            factories_output.append({
+                "factory_name": plan.factory_name,
+                "distance_km": plan.distance_km,
+                "trips": trips,
+            })
+
+        return {
+            "scenario": self.scenario.to_dict(),
+            "material_sum": self.material_sum,
+            "delivery_cost": self.delivery_cost,
+            "total_cost": self.total_cost,
+            "trip_count": self.trip_count,
+            "transport_name": self.transport_name,
+            "factory_distances": {p.factory_name: p.distance_km for p in self.factory_plans},
+            "distance_estimated": self.distance_estimated,
+            "factory_plans": plans,
+            "factories": factories_output,
+        }
@@ -0,0 +1,237 @@
+"""Расчёт вариантов доставки: сценарии, транспорт, итоговые варианты.
+
+Общий для синхронного ``POST /api/quote`` и фоновых заданий
+(``backend.service.quote_jobs``): маршрут только допускает запрос и
+сериализует ответ.
+"""
+import base64
+import json
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from backend.core.catalog import CatalogSnapshot, get_catalog
+from backend.core.distance import prefetch_distances
+from backend.core.logger import get_logger, lazy
+from backend.core.metrics import QUOTE_SCENARIOS
+from backend.core.responses import dumps_json
+from backend.core.tracing import incr, span
+from backend.models.dto import QuoteRequest, QuoteVariantRequest
+from backend.service.distance_grid import uncovered_sources
+from backend.service.osrm_client import OSRMUnavailableError
+from backend.service.quote_records import OfferIndex, QuoteResult
+from backend.service.scenario_builder import build_factory_scenarios_v2, build_scenario_for_factories
+from backend.service.transport_calc import (
+    build_shipment_details_from_result,
+    build_trip_items_details,
+    evaluate_scenario_transport,
+    scenario_factory_coords,
+)
+
+log = get_logger("quote_service")
+
+# summary — только итоги и рейсы, сгруппированные «N × машина»;
+# full — плюс transportDetails, details и tripItems по каждому рейсу
+QuoteView = Literal["summary", "full"]
+
+# progress(оценено сценариев, всего сценариев)
+ProgressCallback = Callable[[int, int], None]
+
+
+def calculate_quote(
+    req: QuoteRequest, view: str = "full", progress: Optional[ProgressCallback] = None
+) -> Tuple[int, Dict[str, Any]]:
+    """
+    Расчёт вариантов доставки. Возвращает (HTTP-статус, тело ответа).
+    ``progress`` вызывается по ходу оценки сценариев (для фоновых заданий).
+    """
+    log.info(
+        "Запрос на расчёт",
+        extra={"items": len(req.items), "transport_type": getattr(req, "transport_type", None)},
+    )
+    log.debug("Тело запроса: %s", lazy(req.dict))
+
+    # ✅ загружаем объединённые данные (товары + заводы)
+    with span("load_data"):
+        catalog = get_catalog()
+        factories_products, tariffs = catalog.factories_products, catalog.tariffs
+    if not factories_products:
+        return 500, {"detail": "Не удалось загрузить factories_products.json"}
+
+    # 🧩 строим сценарии по индексу предложений (один на версию каталога)
+    offer_index = catalog.memo("offer_index", build_offer_index)
+
+    # Преобразуем Pydantic-модели в обычные словари
+    items_data = [item.dict() for item in req.items]
+
+    with span("scenarios"):
+        scenarios = build_factory_scenarios_v2([], items_data, index=offer_index)
+    incr("scenarios_generated", len(scenarios))
+    QUOTE_SCENARIOS.observe(len(scenarios))
+
+    if not scenarios:
+        return 400, {"detail": "Не удалось построить ни одного сценария"}
+
+    # Все расстояния сценариев — одним запросом /table, дальше перебор идёт по кэшу
+    destination = (req.upload_lon, req.upload_lat)
+    sources = scenario_factory_coords(scenarios)
+    if req.distance_precision == "cell":
+        # то, что есть в сетке расстояний, в сеть не запрашиваем
+        sources = uncovered_sources(sources, destination)
+    prefetch_distances(sources, destination)
+
+    results = []
+
+    total = len(scenarios)
+    step = max(1, total // 100)
+    try:
+        with span("evaluate"):
+            for done, sc in enumerate(scenarios, start=1):
+                r = evaluate_scenario_transport(sc, req, tariffs)
+                incr("scenarios_evaluated")
+                if r:
+                    results.append(r)
+                if progress is not None and (done % step == 0 or done == total):
+                    progress(done, total)
+    except OSRMUnavailableError:
+        return 503, {"detail": "OSRM недоступен, попробуйте позже"}
+
+    if not results:
+        return 400, {"detail": "Не удалось подобрать подходящий вариант"}
+
+    best = sorted(results, key=lambda x: x.total_cost)[:3]
+
+    # формируем варианты: для summary детализация рейсов не строится вовсе
+    with span("details"):
+        if view == "summary":
+            variants = [_summary_variant(r, catalog.version) for r in best]
+        else:
+            variants = [_full_variant(r, req, catalog.version) for r in best]
+
+    # выводим в лог лучшие результаты (только при LOG_LEVEL=DEBUG, с прореживанием)
+    log.debug("📊 Топ-3 результатов: %s", lazy(_format_top, variants))
+
+    return 200, {"success": True, "variants": variants}
+
+
+def calculate_variant(req: QuoteVariantRequest) -> Tuple[int, Dict[str, Any]]:
+    """
+    Полная детализация одного варианта по ``variantKey`` из ответа /quote:
+    сценарий восстанавливается по выбранным заводам и оценивается заново —
+    без перебора остальных комбинаций.
+    """
+    try:
+        version, factory_names = decode_variant_key(req.variant_key)
+    except ValueError:
+        return 400, {"detail": "Некорректный variantKey"}
+
+    catalog = get_catalog()
+    if version != catalog.version:
+        return 409, {"detail": "Каталог обновился, пересчитайте доставку"}
+
+    items_data = [item.dict() for item in req.items]
+    scenario = build_scenario_for_factories(
+        items_data, factory_names, catalog.memo("offer_index", build_offer_index)
+    )
+    if scenario is None:
+        return 409, {"detail": "Вариант не соответствует запросу или каталогу, пересчитайте доставку"}
+
+    try:
+        result = evaluate_scenario_transport(scenario, req, catalog.tariffs)
+    except OSRMUnavailableError:
+        return 503, {"detail": "OSRM недоступен, попробуйте позже"}
+    if result is None:
+        return 400, {"detail": "Не удалось подобрать подходящий вариант"}
+    return 200, {"success": True, "variant": _full_variant(result, req, catalog.version)}
+
+
+def encode_variant_key(result: QuoteResult, catalog_version: str) -> str:
+    """Ключ варианта: версия каталога и завод для каждой позиции запроса по порядку."""
+    selections = [sel for sels in result.scenario.factories.values() for sel in sels]
+    factory_names: List[Optional[str]] = [None] * len(selections)
+    for sel in selections:
+        factory_names[sel.item_index] = sel.factory.name
+    raw = dumps_json([catalog_version, factory_names])
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_variant_key(key: str) -> Tuple[str, List[str]]:
+    try:
+        raw = base64.urlsafe_b64decode(key + "=" * (-len(key) % 4))
+        version, factory_names = json.loads(raw)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Некорректный ключ варианта") from exc
+    if not isinstance(version, str) or not isinstance(factory_names, list) \
+            or not all(isinstance(name, str) for name in factory_names):
+        raise ValueError("Некорректный ключ варианта")
+    return version, factory_names
+
+
+def _summary_variant(result: QuoteResult, catalog_version: str) -> Dict[str, Any]:
+    """Итоги варианта прямо из записей, без перевода результата в словари."""
+    return {
+        "totalCost": round(result.material_sum + result.delivery_cost, 2),
+        "materialCost": round(result.material_sum, 2),
+        "deliveryCost": round(result.delivery_cost, 2),
+        "totalWeight": round(result.scenario.total_weight, 2),
+        "transportName": result.transport_name,
+        "tripCount": result.trip_count,
+        # расстояние хотя бы до одного завода оценено по прямой (OSRM недоступен)
+        "distanceEstimated": result.distance_estimated,
+        "tripGroups": _trip_groups(result),
+        # детализация этого варианта — POST /api/quote/variant с этим ключом
+        "variantKey": encode_variant_key(result, catalog_version),
+    }
+
+
+def _full_variant(result: QuoteResult, req: QuoteRequest, catalog_version: str) -> Dict[str, Any]:
+    """Итоги плюс полная детализация: планы заводов, строки отгрузки и рейсы."""
+    variant = _summary_variant(result, catalog_version)
+    r = result.to_dict()
+    variant.update({
+        "transportDetails": r.get("factory_plans", []),
+        "details": build_shipment_details_from_result(r, req),
+        "tripItems": build_trip_items_details(r),
+    })
+    return variant
+
+
+def _trip_groups(result: QuoteResult) -> List[Dict[str, Any]]:
+    """Рейсы, сгруппированные по заводу и машине: строки вида «3 × КАМАЗ»."""
+    groups: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for plan in result.factory_plans:
+        for trip in plan.trips:
+            vehicle = trip.tariff_name or trip.tag
+            group = groups.get((plan.factory_name, vehicle))
+            if group is None:
+                group = groups[(plan.factory_name, vehicle)] = {
+                    "factory": plan.factory_name,
+                    "vehicle": vehicle,
+                    "count": 0,
+                    "distanceKm": round(plan.distance_km, 2),
+                    "loadTon": 0.0,
+                    "deliveryCost": 0.0,
+                }
+            group["count"] += 1
+            group["loadTon"] += trip.load_ton
+            group["deliveryCost"] += trip.trip_cost
+
+    rows = list(groups.values())
+    for row in rows:
+        row["label"] = f"{row['count']} × {row['vehicle']}"
+        row["loadTon"] = round(row["loadTon"], 2)
+        row["deliveryCost"] = round(row["deliveryCost"], 2)
+    return rows
+
+
+def build_offer_index(catalog: CatalogSnapshot) -> OfferIndex:
+    # factories_products — dict {лист: [товары]}; сценарии строятся по плоскому списку
+    products = catalog.factories_products
+    if isinstance(products, dict):
+        products = [p for items in products.values() if isinstance(items, list) for p in items]
+    return OfferIndex(products)
+
+
+def _format_top(variants) -> str:
+    return "; ".join(
+        f"{i}) {v['transportName']}: {v['totalCost']}₽ ({v['deliveryCost']} доставка)"
+        for i, v in enumerate(variants, start=1)
+    )
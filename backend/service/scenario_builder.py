@@ -1,9 +1,10 @@
 """Tools for generating purchase scenarios across factories."""
 
 from itertools import product
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 from backend.core.logger import get_logger
+from backend.service.quote_records import OfferIndex, Scenario, Selection
 
 log = get_logger("scenario_builder")
 
@@ -98,72 +99,34 @@ def build_factory_scenarios(factories_products: dict, items: list):
     return scenarios
 
 
-def _unique_variants_by_factory(variants: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Deduplicate product variants by factory, keeping the cheapest option."""
-
-    best_by_factory: Dict[str, Dict[str, Any]] = {}
-    for option in variants:
-        factory = option.get("factory") or {}
-        name = (factory.get("name") or "").lower()
-        current_best = best_by_factory.get(name)
-        price = float(factory.get("price") or 0.0)
-        if current_best is None:
-            best_by_factory[name] = option
-            continue
-
-        existing_price = float((current_best.get("factory") or {}).get("price") or 0.0)
-        if price < existing_price:
-            best_by_factory[name] = option
-
-    return list(best_by_factory.values())
-
-
-def _scenario_signature(factories: Dict[str, List[Dict[str, Any]]]) -> Tuple[Tuple[str, int], ...]:
-    """Create a stable signature for deduplicating scenarios."""
-
-    signature: List[Tuple[str, int]] = []
-    for fname, items in factories.items():
-        qty_sum = sum(int(i.get("quantity") or i.get("count") or 0) for i in items)
-        signature.append((fname, qty_sum))
-    return tuple(sorted(signature))
-
-
 def build_factory_scenarios_v2(
     factories_products: List[Dict[str, Any]],
     items: List[Dict[str, Any]],
-) -> List[Dict[str, Any]]:
+    index: Optional[OfferIndex] = None,
+) -> List[Scenario]:
     """Создать осмысленные комбинации распределения товаров по заводам.
 
     - Каждому запрошенному товару сопоставляется список заводов-поставщиков.
     - Дубли по одному и тому же заводу отфильтровываются, оставляя минимальную цену.
     - Комбинации с одинаковым набором заводов и количеств объединяются.
+
+    Сценарии — компактные записи ``Scenario``; ``index`` можно передать готовым
+    (он кэшируется на снимок каталога), иначе строится из ``factories_products``.
     """
 
     # --- 1. Индекс по (category, subtype) и fallback по категории ---
-    catalog: Dict[tuple, List[Dict[str, Any]]] = {}
-    catalog_by_category: Dict[str, List[Dict[str, Any]]] = {}
-    for prod in factories_products:
-        category = prod.get("category")
-        subtype = prod.get("subtype")
-        key = (category, subtype)
-
-        catalog.setdefault(key, []).append(prod)
-        if category:
-            catalog_by_category.setdefault(category, []).append(prod)
+    if index is None:
+        index = OfferIndex(factories_products)
 
     # --- 2. Для каждого запрошенного товара собираем варианты заводов ---
-    candidates: List[List[Dict[str, Any]]] = []
-    for item in items:
+    candidates: List[List[Selection]] = []
+    for item_index, item in enumerate(items):
         category = item.get("category")
         subtype = item.get("subtype")
-        key = (category, subtype)
-
-        possible = catalog.get(key, [])
-        # Если subtype не указан, пробуем взять любые товары этой категории
-        if not possible and not subtype:
-            possible = catalog_by_category.get(category, [])
-            
-        if not possible:
+
+        # Отсортированы по цене, одно предложение на завод
+        offers = index.cheapest_per_factory(category, subtype)
+        if not offers:
             log.warning(
                 "⚠️ Не найден ни один завод для товара %s / %s",
                 item.get("category"),
@@ -172,77 +135,62 @@ def build_factory_scenarios_v2(
             return []
 
         item_quantity = item.get("quantity") or 0
-
-        # Сортируем по цене и оставляем одно предложение на завод
-        possible_sorted = sorted(
-            possible,
-            key=lambda p: float((p.get("factory") or {}).get("price") or 0.0),
-        )
-        filtered_variants = _unique_variants_by_factory(possible_sorted)
-
-        item_variants: List[Dict[str, Any]] = []
-        for prod in filtered_variants:
-            factory_info = prod.get("factory") or {}
-            weight_per_item = prod.get("weight_per_item") or 0.0
-            weight_total = weight_per_item * item_quantity
-            price_per_item = factory_info.get("price") or 0.0
-
-            item_variants.append(
-                {
-                    "factory": {
-                        "name": factory_info.get("name") or "Неизвестно",
-                        "lat": factory_info.get("lat"),
-                        "lon": factory_info.get("lon"),
-                        "contact": factory_info.get("contact"),
-                        "price": price_per_item,
-                    },
-                    "category": prod.get("category"),
-                    "subtype": prod.get("subtype"),
-                    "quantity": item_quantity,
-                    "price_per_item": price_per_item,
-                    "weight_per_item": weight_per_item,
-                    "special_threshold": prod.get("special_threshold") or 0.0,
-                    "max_per_trip": prod.get("max_per_trip") or 0.0,
-                    "lat": factory_info.get("lat"),
-                    "lon": factory_info.get("lon"),
-                    "weight_total": weight_total,
-                }
-            )
-
-        candidates.append(item_variants)
+        candidates.append([Selection(offer, item_quantity, item_index) for offer in offers])
     if not candidates:
         return []
 
-
     # --- 3. Генерируем все комбинации (один выбор завода на каждый товар) ---
-    scenarios: List[Dict[str, Any]] = []
+    scenarios: List[Scenario] = []
     seen_signatures: set[Tuple[Tuple[str, int], ...]] = set()
 
     for combo_id, combo in enumerate(product(*candidates), start=1):
-        factories_map: Dict[str, List[Dict[str, Any]]] = {}
-
+        factories_map: Dict[str, List[Selection]] = {}
         for selection in combo:
-            factory_info = selection.get("factory") or {}
-            factory_name = factory_info.get("name") or "Неизвестно"
-            factories_map.setdefault(factory_name, []).append(selection)
+            factories_map.setdefault(selection.factory.name, []).append(selection)
 
-        signature = _scenario_signature(factories_map)
+        signature = tuple(sorted(
+            (fname, sum(int(s.quantity or 0) for s in selections))
+            for fname, selections in factories_map.items()
+        ))
         if signature in seen_signatures:
             continue
         seen_signatures.add(signature)
 
-        total_cost = sum(x["price_per_item"] * x["quantity"] for x in combo)
-        total_weight = sum(x["weight_per_item"] * x["quantity"] for x in combo)
+        total_cost = sum(x.price_per_item * x.quantity for x in combo)
+        total_weight = sum(x.weight_per_item * x.quantity for x in combo)
 
-        scenarios.append(
-            {
-                "scenario_id": combo_id,
-                "factories": factories_map,
-                "total_material_cost": total_cost,
-                "total_weight": total_weight,
-            }
-        )
+        scenarios.append(Scenario(combo_id, factories_map, total_cost, total_weight))
 
     # --- 4. Сортировка по стоимости материалов ---
-    scenarios.sort(key=lambda x: x["total_material_cost"])
+    scenarios.sort(key=lambda x: x.total_material_cost)
     return scenarios
+
+
+def build_scenario_for_factories(
+    items: List[Dict[str, Any]],
+    factory_names: List[str],
+    index: OfferIndex,
+) -> Optional[Scenario]:
+    """Один сценарий: позиция ``items[i]`` берётся у завода ``factory_names[i]``.
+
+    Те же предложения, что выбрал бы ``build_factory_scenarios_v2`` для этой
+    комбинации. None — если у завода больше нет такого предложения.
+    """
+
+    if len(items) != len(factory_names) or not items:
+        return None
+
+    factories_map: Dict[str, List[Selection]] = {}
+    combo: List[Selection] = []
+    for item_index, (item, factory_name) in enumerate(zip(items, factory_names)):
+        offers = index.cheapest_per_factory(item.get("category"), item.get("subtype"))
+        offer = next((o for o in offers if o.factory.name == factory_name), None)
+        if offer is None:
+            return None
+        selection = Selection(offer, item.get("quantity") or 0, item_index)
+        factories_map.setdefault(factory_name, []).append(selection)
+        combo.append(selection)
+
+    total_cost = sum(x.price_per_item * x.quantity for x in combo)
+    total_weight = sum(x.weight_per_item * x.quantity for x in combo)
+    return Scenario(0, factories_map, total_cost, total_weight)
@@ -0,0 +1,177 @@
+"""Запись реальных расчётов /quote для воспроизведения (``python -m backend.bench.replay``).
+
+При заданном ``QUOTE_RECORD_FILE`` доля ``QUOTE_RECORD_SAMPLE_RATE`` запросов
+дописывается в журнал JSON-строкой: очищенный запрос, дорожные расстояния,
+которые расчёт реально использовал (завод → точка выгрузки), версия каталога,
+время расчёта и подпись топ-3 вариантов. Файл с суффиксом ``.gz`` пишется
+сжатым (одна gzip-часть на запись — обрыв процесса не портит прежние записи).
+
+Очистка: в журнал попадают только поля ``QuoteRequest``, а точка выгрузки
+округляется до ``QUOTE_RECORD_COORD_DIGITS`` знаков. Расстояния записываются
+до округлённой точки, поэтому воспроизведение остаётся согласованным.
+"""
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from backend.core.catalog import CatalogSnapshot, get_catalog
+from backend.core.logger import get_logger
+from backend.core.responses import dumps_json
+from backend.models.dto import QuoteRequest
+
+log = get_logger("traffic_recorder")
+
+# Журнал записанных расчётов (пусто — запись выключена); *.gz — со сжатием
+QUOTE_RECORD_FILE = os.getenv("QUOTE_RECORD_FILE")
+# Доля записываемых запросов
+QUOTE_RECORD_SAMPLE_RATE = float(os.getenv("QUOTE_RECORD_SAMPLE_RATE", "1.0"))
+# Знаков после запятой у координат точки выгрузки в журнале (3 ≈ 100 м)
+QUOTE_RECORD_COORD_DIGITS = int(os.getenv("QUOTE_RECORD_COORD_DIGITS", "3"))
+
+RECORD_FORMAT = 1
+
+# Расстояния текущего расчёта: (lon, lat) завода → км
+_distances: ContextVar[Optional[Dict[Tuple[float, float], float]]] = ContextVar("quote_distances", default=None)
+
+
+def data_version(catalog: CatalogSnapshot) -> str:
+    """
+    Версия данных по содержимому каталога (``catalog.version`` зависит от
+    mtime файлов и на копии storage не совпадёт). Считается один раз на снимок.
+    """
+    return catalog.memo(
+        "content_version",
+        lambda c: hashlib.sha1(dumps_json([c.factories_products, c.tariffs])).hexdigest()[:12],
+    )
+
+
+def note_distance(lon: float, lat: float, km: float) -> None:
+    """Запоминает расстояние от завода до точки выгрузки, если расчёт записывается."""
+    distances = _distances.get()
+    if distances is not None:
+        distances[(lon, lat)] = km
+
+
+def sanitize_request(req: QuoteRequest, digits: int = QUOTE_RECORD_COORD_DIGITS) -> Dict[str, Any]:
+    payload = req.dict(by_alias=True)
+    payload["upload_lat"] = round(req.upload_lat, digits)
+    payload["upload_lon"] = round(req.upload_lon, digits)
+    return payload
+
+
+def variant_signature(variant: Dict[str, Any]) -> Dict[str, Any]:
+    """Что считается «тем же вариантом»: стоимость, машина и заводы."""
+    return {
+        "totalCost": variant.get("totalCost"),
+        "transportName": variant.get("transportName"),
+        "factories": sorted({g.get("factory") for g in variant.get("tripGroups", []) if g.get("factory")}),
+    }
+
+
+def top_signatures(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [variant_signature(v) for v in content.get("variants", [])]
+
+
+class TrafficRecorder:
+    """Пишет записи расчётов в один файл; запись из разных потоков — под блокировкой."""
+
+    def __init__(self, path: str, sample_rate: float = QUOTE_RECORD_SAMPLE_RATE,
+                 digits: int = QUOTE_RECORD_COORD_DIGITS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.digits = digits
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    def sampled(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record(self, calculate: Callable[..., Tuple[int, Dict[str, Any]]], req: QuoteRequest, view: str):
+        """Выполняет ``calculate(req, view)``, собирая использованные расстояния, и пишет запись."""
+        distances: Dict[Tuple[float, float], float] = {}
+        token = _distances.set(distances)
+        started = time.perf_counter()
+        try:
+            status_code, content = calculate(req, view)
+        finally:
+            _distances.reset(token)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        entry = {
+            "format": RECORD_FORMAT,
+            "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "catalog": data_version(get_catalog()),
+            "view": view,
+            "request": sanitize_request(req, self.digits),
+            # [lon, lat, км] для каждого завода; точка выгрузки — из request
+            "distances": [[lon, lat, km] for (lon, lat), km in distances.items()],
+            "status": status_code,
+            "elapsed_ms": round(elapsed_ms, 3),
+            "top": top_signatures(content) if status_code == 200 else [],
+        }
+        try:
+            self.write(entry)
+        except OSError as exc:
+            log.warning("Не удалось записать расчёт в %s: %s", self.path, exc)
+        return status_code, content
+
+    def write(self, entry: Dict[str, Any]) -> None:
+        line = (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        if self.path.endswith(".gz"):
+            line = gzip.compress(line)
+        with self._lock, open(self.path, "ab") as f:
+            f.write(line)
+
+
+def read_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Записи из журналов по порядку (``.gz`` читается как многочастный gzip)."""
+    for path in paths:
+        opener = gzip.open if str(path).endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+_recorder: Optional[TrafficRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def _record_path() -> Optional[str]:
+    if not QUOTE_RECORD_FILE:
+        return None
+    if os.getenv("SERVE_MASTER_PID"):
+        # у каждого воркера backend.app.serve свой файл: записи не перемешиваются
+        gz = ".gz" if QUOTE_RECORD_FILE.endswith(".gz") else ""
+        return f"{QUOTE_RECORD_FILE[:len(QUOTE_RECORD_FILE) - len(gz)]}.{os.getpid()}{gz}"
+    return QUOTE_RECORD_FILE
+
+
+def get_recorder() -> Optional[TrafficRecorder]:
+    """Рекордер процесса или None, если запись выключена."""
+    global _recorder
+    path = _record_path()
+    if path is None:
+        return None
+    if _recorder is None or _recorder.path != path:
+        with _recorder_lock:
+            if _recorder is None or _recorder.path != path:
+                _recorder = TrafficRecorder(path)
+    return _recorder
+
+
+def _reset_after_fork() -> None:
+    global _recorder, _recorder_lock
+    _recorder = None
+    _recorder_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
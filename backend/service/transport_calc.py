@@ -1,41 +1,28 @@
 """Transport planning and tariff selection utilities."""
 
 from typing import Any, Dict, List, Optional, Tuple
+from backend.core.distance import SOURCE_ESTIMATE, SOURCE_GRID, lookup_distance
 from backend.core.logger import get_logger
+from backend.core.tracing import incr, span
 from backend.service.factories_service import _norm_str, _to_float
-from backend.service.osrm_client import OSRMUnavailableError, get_osrm_distance_km
+from backend.service.distance_grid import grid_distance_km
+from backend.service.osrm_client import OSRMUnavailableError
+from backend.service.traffic_recorder import note_distance
+from backend.service.quote_records import (
+    FactoryPlan,
+    QuoteResult,
+    Scenario,
+    Selection,
+    Tariff,
+    Trip,
+    compile_tariffs,
+)
 
 logger = get_logger(__name__)
 
 
 # === БАЗОВЫЕ УТИЛИТЫ =========================================================
 
-def _distance_in_range(tariff: Dict[str, Any], distance_km: float) -> bool:
-    """Проверяет, попадает ли расстояние в диапазон тарифа."""
-    min_d = _to_float(tariff.get("min_distance"))
-    max_d = _to_float(tariff.get("max_distance"))
-
-
-    if max_d and max_d != min_d:
-        return min_d <= distance_km <= max_d
-    if max_d == min_d and max_d > 0:
-        return distance_km >= max_d
-    return True
-
-
-def _trip_cost(tariff: Dict[str, Any], distance_km: float) -> float:
-    """Стоимость рейса по тарифу с учётом per_km на перерасстояние."""
-    base = _to_float(tariff.get("base"))
-    per_km = _to_float(tariff.get("per_km"))
-    min_d = _to_float(tariff.get("min_distance"))
-    max_d = _to_float(tariff.get("max_distance"))
-
-    if per_km and max_d == min_d and distance_km > max_d:
-        extra_km = max(distance_km - max_d, 0)
-        return base + per_km * extra_km
-    return base
-
-
 def _tariff_label(tariff: Dict[str, Any]) -> str:
     """Читабельная подпись выбранного тарифа."""
 
@@ -70,33 +57,30 @@ def _tariff_label(tariff: Dict[str, Any]) -> str:
 
 
 def _select_tariff_for_load(
-    tariffs: List[Dict[str, Any]],
+    tariffs: List[Tariff],
     tag: str,
     distance_km: float,
     load_ton: float,
     name_contains: Optional[str] = None,
-) -> Optional[Dict[str, Any]]:
+) -> Optional[Tariff]:
     """Возвращает лучшую строку тарифа под указанный тег/нагрузку."""
+    tag = _norm_str(tag)
     candidates = []
     for t in tariffs:
-        if _norm_str(t.get("tag")) != _norm_str(tag):
+        if t.tag != tag:
             continue
-        if not _distance_in_range(t, distance_km):
+        if not t.in_range(distance_km):
             continue
 
-        if name_contains:
-            name = _norm_str(t.get("название") or t.get("name") or "")
-            if name_contains.lower() not in name:
-                continue
+        if name_contains and name_contains.lower() not in t.name_norm:
+            continue
 
-        weight_if = _norm_str(t.get("weight_if") or "any")
-        if weight_if == "≤20" and load_ton > 20:
+        if t.weight_if == "≤20" and load_ton > 20:
             continue
-        if weight_if == ">20" and load_ton <= 20:
+        if t.weight_if == ">20" and load_ton <= 20:
             continue
 
-        capacity = _to_float(t.get("грузоподъёмность"))
-        if capacity and load_ton > capacity:
+        if t.capacity and load_ton > t.capacity:
             continue
         candidates.append(t)
 
@@ -104,25 +88,20 @@ def _select_tariff_for_load(
         return None
 
     # выбираем минимальную стоимость рейса
-    return min(candidates, key=lambda x: _trip_cost(x, distance_km))
+    return min(candidates, key=lambda x: x.trip_cost(distance_km))
+
 
+def _calc_daf_step_cost(base_cost: float, loaded_meta: List[Tuple[float, float]]) -> float:
+    """Расчёт ступенчатой цены для DAF по количеству единиц с порогом.
 
-def _calc_daf_step_cost(base_cost: float, loaded_meta: List[Dict[str, Any]]) -> float:
-    """Расчёт ступенчатой цены для DAF по количеству единиц с порогом."""
+    ``loaded_meta`` — пары (количество, special_threshold) погруженных позиций.
+    """
 
-    thresholds = [
-        _to_float(m.get("special_threshold"))
-        for m in loaded_meta
-        if _to_float(m.get("special_threshold")) > 0
-    ]
+    thresholds = [threshold for _, threshold in loaded_meta if threshold > 0]
     if not thresholds:
         return base_cost
 
-    qty_sum = sum(
-        _to_float(m.get("qty"))
-        for m in loaded_meta
-        if _to_float(m.get("special_threshold")) > 0
-    )
+    qty_sum = sum(float(qty) for qty, threshold in loaded_meta if threshold > 0)
     if qty_sum <= 0:
         return base_cost
 
@@ -133,98 +112,95 @@ def _calc_daf_step_cost(base_cost: float, loaded_meta: List[Dict[str, Any]]) ->
     return base_cost
 
 
+class _Candidate:
+    """Тип машины, доступный для линейного плана на данном расстоянии."""
+
+    __slots__ = ("tag", "tariff", "capacity", "cost", "cpt", "weight_if")
+
+    def __init__(self, tariff: Tariff, capacity: float, cost: float):
+        self.tag = tariff.tag
+        self.tariff = tariff
+        self.capacity = capacity
+        self.cost = cost
+        self.cpt = cost / capacity if capacity else float("inf")
+        self.weight_if = tariff.weight_if
+
+
+class _Remaining:
+    """Остаток позиции, которую ещё нужно развезти."""
+
+    __slots__ = ("category", "subtype", "weight_per_item", "special_threshold", "remaining_qty")
+
+    def __init__(self, sel: Selection, qty: float):
+        self.category = sel.category
+        self.subtype = sel.subtype
+        self.weight_per_item = _to_float(sel.weight_per_item)
+        self.special_threshold = _to_float(sel.special_threshold)
+        self.remaining_qty = qty
+
+
 def _linear_plan(
     total_weight: float,
     distance_km: float,
-    tariffs: List[Dict[str, Any]],
+    tariffs: List[Tariff],
     allowed_tags: List[str],
     require_manipulator: bool,
-    items: List[Dict[str, Any]],
-) -> Optional[Dict[str, Any]]:
+    items: List[Selection],
+) -> Optional[Tuple[str, float, List[Trip]]]:
     """Жадно заполняем самыми выгодными машинами, сравнивая тарифы по цене/тонне."""
-    candidates: List[Dict[str, Any]] = []
+    candidates: List[_Candidate] = []
 
     for t in tariffs:
-        tag = _norm_str(t.get("tag"))
-        if tag not in allowed_tags:
+        if t.tag not in allowed_tags:
             continue
-        if not _distance_in_range(t, distance_km):
+        if not t.in_range(distance_km):
             continue
 
-        capacity = _to_float(t.get("грузоподъёмность")) or 0
+        capacity = t.capacity or 0
         if capacity <= 0:
             continue
 
-        weight_if = _norm_str(t.get("weight_if") or "any")
-
-        cost = _trip_cost(t, distance_km)
-        cpt = cost / capacity if capacity else float("inf")
-        candidates.append({
-            "tag": tag,
-            "tariff": t,
-            "capacity": capacity,
-            "cost": cost,
-            "cpt": cpt,
-            "weight_if": weight_if,
-        })
+        candidates.append(_Candidate(t, capacity, t.trip_cost(distance_km)))
 
     if not candidates:
         return None
 
-
     weight_left = total_weight
-    trips: List[Dict[str, Any]] = []
+    trips: List[Trip] = []
 
     # готовим остатки по позициям, чтобы понимать, что едет в каждой машине
-    remaining_items: List[Dict[str, Any]] = []
+    remaining_items: List[_Remaining] = []
     for it in items:
-        qty = _to_float(it.get("quantity") or it.get("count") or 0)
+        qty = _to_float(it.quantity or 0)
         if qty <= 0:
             continue
-        remaining_items.append(
-            {
-                "category": it.get("category"),
-                "subtype": it.get("subtype"),
-                "weight_per_item": _to_float(it.get("weight_per_item")),
-                "special_threshold": _to_float(it.get("special_threshold")),
-                "remaining_qty": qty,
-            }
-        )
+        remaining_items.append(_Remaining(it, qty))
 
-    def _allocate_items_for_trip(load_limit: float) -> Tuple[List[str], List[Dict[str, Any]], float]:
-        """Возвращает список товаров, помещённых в рейс, их мета и фактический вес."""
+    def _allocate_items_for_trip(load_limit: float) -> Tuple[List[tuple], List[Tuple[float, float]], float]:
+        """Возвращает товары, помещённые в рейс, их (кол-во, порог) и фактический вес."""
 
-        assigned: List[str] = []
-        assigned_meta: List[Dict[str, Any]] = []
+        assigned: List[tuple] = []
+        assigned_meta: List[Tuple[float, float]] = []
         load_used = 0.0
         if load_limit <= 0:
-            return assigned, load_used
+            return assigned, assigned_meta, load_used
 
         for item in remaining_items:
             if load_limit - load_used < 0.01:
                 break
 
-            qty_left = item.get("remaining_qty", 0)
+            qty_left = item.remaining_qty
             if qty_left <= 0:
                 continue
 
-            weight_per_item = _to_float(item.get("weight_per_item"))
+            weight_per_item = item.weight_per_item
             if weight_per_item <= 0:
                 # Нулевой вес — просто отгружаем остаток
                 take_qty = int(qty_left)
                 if take_qty > 0:
-                    item["remaining_qty"] = qty_left - take_qty
-                    assigned.append(
-                        f"{item.get('category')} {item.get('subtype')}: {take_qty} шт"
-                    )
-                    assigned_meta.append(
-                        {
-                            "category": item.get("category"),
-                            "subtype": item.get("subtype"),
-                            "qty": take_qty,
-                            "special_threshold": item.get("special_threshold"),
-                        }
-                    )
+                    item.remaining_qty = qty_left - take_qty
+                    assigned.append((item.category, item.subtype, take_qty))
+                    assigned_meta.append((take_qty, item.special_threshold))
                 continue
 
             max_qty_by_weight = int((load_limit - load_used + 1e-6) // weight_per_item)
@@ -236,42 +212,33 @@ def _linear_plan(
                 continue
 
             load_used += take_qty * weight_per_item
-            item["remaining_qty"] = qty_left - take_qty
-            assigned.append(
-                f"{item.get('category')} {item.get('subtype')}: {int(take_qty)} шт"
-            )
-            assigned_meta.append(
-                {
-                    "category": item.get("category"),
-                    "subtype": item.get("subtype"),
-                    "qty": take_qty,
-                    "special_threshold": item.get("special_threshold"),
-                }
-            )
+            item.remaining_qty = qty_left - take_qty
+            assigned.append((item.category, item.subtype, int(take_qty)))
+            assigned_meta.append((take_qty, item.special_threshold))
         return assigned, assigned_meta, load_used
 
-    def _assign_trip(tag: str, info: Dict[str, Any], load: float, tariff: Dict[str, Any], base_cost: float) -> bool:
+    def _assign_trip(tag: str, load: float, tariff: Tariff, base_cost: float) -> bool:
         nonlocal weight_left
 
         items_loaded, meta_loaded, real_weight = _allocate_items_for_trip(load)
         if real_weight <= 0 and weight_left > 0:
             return False
-        
-        tariff_name_norm = _norm_str(tariff.get("название") or tariff.get("name") or "")
+
         trip_cost = base_cost
-        if "daf" in tariff_name_norm:
+        if "daf" in tariff.name_norm:
             trip_cost = _calc_daf_step_cost(base_cost, meta_loaded)
 
         trips.append(
-            {
-                "tag": tag,
-                "tariff_name": tariff.get("название") or tariff.get("name") or tag,
-                "tariff_label": _tariff_label(tariff),
-                "trip_cost": trip_cost,
-                "load_ton": round(real_weight, 2),
-                "distance_km": distance_km,
-                "items": items_loaded or [f"Смешанная загрузка ({round(load,2)}т)"],
-            }
+            Trip(
+                tag,
+                tariff,
+                tariff.raw.get("название") or tariff.raw.get("name") or tag,
+                trip_cost,
+                round(real_weight, 2),
+                distance_km,
+                loads=tuple(items_loaded),
+                note=None if items_loaded else f"Смешанная загрузка ({round(load,2)}т)",
+            )
         )
         weight_left = max(weight_left - real_weight, 0.0)
         return True
@@ -279,78 +246,60 @@ def _linear_plan(
     # Гарантируем обязательный манипулятор, если он нужен
     if require_manipulator:
         mani = min(
-            (c for c in candidates if c["tag"] == "manipulator"),
-            key=lambda x: x["cpt"],
+            (c for c in candidates if c.tag == "manipulator"),
+            key=lambda x: x.cpt,
             default=None,
         )
         if not mani:
             return None
-        load_plan = min(weight_left, mani["capacity"])
-        cost = _trip_cost(mani["tariff"], distance_km)
-        _assign_trip("manipulator", mani, load_plan, mani["tariff"], cost)
+        load_plan = min(weight_left, mani.capacity)
+        _assign_trip("manipulator", load_plan, mani.tariff, mani.cost)
 
     safety_guard = 0
     while weight_left > 0.01:
         safety_guard += 1
+        incr("planner_iterations")
         if safety_guard > 50:
             return None
 
-        best_choice = None
+        best_choice: Optional[_Candidate] = None
+        best_load = 0.0
+        best_eff_cpt = 0.0
         for info in candidates:
-            tag = info["tag"]
-            load = min(weight_left, info["capacity"])
+            load = min(weight_left, info.capacity)
             if load <= 0:
                 continue
 
-            weight_if = info.get("weight_if", "any")
-            if weight_if == "≤20" and load > 20:
+            if info.weight_if == "≤20" and load > 20:
                 continue
-            if weight_if == ">20" and load <= 20:
+            if info.weight_if == ">20" and load <= 20:
                 continue
 
-            cost = _trip_cost(info["tariff"], distance_km)
-            eff_cpt = cost / load if load > 0 else float("inf")
-            if best_choice is None or eff_cpt < best_choice["eff_cpt"]:
-                best_choice = {
-                    "tag": tag,
-                    "info": info,
-                    "load": load,
-                    "tariff": info["tariff"],
-                    "cost": cost,
-                    "eff_cpt": eff_cpt,
-                }
+            eff_cpt = info.cost / load if load > 0 else float("inf")
+            if best_choice is None or eff_cpt < best_eff_cpt:
+                best_choice, best_load, best_eff_cpt = info, load, eff_cpt
         # если ничего не изменилось — выходим, чтобы избежать бесконечного цикла
         if not best_choice:
             return None
 
-        success = _assign_trip(
-            best_choice["tag"],
-            best_choice["info"],
-            best_choice["load"],
-            best_choice["tariff"],
-            best_choice["cost"],
-        )
+        success = _assign_trip(best_choice.tag, best_load, best_choice.tariff, best_choice.cost)
 
         if not success:
             # если не удалось погрузить ни одного товара, убираем этот тип транспорта из списка
-            candidates = [c for c in candidates if c.get("tag") != best_choice["tag"]]
+            candidates = [c for c in candidates if c.tag != best_choice.tag]
             if not candidates:
                 return None
             continue
 
-    total_cost = sum(t["trip_cost"] for t in trips)
-    return {
-        "type": "linear",
-        "transport_cost": total_cost,
-        "trips": trips,
-    }
+    total_cost = sum(t.trip_cost for t in trips)
+    return ("linear", total_cost, trips)
 
 def _daf_plan(
-    items: List[Dict[str, Any]],
+    items: List[Selection],
     distance_km: float,
-    tariffs: List[Dict[str, Any]],
+    tariffs: List[Tariff],
     require_manipulator: bool,
-) -> Optional[Dict[str, Any]]:
+) -> Optional[Tuple[str, float, List[Trip]]]:
     """Расчёт с опорой на DAF (ступенчатый тариф по special_threshold)."""
     daf_capacity = 55.0
     daf_tariff = _select_tariff_for_load(
@@ -359,19 +308,20 @@ def _daf_plan(
     if not daf_tariff:
         return None
 
-    trips = []
+    trips: List[Trip] = []
     total_cost = 0.0
 
     for item in items:
-        qty = item.get("quantity", 0)
+        qty = item.quantity
         if qty <= 0:
             continue
-        threshold = _to_float(item.get("special_threshold"))
-        max_per_trip = _to_float(item.get("max_per_trip")) or qty
-        weight_per_item = _to_float(item.get("weight_per_item"))
+        threshold = _to_float(item.special_threshold)
+        max_per_trip = _to_float(item.max_per_trip) or qty
+        weight_per_item = _to_float(item.weight_per_item)
         remaining = qty
 
         while remaining > 0:
+            incr("planner_iterations")
             load_items = min(remaining, max_per_trip)
 
             # Корректно ограничиваем загрузку вместимостью DAF с учётом плавающей арифметики
@@ -392,24 +342,22 @@ def _daf_plan(
             )
             if not trip_tariff:
                 return None
-            base_cost = _trip_cost(trip_tariff, distance_km)
+            base_cost = trip_tariff.trip_cost(distance_km)
             if threshold and load_items >= threshold:
                 cost = base_cost / threshold * load_items
             else:
                 cost = base_cost
 
             trips.append(
-                {
-                    "tag": "long_haul",
-                    "tariff_name": trip_tariff.get("название") or "DAF",
-                    "tariff_label": _tariff_label(trip_tariff),
-                    "trip_cost": cost,
-                    "load_ton": round(load_weight, 2),
-                    "distance_km": distance_km,
-                    "items": [
-                        f"{item.get('category')} {item.get('subtype')}: {load_items} шт"
-                    ],
-                }
+                Trip(
+                    "long_haul",
+                    trip_tariff,
+                    trip_tariff.raw.get("название") or "DAF",
+                    cost,
+                    round(load_weight, 2),
+                    distance_km,
+                    loads=((item.category, item.subtype, load_items),),
+                )
             )
             total_cost += cost
             remaining -= load_items
@@ -422,48 +370,62 @@ def _daf_plan(
         mani_tariff = _select_tariff_for_load(tariffs, "manipulator", distance_km, 5)
         if not mani_tariff:
             return None
-        mani_cost = _trip_cost(mani_tariff, distance_km)
+        mani_cost = mani_tariff.trip_cost(distance_km)
         trips.append(
-            {
-                "tag": "manipulator",
-                "tariff_name": mani_tariff.get("название") or "Манипулятор",
-                "tariff_label": _tariff_label(mani_tariff),
-                "trip_cost": mani_cost,
-                "load_ton": min(10.0, sum(i.get("load_ton", 0) for i in trips)),
-                "distance_km": distance_km,
-                "items": ["Обязательный манипулятор (+1)",],
-            }
+            Trip(
+                "manipulator",
+                mani_tariff,
+                mani_tariff.raw.get("название") or "Манипулятор",
+                mani_cost,
+                min(10.0, sum(t.load_ton for t in trips)),
+                distance_km,
+                note="Обязательный манипулятор (+1)",
+            )
         )
         total_cost += mani_cost
 
-    return {
-        "type": "daf",
-        "transport_cost": total_cost,
-        "trips": trips,
-    }
+    return ("daf", total_cost, trips)
 
 
 # === ОСНОВНОЙ РАСЧЁТ ========================================================
 
+def scenario_factory_coords(scenarios: List[Scenario]) -> List[Tuple[float, float]]:
+    """Уникальные координаты (lon, lat) заводов во всех сценариях — для предзагрузки расстояний."""
+    coords: Dict[Tuple[float, float], None] = {}
+    for sc in scenarios:
+        for items in sc.factories.values():
+            if not items:
+                continue
+            f_obj = items[0].factory
+            if f_obj.lat is not None and f_obj.lon is not None:
+                coords[(f_obj.lon, f_obj.lat)] = None
+    return list(coords)
+
+
 def evaluate_scenario_transport(
-    scenario: Dict[str, Any],
+    scenario: Scenario,
     req,
     calc_tariffs: Optional[List[Dict[str, Any]]],
-) -> Optional[Dict[str, Any]]:
-    """Подобрать оптимальный транспортный план для выбранного сценария."""
+) -> Optional[QuoteResult]:
+    """Подобрать оптимальный транспортный план для выбранного сценария.
+
+    Возвращает компактный ``QuoteResult``; прежний словарь — ``result.to_dict()``.
+    """
 
     if not calc_tariffs:
         logger.warning("⚠️ calc_tariffs пуст или None, расчёт невозможен.")
         return None
+    tariffs = compile_tariffs(calc_tariffs)
 
-    factories_map = scenario.get("factories") or {}
+    factories_map = scenario.factories
     if not factories_map:
-        logger.warning("⚠️ В сценарии нет ни одного завода: %s", scenario)
+        logger.warning("⚠️ В сценарии %s нет ни одного завода", scenario.scenario_id)
         return None
 
     transport_type = _norm_str(getattr(req, "transport_type", "auto"))
     add_manipulator = bool(getattr(req, "add_manipulator", False) or getattr(req, "addManipulator", False))
     selected_special = getattr(req, "selected_special", None)
+    cell_precision = getattr(req, "distance_precision", "exact") == "cell"
 
     if selected_special:
         allowed_tags = ["special"]
@@ -478,53 +440,59 @@ def evaluate_scenario_transport(
         allowed_tags = ["long_haul", "manipulator"]
         require_mani = add_manipulator
 
-    factory_plans: List[Dict[str, Any]] = []
+    factory_plans: List[FactoryPlan] = []
     total_material = 0.0
     total_delivery = 0.0
-    factory_distances: Dict[str, float] = {}
 
     for factory_name, items in factories_map.items():
         if not items:
             continue
-        f_obj = items[0].get("factory") or {}
-        lat = f_obj.get("lat")
-        lon = f_obj.get("lon")
+        f_obj = items[0].factory
+        lat = f_obj.lat
+        lon = f_obj.lon
         if lat is None or lon is None:
             logger.warning("⚠️ У завода %s отсутствуют координаты.", factory_name)
             continue
 
-        try:
-            distance_km = get_osrm_distance_km(lon, lat, req.upload_lon, req.upload_lat)
-        except OSRMUnavailableError as exc:
-            logger.error("OSRM недоступен для %s: %s", factory_name, exc)
-            return None
-
-        factory_distances[factory_name] = distance_km
-
-        total_weight = sum(_to_float(x.get("weight_total")) for x in items)
+        grid_km = grid_distance_km(lon, lat, req.upload_lon, req.upload_lat) if cell_precision else None
+        if grid_km is not None:
+            distance_km, distance_source = grid_km, SOURCE_GRID
+        else:
+            try:
+                distance_km, distance_source = lookup_distance(lon, lat, req.upload_lon, req.upload_lat)
+            except OSRMUnavailableError as exc:
+                # Пробрасываем наверх, чтобы эндпоинт сразу ответил 503,
+                # а не повторял запросы к OSRM для каждого следующего сценария
+                logger.error("OSRM недоступен для %s: %s", factory_name, exc)
+                raise
+        # для записи трафика (QUOTE_RECORD_FILE): какие расстояния дал расчёт
+        note_distance(lon, lat, distance_km)
+
+        total_weight = sum(_to_float(x.weight_total) for x in items)
         material_cost = sum(
-            _to_float(x.get("price_per_item") or x.get("price"))
-            * _to_float(x.get("quantity") or x.get("count"))
+            _to_float(x.price_per_item) * _to_float(x.quantity)
             for x in items
         )
         total_material += material_cost
 
-        # варианты планов
-        plans: List[Dict[str, Any]] = []
+        # варианты планов: (тип, стоимость доставки, рейсы)
+        plans: List[Tuple[str, float, List[Trip]]] = []
         linear_allowed = [t for t in allowed_tags if t in ("manipulator", "long_haul", "special")]
         if linear_allowed:
-            linear_plan = _linear_plan(
-                total_weight, distance_km, calc_tariffs, linear_allowed, require_mani, items
-            )
+            with span("linear_plan"):
+                linear_plan = _linear_plan(
+                    total_weight, distance_km, tariffs, linear_allowed, require_mani, items
+                )
             if linear_plan:
                 plans.append(linear_plan)
 
         has_threshold_items = any(
-            _to_float(x.get("special_threshold")) > 0 and _to_float(x.get("max_per_trip")) > 0
+            _to_float(x.special_threshold) > 0 and _to_float(x.max_per_trip) > 0
             for x in items
         )
         if "long_haul" in allowed_tags and has_threshold_items:
-            daf_plan = _daf_plan(items, distance_km, calc_tariffs, require_mani)
+            with span("daf_plan"):
+                daf_plan = _daf_plan(items, distance_km, tariffs, require_mani)
             if daf_plan:
                 plans.append(daf_plan)
 
@@ -532,55 +500,24 @@ def evaluate_scenario_transport(
             logger.warning("⚠️ Не удалось построить план для завода %s", factory_name)
             continue
 
-        best_plan = min(plans, key=lambda p: p["transport_cost"])
-        total_delivery += best_plan["transport_cost"]
+        _, transport_cost, trips = min(plans, key=lambda p: p[1])
+        total_delivery += transport_cost
 
         factory_plans.append(
-            {
-                "factory_name": factory_name,
-                "distance_km": distance_km,
-                "transport_cost": best_plan["transport_cost"],
-                "trips": best_plan["trips"],
-                "material_cost": material_cost,
-            }
+            FactoryPlan(
+                factory_name,
+                distance_km,
+                distance_source == SOURCE_ESTIMATE,
+                transport_cost,
+                trips,
+                material_cost,
+            )
         )
 
     if not factory_plans:
         return None
 
-    total_cost = total_material + total_delivery
-    trip_count = sum(len(f["trips"]) for f in factory_plans)
-    transport_names = sorted(
-        {
-            t.get("tariff_label")
-            or t.get("tariff_name")
-            or t.get("tag")
-            for f in factory_plans
-            for t in f["trips"]
-        }
-    )
-
-
-    factories_output = [
-        {
-            "factory_name": plan.get("factory_name"),
-            "distance_km": plan.get("distance_km"),
-            "trips": plan.get("trips", []),
-        }
-        for plan in factory_plans
-    ]
-
-    return {
-        "scenario": scenario,
-        "material_sum": total_material,
-        "delivery_cost": total_delivery,
-        "total_cost": total_cost,
-        "trip_count": trip_count,
-        "transport_name": ", ".join(transport_names),
-        "factory_distances": factory_distances,
-        "factory_plans": factory_plans,
-        "factories": factories_output,
-    }
+    return QuoteResult(scenario, total_material, total_delivery, total_material + total_delivery, factory_plans)
 
 def build_shipment_details_from_result(best_result, req):
     """Формирует детальный список по каждому рейсу и товарам."""
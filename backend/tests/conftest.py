@@ -0,0 +1,44 @@
+import importlib.util
+
+import pytest
+
+from backend.bench.quote_bench import use_distance_provider
+from backend.bench.workload import generate_workload
+from backend.core import data_loader
+from backend.service.distance_providers import HaversineDistanceProvider
+
+HTTPX_AVAILABLE = importlib.util.find_spec("httpx") is not None
+
+
+@pytest.fixture(scope="session")
+def quote_workload():
+    """Небольшой синтетический каталог с корзинами (без Google и OSRM)."""
+    return generate_workload(factories=30, categories=2, subtypes=8, baskets=6,
+                             max_items=3, max_combinations=32, seed=3)
+
+
+@pytest.fixture()
+def quote_storage(tmp_path, quote_workload):
+    """Временный storage с синтетическим каталогом и расстояниями по прямой."""
+    previous = data_loader.STORAGE_PATH
+    data_loader.set_storage_path(str(tmp_path))
+    data_loader._save_factories(quote_workload.products)
+    data_loader._save_tariffs(quote_workload.tariffs)
+    with use_distance_provider(HaversineDistanceProvider()):
+        yield tmp_path
+    data_loader.set_storage_path(previous)
+
+
+@pytest.fixture()
+def quote_client(quote_storage):
+    if not HTTPX_AVAILABLE:
+        pytest.skip("httpx is required for API-level tests")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.app.routes_quote import router
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api")
+    return TestClient(app)
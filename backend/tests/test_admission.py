@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from backend.core import admission
+from backend.core.admission import AdmissionController, AdmissionRejected, estimate_quote_work
+from backend.service.quote_records import OfferIndex
+
+
+@pytest.fixture()
+def restore_admission():
+    previous = admission.get_admission()
+    yield
+    admission.set_admission(previous)
+
+
+def test_work_estimate_grows_with_suppliers_and_tonnage(quote_workload) -> None:
+    index = OfferIndex(quote_workload.products_list)
+    item = dict(quote_workload.baskets[0]["items"][0])
+    suppliers = len(index.cheapest_per_factory(item["category"], item["subtype"]))
+
+    light = estimate_quote_work(index, [dict(item, quantity=1)])
+    assert light == suppliers
+    assert estimate_quote_work(index, [dict(item, quantity=1000)]) > light
+    assert estimate_quote_work(index, [dict(item, quantity=1)] * 3) == suppliers ** 3
+    assert estimate_quote_work(index, [dict(item, subtype="нет такого")]) == 0
+
+
+def test_heavy_quotes_are_capped_while_light_ones_pass() -> None:
+    controller = AdmissionController(slots=4, slot_work=100, heavy_share=0.5, wait_s=0.05)
+    heavy = controller.weight_for(250)
+    assert heavy == 2 and controller.weight_for(10) == 1
+
+    async def scenario():
+        await controller.acquire(heavy)
+        # вторая тяжёлая не влезает в долю тяжёлых и через wait_s получает отказ
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(heavy)
+        assert rejected.value.retry_after >= 1
+        # лёгкие идут в свободные слоты сразу
+        await controller.acquire(1)
+        await controller.acquire(1)
+        assert controller.status()["in_use"] == 4
+
+        # ожидающая тяжёлая получает слоты, когда первая освобождает их
+        waiting = asyncio.ensure_future(controller.acquire(heavy))
+        await asyncio.sleep(0.01)
+        controller.release(heavy, 0.1)
+        await asyncio.wait_for(waiting, 1)
+        assert controller.status()["heavy_in_use"] == heavy
+
+    asyncio.run(scenario())
+
+
+def test_quote_is_shed_with_retry_after_when_slots_are_busy(quote_client, quote_workload, restore_admission) -> None:
+    controller = AdmissionController(slots=1, wait_s=0)
+    admission.set_admission(controller)
+    asyncio.run(controller.acquire(1))
+
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0])
+    assert response.status_code == 503
+    assert int(response.headers["retry-after"]) >= 1
+    assert "перегружен" in response.json()["detail"]
+
+    controller.release(1, 0.0)
+    assert quote_client.post("/api/quote", json=quote_workload.baskets[0]).status_code == 200
+    assert controller.status()["in_use"] == 0
@@ -0,0 +1,78 @@
+import os
+
+from backend.core import catalog, data_loader
+
+
+def test_catalog_endpoint_supports_etag_revalidation(quote_client) -> None:
+    first = quote_client.get("/api/categories")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert "must-revalidate" in first.headers["cache-control"]
+
+    cached = quote_client.get("/api/categories", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_catalog_bodies_are_served_precompressed(quote_client) -> None:
+    plain = quote_client.get("/api/factories", headers={"Accept-Encoding": "identity"})
+    gzipped = quote_client.get("/api/factories", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzipped.json() == plain.json()
+
+
+def test_catalog_is_loaded_once_per_data_version(quote_client, quote_workload, monkeypatch) -> None:
+    loads = []
+    original = data_loader.load_factories_and_tariffs
+
+    def counting_load():
+        loads.append(1)
+        return original()
+
+    monkeypatch.setattr(data_loader, "load_factories_and_tariffs", counting_load)
+    catalog.invalidate_catalog()
+
+    etag = quote_client.get("/api/tariffs").headers["etag"]
+    quote_client.get("/api/categories")
+    quote_client.post("/api/quote", json=quote_workload.baskets[0])
+    assert len(loads) == 1
+
+    data_loader._save_tariffs(quote_workload.tariffs[:1])
+    stat = os.stat(data_loader.TARIFFS_FILE)
+    os.utime(data_loader.TARIFFS_FILE, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+
+    response = quote_client.get("/api/tariffs", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert len(loads) == 2
+
+
+def test_bootstrap_combines_catalog_in_one_versioned_document(quote_client) -> None:
+    response = quote_client.get("/api/bootstrap")
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["version"] == catalog.get_catalog().version
+    assert body["categories"] == quote_client.get("/api/categories").json()
+    for category, subtypes in body["categories"].items():
+        assert sorted(body["subtypes"][category]) == subtypes
+        assert all("weight_per_item" in meta for meta in body["subtypes"][category].values())
+
+    tariff_names = {t.get("название") or t.get("name") for t in quote_client.get("/api/tariffs").json()}
+    assert {t["name"] for t in body["tariffs"]} == tariff_names
+
+    cached = quote_client.get("/api/bootstrap", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_warm_catalog_prerenders_bootstrap(quote_storage) -> None:
+    from backend.app.routes_quote import _build_bootstrap, warm_catalog
+
+    catalog.invalidate_catalog()
+    snapshot = catalog.get_catalog()
+    warm_catalog(snapshot)
+
+    rendered = snapshot.rendered("bootstrap", _build_bootstrap)
+    assert rendered.etag and b'"categories"' in rendered.body
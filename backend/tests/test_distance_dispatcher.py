@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from backend.bench.quote_bench import use_distance_provider
+from backend.core import distance
+from backend.service.distance_dispatcher import DistanceDispatcher
+from backend.service.distance_providers import DistanceProvider
+from backend.service.osrm_client import OSRMUnavailableError
+
+
+class TableCountingProvider(DistanceProvider):
+    name = "table-counting"
+
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.table_calls = []
+        self._lock = threading.Lock()
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        return abs(lon_from - lon_to) * 100 + abs(lat_from - lat_to) * 100
+
+    def table_km(self, sources, destinations):
+        with self._lock:
+            self.table_calls.append((len(sources), len(destinations)))
+        if self.fail:
+            raise OSRMUnavailableError("down")
+        return super().table_km(sources, destinations)
+
+
+def test_pairs_from_many_callers_share_one_table_call() -> None:
+    provider = TableCountingProvider()
+    dispatcher = DistanceDispatcher(window_ms=50, max_pairs=100, provider_getter=lambda: provider)
+    futures = []
+
+    def caller(i: int) -> None:
+        futures.append(dispatcher.submit((37.0 + i / 100, 55.0), (37.6, 55.7)))
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    results = sorted(f.result(timeout=2) for f in futures)
+    assert provider.table_calls == [(10, 1)]
+    assert results[0] == pytest.approx(provider.distance_km(37.09, 55.0, 37.6, 55.7))
+
+
+def test_batch_is_split_by_table_size_limit() -> None:
+    provider = TableCountingProvider()
+    dispatcher = DistanceDispatcher(
+        window_ms=50, max_pairs=100, max_coords=4, provider_getter=lambda: provider
+    )
+    futures = [dispatcher.submit((37.0 + i, 55.0), (37.6, 55.7)) for i in range(6)]
+
+    for f in futures:
+        f.result(timeout=2)
+    assert provider.table_calls == [(3, 1), (3, 1)]
+
+
+def test_failed_table_call_reaches_every_waiter() -> None:
+    provider = TableCountingProvider(fail=True)
+    dispatcher = DistanceDispatcher(window_ms=20, provider_getter=lambda: provider)
+    futures = [dispatcher.submit((37.0 + i, 55.0), (37.6, 55.7)) for i in range(3)]
+
+    for f in futures:
+        with pytest.raises(OSRMUnavailableError):
+            f.result(timeout=2)
+
+
+def test_prefetch_fills_cache_with_one_table_call() -> None:
+    provider = TableCountingProvider()
+    sources = [(37.0 + i / 10, 55.0) for i in range(5)]
+    with use_distance_provider(provider):
+        assert distance.prefetch_distances(sources + sources[:2], (37.6, 55.7)) == 5
+        assert distance.prefetch_distances(sources, (37.6, 55.7)) == 0
+        _, source = distance.lookup_distance(37.2, 55.0, 37.6, 55.7)
+
+    assert provider.table_calls == [(5, 1)]
+    assert source == distance.SOURCE_CACHE
@@ -0,0 +1,97 @@
+import pytest
+
+from backend.bench.quote_bench import use_distance_provider
+from backend.service import distance_grid
+from backend.service.distance_grid import (
+    DistanceGrid,
+    build_grid,
+    cell_centroid,
+    cell_of,
+    parse_regions,
+    region_cells,
+)
+from backend.service.distance_providers import DistanceProvider, HaversineDistanceProvider
+from backend.service.osrm_client import OSRMUnavailableError
+
+
+class CountingProvider(HaversineDistanceProvider):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def table_km(self, sources, destinations):
+        self.calls.append((len(sources), len(destinations)))
+        return super().table_km(sources, destinations)
+
+
+class NoNetworkProvider(DistanceProvider):
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        raise AssertionError("запрос расстояния при distancePrecision=cell")
+
+    def table_km(self, sources, destinations):
+        raise AssertionError("запрос /table при distancePrecision=cell")
+
+
+@pytest.fixture(autouse=True)
+def reset_grid():
+    distance_grid.set_grid(None)
+    yield
+    distance_grid.set_grid(None)
+
+
+def test_cells_are_stable_and_cover_region() -> None:
+    regions = parse_regions("moscow:55.55,37.35,55.95,37.85;bad:1,2")
+    assert [r.name for r in regions] == ["moscow"]
+
+    cells = region_cells(regions, 5.0)
+    assert 50 < len(cells) < 200
+    for cell in cells[:20]:
+        lon, lat = cell_centroid(cell, 5.0)
+        assert cell_of(lat, lon, 5.0) == cell
+    assert cell_of(55.7558, 37.6173, 5.0) in cells
+
+
+def test_build_grid_chunks_table_calls_and_reuses_known_factories(tmp_path) -> None:
+    regions = parse_regions("center:55.6,37.4,55.9,37.8")
+    factories = [(37.0, 55.0), (38.2, 56.1), (36.5, 55.4)]
+    provider = CountingProvider()
+
+    grid = build_grid(factories, regions, 3.0, provider=provider, max_coords=20)
+    assert all(src + dst <= 20 for src, dst in provider.calls)
+
+    lon_to, lat_to = 37.6173, 55.7558
+    expected = provider.distance_km(37.0, 55.0, *cell_centroid(cell_of(lat_to, lon_to, 3.0), 3.0))
+    assert grid.lookup(37.0, 55.0, lon_to, lat_to) == pytest.approx(expected, rel=1e-6)
+    assert grid.lookup(37.0, 55.0, 30.3, 59.9) is None  # вне регионов
+    assert grid.lookup(10.0, 10.0, lon_to, lat_to) is None  # неизвестный завод
+
+    path = str(tmp_path / "grid.bin")
+    grid.save(path)
+    grid.save(path)
+    assert [p.name for p in tmp_path.iterdir()] == ["grid.bin"]  # временные файлы не остаются
+    loaded = DistanceGrid.load(path)
+    assert loaded.signature == grid.signature
+    assert loaded.lookup(37.0, 55.0, lon_to, lat_to) == grid.lookup(37.0, 55.0, lon_to, lat_to)
+
+    provider.calls.clear()
+    build_grid(factories + [(39.0, 54.9)], regions, 3.0, provider=provider, previous=loaded, max_coords=20)
+    assert {src for src, _ in provider.calls} == {1}
+
+
+def test_cell_precision_quote_makes_no_distance_requests(quote_client, quote_workload, monkeypatch) -> None:
+    payload = dict(quote_workload.baskets[0])
+    lon, lat = payload["upload_lon"], payload["upload_lat"]
+    monkeypatch.setattr(distance_grid, "DISTANCE_GRID_REGIONS", f"hot:{lat - 0.2},{lon - 0.2},{lat + 0.2},{lon + 0.2}")
+    monkeypatch.setattr(distance_grid, "DISTANCE_GRID_CELL_KM", 5.0)
+
+    assert distance_grid.refresh_grid() is True
+    assert distance_grid.refresh_grid() is False  # набор заводов не менялся
+    assert distance_grid.grid_status()["grid"]["cells"] > 0
+
+    with use_distance_provider(NoNetworkProvider()):
+        response = quote_client.post("/api/quote", json=dict(payload, distancePrecision="cell"))
+        assert response.status_code == 200
+        assert response.json()["variants"]
+
+        with pytest.raises((AssertionError, OSRMUnavailableError)):
+            quote_client.post("/api/quote", json=payload)
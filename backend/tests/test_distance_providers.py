@@ -0,0 +1,57 @@
+import pytest
+
+from backend.bench.fake_osrm import start_fake_osrm
+from backend.service import osrm_client
+from backend.service.distance_providers import (
+    HaversineDistanceProvider,
+    OSRMDistanceProvider,
+    RecordingDistanceProvider,
+    ReplayDistanceProvider,
+    haversine_km,
+)
+
+MOSCOW = (37.6173, 55.7558)
+TUBETON = (36.498658, 55.577505)
+
+
+@pytest.fixture()
+def fake_osrm(monkeypatch):
+    server = start_fake_osrm(detour_factor=1.0)
+    monkeypatch.setattr(osrm_client, "OSRM_BASE_URL", server.base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_osrm_provider_against_fake_server(fake_osrm) -> None:
+    provider = OSRMDistanceProvider()
+    expected = haversine_km(*TUBETON, *MOSCOW)
+
+    assert provider.distance_km(*TUBETON, *MOSCOW) == pytest.approx(expected, abs=0.01)
+
+    matrix = provider.table_km([TUBETON, MOSCOW], [MOSCOW])
+    assert matrix[0][0] == pytest.approx(expected, abs=0.01)
+    assert matrix[1][0] == pytest.approx(0.0, abs=0.01)
+    assert fake_osrm.requests_served == 2
+
+
+def test_recorded_distances_replay_without_network(tmp_path) -> None:
+    recorder = RecordingDistanceProvider(HaversineDistanceProvider(detour_factor=1.25))
+    km = recorder.distance_km(*TUBETON, *MOSCOW)
+    path = recorder.save(tmp_path / "distances.jsonl")
+
+    replay = ReplayDistanceProvider.from_file(path)
+
+    assert replay.distance_km(*TUBETON, *MOSCOW) == km
+    with pytest.raises(osrm_client.OSRMUnavailableError):
+        replay.distance_km(*MOSCOW, *TUBETON)
+
+
+def test_get_osrm_distance_km_uses_active_provider() -> None:
+    osrm_client.set_distance_provider(HaversineDistanceProvider(detour_factor=2.0))
+    try:
+        km = osrm_client.get_osrm_distance_km(*TUBETON, *MOSCOW)
+    finally:
+        osrm_client.set_distance_provider(None)
+
+    assert km == pytest.approx(2.0 * haversine_km(*TUBETON, *MOSCOW))
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend.bench.quote_bench import use_distance_provider
+from backend.core import distance
+from backend.core.singleflight import SingleFlight
+from backend.service.distance_providers import DistanceProvider
+
+
+class SlowCountingProvider(DistanceProvider):
+    name = "slow"
+
+    def __init__(self, delay_s: float = 0.1):
+        self.delay_s = delay_s
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def distance_km(self, lon_from, lat_from, lon_to, lat_to):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay_s)
+        return 42.0
+
+
+def test_concurrent_threads_share_one_provider_call() -> None:
+    provider = SlowCountingProvider()
+    results = []
+    with use_distance_provider(provider):
+        threads = [
+            threading.Thread(target=lambda: results.append(
+                distance.lookup_distance(37.0, 55.0, 37.61, 55.75)
+            ))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert provider.calls == 1
+    assert [km for km, _ in results] == [42.0] * 8
+
+
+def test_concurrent_coroutines_share_one_provider_call() -> None:
+    provider = SlowCountingProvider()
+
+    async def run():
+        return await asyncio.gather(*[
+            distance.alookup_distance(37.0, 55.0, 37.62, 55.76) for _ in range(6)
+        ])
+
+    with use_distance_provider(provider):
+        results = asyncio.run(run())
+
+    assert provider.calls == 1
+    assert {km for km, _ in results} == {42.0}
+
+
+def test_waiters_receive_leader_exception() -> None:
+    flights = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.05)
+        raise RuntimeError("boom")
+
+    def follower():
+        started.wait()
+        try:
+            flights.do("key", failing)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    t = threading.Thread(target=follower)
+    t.start()
+    with pytest.raises(RuntimeError):
+        flights.do("key", failing)
+    t.join()
+
+    assert len(errors) == 1
+    assert flights.in_flight() == 0
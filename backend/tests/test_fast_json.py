@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from backend.core import responses
+from backend.core.responses import FastJSONResponse, dumps_json
+
+
+def test_fast_serializer_matches_standard_json() -> None:
+    content = {"завод": "Тучково", "машина": {"цена": 1234.5, "рейсы": [1, 2]}, "товары": None}
+
+    assert json.loads(dumps_json(content)) == content
+
+
+def test_huge_ints_fall_back_to_standard_encoder() -> None:
+    content = {"last": 2 ** 80}
+
+    assert json.loads(FastJSONResponse(content).body) == content
+
+
+@pytest.mark.skipif(responses.orjson is None, reason="orjson не установлен")
+def test_quote_response_is_built_in_serialisable_form(quote_client, quote_workload, monkeypatch) -> None:
+    def no_fallback(content):
+        raise AssertionError("ответ /quote не должен требовать стандартный json")
+
+    monkeypatch.setattr(responses, "dumps_std", no_fallback)
+
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0], headers={"X-Debug-Timing": "1"})
+
+    assert response.status_code == 200
+    assert response.json()["variants"]
+
+
+@pytest.mark.parametrize("serializer", ["orjson", "json"])
+@pytest.mark.parametrize("bad", [float("nan"), float("inf"), float("-inf")])
+def test_non_finite_floats_are_rejected_by_both_encoders(serializer, bad, monkeypatch) -> None:
+    monkeypatch.setattr(responses, "JSON_SERIALIZER", serializer)
+
+    with pytest.raises(ValueError):
+        dumps_json({"variants": [{"totalCost": bad, "note": None}]})
+    # обычный null по-прежнему сериализуется
+    assert json.loads(dumps_json({"cost": 1.5, "note": None})) == {"cost": 1.5, "note": None}
@@ -4,9 +4,20 @@ import pytest
 from fastapi import FastAPI
 
 from backend.app.routes_fibonacci import router
-from backend.service.fibonacci_service import fibonacci_sequence
+from backend.service.fibonacci_service import (
+    FIBONACCI_MAX_N,
+    FIBONACCI_TABLE_SIZE,
+    fibonacci,
+    fibonacci_sequence,
+    int_to_str,
+    iter_fibonacci_json,
+    render_sequence,
+)
 
 HTTPX_AVAILABLE = importlib.util.find_spec("httpx") is not None
+requires_benchmark = pytest.mark.skipif(
+    importlib.util.find_spec("pytest_benchmark") is None, reason="pytest-benchmark is required for benchmark tests"
+)
 
 
 @pytest.fixture()
@@ -43,4 +54,107 @@ def test_fibonacci_service_handles_larger_sequences() -> None:
 
     assert len(sequence) == 20
     assert sequence[:5] == [0, 1, 1, 2, 3]
-    assert sequence[-1] == 4181
\ No newline at end of file
+    assert sequence[-1] == 4181
+
+def test_fibonacci_sequence_body_matches_json_encoder(client) -> None:
+    import json
+
+    response = client.get("/api/fibonacci", params={"count": 1000})
+
+    assert response.status_code == 200
+    sequence = fibonacci_sequence(1000)
+    expected = json.dumps({"count": 1000, "sequence": sequence, "last": sequence[-1]}, separators=(",", ":"))
+    assert response.content == expected.encode()
+
+
+def test_fibonacci_fast_doubling_matches_iteration() -> None:
+    sequence = fibonacci_sequence(3000)
+
+    for n in (0, 1, 2, 999, 1000, 1001, 2047, 2999):
+        assert fibonacci(n) == sequence[n]
+        assert fibonacci(n, mod=1_000_000_007) == sequence[n] % 1_000_000_007
+
+
+def test_fibonacci_number_endpoint_supports_modulus_and_caps_plain_values(client) -> None:
+    response = client.get("/api/fibonacci/90")
+    assert response.json() == {"n": 90, "mod": None, "value": 2880067194370816120}
+
+    # F(10^18) mod 10^9+7 за O(log n)
+    response = client.get("/api/fibonacci/1000000000000000000", params={"mod": 1_000_000_007})
+    assert response.status_code == 200
+    assert response.json()["value"] == 209783453
+
+    response = client.get(f"/api/fibonacci/{FIBONACCI_MAX_N + 1}")
+    assert response.status_code == 422
+    assert "mod" in response.json()["detail"]
+
+
+@requires_benchmark
+@pytest.mark.benchmark(group="fibonacci-range")
+@pytest.mark.parametrize("count", [10, FIBONACCI_TABLE_SIZE])
+def test_bench_fibonacci_cached_range(benchmark, count) -> None:
+    render_sequence(1)  # таблица строится один раз на процесс
+
+    body = benchmark(render_sequence, count)
+
+    assert body.startswith(b'{"count":%d,' % count)
+
+
+def test_fibonacci_stream_emits_ndjson_and_json_array(client) -> None:
+    import json
+
+    expected = fibonacci_sequence(1200)[995:1200]
+
+    response = client.get("/api/fibonacci/stream", params={"start": 995, "count": 205})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["n"] for line in lines] == list(range(995, 1200))
+    assert [line["value"] for line in lines] == expected
+
+    response = client.get("/api/fibonacci/stream", params={"start": 995, "count": 205, "format": "json"})
+    assert json.loads(response.text) == expected
+
+
+def test_fibonacci_stream_rejects_ranges_over_the_output_budget(client) -> None:
+    from backend.app.routes_fibonacci import FIBONACCI_STREAM_MAX_DIGITS
+    from backend.service.fibonacci_service import estimate_range_digits
+
+    # оценка не меньше настоящего объёма
+    exact = sum(len(str(v)) for v in fibonacci_sequence(1200)[995:1200])
+    assert exact <= estimate_range_digits(995, 205) <= exact + 205
+
+    # каждое число в пределах start/count, но вместе — больше бюджета
+    assert estimate_range_digits(100_000, 5_000) > FIBONACCI_STREAM_MAX_DIGITS
+    response = client.get("/api/fibonacci/stream", params={"start": 100_000, "count": 5_000})
+    assert response.status_code == 422
+    assert "предел" in response.json()["detail"]
+
+    assert client.get("/api/fibonacci/stream", params={"count": 10**6}).status_code == 422
+
+
+def test_int_to_str_handles_numbers_past_the_str_digit_limit() -> None:
+    value = fibonacci(FIBONACCI_MAX_N) ** 3  # ~12600 цифр: str() упирается в лимит
+    text = int_to_str(value)
+
+    assert len(text) > 12000
+    assert int(text[:30]) == value // 10 ** (len(text) - 30)
+    assert text[-6:] == f"{value % 10**6:06d}"
+
+
+def test_fibonacci_stream_peak_memory_is_flat_in_count() -> None:
+    import tracemalloc
+
+    def peak(count: int) -> int:
+        tracemalloc.start()
+        try:
+            for _ in iter_fibonacci_json(100_000, count):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    small, large = peak(200), peak(2000)
+    # ~21 тыс. цифр на число: весь диапазон в памяти занял бы ~40 МБ
+    assert large < small * 1.5
+    assert large < 2 * 1024 * 1024
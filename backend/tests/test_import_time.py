@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Бюджет на импорт приложения (мс, суммарно по -X importtime). Цель — ~450 мс,
+# из которых ~300 мс занимает сам FastAPI; запас на медленные CI-машины.
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# Эти пакеты нужны только при загрузке таблицы или походе в OSRM
+LAZY_MODULES = ("gspread", "google", "google_auth_oauthlib", "requests", "urllib3")
+
+_PROBE = (
+    "import sys, backend.app.main; "
+    "print(','.join(sorted({m.split('.')[0] for m in sys.modules} & set(sys.argv[1].split(',')))))"
+)
+
+
+def test_app_import_skips_heavy_deps_and_fits_budget() -> None:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE, ",".join(LAZY_MODULES)],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+
+    loaded = result.stdout.strip()
+    assert loaded == "", f"при старте импортированы тяжёлые зависимости: {loaded}"
+
+    # строка вида "import time:  self [us] | cumulative | module"
+    app_line = next(line for line in result.stderr.splitlines() if line.rstrip().endswith("| backend.app.main"))
+    cumulative_ms = int(app_line.split("|")[1]) / 1000
+    assert cumulative_ms < IMPORT_TIME_BUDGET_MS, f"импорт приложения занял {cumulative_ms:.0f} мс"
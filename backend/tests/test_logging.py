@@ -0,0 +1,65 @@
+import io
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+from backend.core.logger import JsonFormatter, SamplingFilter, _DeferredQueueHandler, lazy
+
+
+def _make_logger(name: str, rate: float = 1.0):
+    out = io.StringIO()
+    stream = logging.StreamHandler(out)
+    stream.setFormatter(JsonFormatter())
+    q = queue.SimpleQueue()
+    handler = _DeferredQueueHandler(q)
+    handler.addFilter(SamplingFilter(rate))
+    logger = logging.getLogger(name)
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    listener = QueueListener(q, stream)
+    return logger, listener, out
+
+
+def test_records_are_written_as_json_lines_by_background_thread() -> None:
+    logger, listener, out = _make_logger("test.json")
+    listener.start()
+    logger.info("Расчёт %s", "готов", extra={"items": 3})
+    listener.stop()
+
+    entry = json.loads(out.getvalue())
+    assert entry["msg"] == "Расчёт готов"
+    assert entry["level"] == "INFO"
+    assert entry["items"] == 3
+
+
+def test_dropped_debug_records_never_evaluate_lazy_args() -> None:
+    logger, listener, out = _make_logger("test.sampled", rate=0.0)
+    calls = []
+    listener.start()
+    logger.debug("%s", lazy(lambda: calls.append(1) or "тяжёлое"))
+    logger.debug("всегда", extra={"sample_rate": 1.0})
+    logger.warning("предупреждение")
+    listener.stop()
+
+    lines = [json.loads(line)["msg"] for line in out.getvalue().splitlines()]
+    assert lines == ["всегда", "предупреждение"]
+    assert calls == []
+
+
+def test_message_is_captured_when_logged() -> None:
+    logger, listener, out = _make_logger("test.snapshot")
+    items = ["плита"]
+    logger.info("Позиции: %s", items, extra={"request_id": "r1"})
+    items.append("блок")  # изменение после вызова не должно попасть в запись
+    try:
+        raise ValueError("сбой")
+    except ValueError:
+        logger.exception("Ошибка")
+    listener.start()
+    listener.stop()
+
+    first, second = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert first["msg"] == "Позиции: ['плита']" and first["request_id"] == "r1"
+    assert second["msg"] == "Ошибка" and "ValueError: сбой" in second["exc"]
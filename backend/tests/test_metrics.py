@@ -0,0 +1,21 @@
+from fastapi.testclient import TestClient
+
+from backend.app.routes_metrics import router as metrics_router
+
+
+def test_metrics_endpoint_exposes_quote_and_osrm_series(quote_client, quote_workload) -> None:
+    assert quote_client.post("/api/quote", json=quote_workload.baskets[0]).status_code == 200
+    quote_client.post("/api/quote", json={**quote_workload.baskets[0], "items": []})
+
+    quote_client.app.include_router(metrics_router)
+    response = TestClient(quote_client.app).get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'quote_latency_seconds_count{status="200"}' in body
+    assert 'quote_latency_seconds_count{status="400"}' in body
+    assert "quote_scenarios_bucket" in body
+    assert 'distance_cache_lookups_total{result="miss"}' in body
+    assert "osrm_failures_total" in body
+    assert 'catalog_data_age_seconds{file="factories_products"}' in body
@@ -0,0 +1,75 @@
+import pytest
+
+from backend.bench.fake_osrm import start_fake_osrm
+from backend.service import osrm_client
+from backend.service.osrm_client import OSRMBackendPool, OSRMRateLimitedError, TokenBucket
+
+ROUTE = "/route/v1/driving/37.0,55.0;37.6,55.7?overview=false"
+
+
+@pytest.fixture
+def fast_server():
+    server = start_fake_osrm("127.0.0.1")
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def slow_server():
+    server = start_fake_osrm("127.0.0.1", latency_ms=400)
+    yield server
+    server.shutdown()
+
+
+def test_pick_prefers_least_outstanding_backend() -> None:
+    pool = OSRMBackendPool(["http://a.invalid", "http://b.invalid"], hedge=False)
+    pool.backends[0].outstanding = 3
+
+    assert pool.pick().base_url == "http://b.invalid"
+    assert pool.pick(exclude=[pool.backends[1]]).base_url == "http://a.invalid"
+
+
+def test_failed_backend_is_retried_on_another(fast_server, monkeypatch) -> None:
+    monkeypatch.setattr(osrm_client.time, "sleep", lambda _: None)
+    pool = OSRMBackendPool(["http://127.0.0.1:9", fast_server.base_url], hedge=False)
+    pool.backends[1].outstanding = 1  # первым выберется недоступный
+
+    data = pool.request(ROUTE)
+
+    assert data["routes"]
+    stats = {b["url"]: b for b in pool.snapshot()["backends"]}
+    assert stats["http://127.0.0.1:9"]["errors"] == 1
+    assert stats[fast_server.base_url]["errors"] == 0
+
+
+def test_slow_backend_is_hedged_past_p95(fast_server, slow_server) -> None:
+    pool = OSRMBackendPool([slow_server.base_url, fast_server.base_url], hedge=True)
+    slow, fast = pool.backends
+    for _ in range(20):
+        slow.latency.observe(0.01)
+        fast.latency.observe(0.05)
+
+    data = pool.request(ROUTE, timeout=2)
+
+    assert data["routes"]
+    assert fast.hedges_won == 1
+    assert fast_server.requests_served == 1
+
+
+def test_token_bucket_limits_rate() -> None:
+    now = [0.0]
+    bucket = TokenBucket(rate=2, clock=lambda: now[0])
+
+    assert bucket.try_acquire() and bucket.try_acquire()
+    assert not bucket.try_acquire()
+    now[0] = 0.5
+    assert bucket.try_acquire()
+
+
+def test_request_fails_fast_when_rate_limited(fast_server, monkeypatch) -> None:
+    monkeypatch.setattr(osrm_client, "OSRM_RATE_LIMIT_WAIT_S", 0.1)
+    pool = OSRMBackendPool([fast_server.base_url], rate_limit_rps=1, hedge=False)
+    pool.request(ROUTE)
+
+    with pytest.raises(OSRMRateLimitedError):
+        pool.request(ROUTE)
@@ -0,0 +1,100 @@
+import pytest
+import requests
+
+from backend.service import osrm_client
+from backend.service.distance_providers import DistanceProvider
+from backend.service.osrm_client import CircuitBreaker, LatencyEstimator, OSRMCircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_half_open() -> None:
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=10, clock=clock)
+
+    for _ in range(3):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    clock.now = 11
+    assert breaker.allow_request()  # пробный запрос
+    assert not breaker.allow_request()  # второй параллельный — нет
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now = 22
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_adaptive_timeout_tracks_latency_within_bounds() -> None:
+    estimator = LatencyEstimator(min_s=0.2, max_s=5.0)
+    assert estimator.timeout() == 5.0
+
+    for _ in range(50):
+        estimator.observe(0.05)
+    assert estimator.timeout() == pytest.approx(0.2)
+
+    for _ in range(50):
+        estimator.observe(0.6)
+    assert 0.6 <= estimator.timeout() < 5.0
+
+
+def test_open_breaker_fails_fast_without_network(monkeypatch) -> None:
+    calls = []
+
+    def broken_get(url, timeout):
+        calls.append(url)
+        raise requests.ConnectionError("down")
+
+    monkeypatch.setattr(requests, "get", broken_get)
+    monkeypatch.setattr(osrm_client.time, "sleep", lambda _: None)
+    pool = osrm_client.OSRMBackendPool(["http://osrm.invalid"])
+    pool.backends[0].breaker = CircuitBreaker(failure_threshold=3, reset_timeout_s=60)
+    monkeypatch.setattr(osrm_client, "OSRM_BASE_URLS", ["http://osrm.invalid"])
+    monkeypatch.setattr(osrm_client, "_pool", pool)
+
+    with pytest.raises(osrm_client.OSRMUnavailableError):
+        osrm_client._request_osrm("/route")
+    assert len(calls) == 3
+
+    with pytest.raises(OSRMCircuitOpenError):
+        osrm_client._request_osrm("/route")
+    assert len(calls) == 3
+
+
+class _DownProvider(DistanceProvider):
+    name = "down"
+
+    def distance_km(self, *args):
+        raise OSRMCircuitOpenError("down")
+
+
+def test_quote_uses_flagged_estimates_while_osrm_is_down(quote_client, quote_workload) -> None:
+    osrm_client.set_distance_provider(_DownProvider())
+
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0])
+
+    assert response.status_code == 200
+    variants = response.json()["variants"]
+    assert variants and all(v["distanceEstimated"] for v in variants)
+
+
+def test_quote_returns_503_when_fallback_disabled(quote_client, quote_workload, monkeypatch) -> None:
+    from backend.core import distance
+
+    monkeypatch.setattr(distance, "OSRM_STALE_FALLBACK", False)
+    osrm_client.set_distance_provider(_DownProvider())
+
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0])
+
+    assert response.status_code == 503
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from backend.bench.fake_osrm import start_fake_osrm
+from backend.bench.synthetic_sheets import InMemorySheetSource, generate_workbook
+from backend.core import data_loader
+from backend.service import osrm_client
+from backend.service.distance_providers import OSRMDistanceProvider
+
+FACTORY = (36.498658, 55.577505)
+MOSCOW = (37.6173, 55.7558)
+
+
+@pytest.fixture()
+def fake_osrm(monkeypatch):
+    server = start_fake_osrm(detour_factor=1.0)
+    monkeypatch.setattr(osrm_client, "OSRM_BASE_URL", server.base_url)
+    monkeypatch.setattr(osrm_client, "OSRM_SNAP_HINTS", True)
+    monkeypatch.setattr(data_loader, "OSRM_SNAP_HINTS", True)
+    osrm_client.clear_hints()
+    yield server
+    osrm_client.clear_hints()
+    server.shutdown()
+    server.server_close()
+
+
+def test_route_sends_registered_hints(fake_osrm) -> None:
+    osrm_client.register_hints(osrm_client.resolve_snap_hints([FACTORY]))
+
+    osrm_client.osrm_route_distance_km(*FACTORY, *MOSCOW)
+    osrm_client.osrm_table_distances_km([FACTORY], [MOSCOW])
+
+    assert fake_osrm.hinted_requests == 2
+
+
+def test_stale_hints_are_dropped_and_refreshed(fake_osrm) -> None:
+    osrm_client.register_hints(osrm_client.resolve_snap_hints([FACTORY]))
+    stale = osrm_client.get_hint(*FACTORY)
+    fake_osrm.dataset_version = 2  # OSRM перезапущен с новыми данными
+
+    assert osrm_client.osrm_route_distance_km(*FACTORY, *MOSCOW) > 0
+
+    deadline = time.monotonic() + 2
+    while osrm_client.get_hint(*FACTORY) in (None, stale) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert fake_osrm.hint_is_valid(osrm_client.get_hint(*FACTORY))
+
+    # отклонённый hint из сохранённого каталога повторно не принимается
+    osrm_client.register_hints({FACTORY: stale})
+    assert osrm_client.get_hint(*FACTORY) != stale
+
+
+def test_ingest_stores_hint_with_factory(fake_osrm, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(osrm_client, "_provider", OSRMDistanceProvider())
+    workbook = generate_workbook(factories=3, categories=1, subtypes=2, seed=1)
+    previous = data_loader.STORAGE_PATH
+    data_loader.set_storage_path(str(tmp_path))
+    try:
+        products = data_loader.load_factories_from_google(source=InMemorySheetSource(workbook))
+    finally:
+        data_loader.set_storage_path(previous)
+
+    factories = [p["factory"] for items in products.values() for p in items]
+    assert factories and all(fake_osrm.hint_is_valid(f["osrm_hint"]) for f in factories)
+
+
+def test_ingest_skips_snap_hints_unless_enabled(fake_osrm, tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(osrm_client, "_provider", OSRMDistanceProvider())
+    monkeypatch.setattr(data_loader, "OSRM_SNAP_HINTS", False)
+    workbook = generate_workbook(factories=3, categories=1, subtypes=2, seed=1)
+    previous = data_loader.STORAGE_PATH
+    data_loader.set_storage_path(str(tmp_path))
+    try:
+        products = data_loader.load_factories_from_google(source=InMemorySheetSource(workbook))
+    finally:
+        data_loader.set_storage_path(previous)
+
+    assert fake_osrm.requests_served == 0
+    assert not any("osrm_hint" in p["factory"] for items in products.values() for p in items)
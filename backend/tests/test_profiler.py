@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from backend.app import routes_admin
+from backend.core.profiler import memory_diff, sample_stacks
+from backend.tests.conftest import HTTPX_AVAILABLE
+
+
+def _busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def test_sampler_sees_other_threads() -> None:
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        result = sample_stacks(0.2, interval_s=0.005)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert result["samples"] > 5
+    busy = [stack for stack in result["stacks"] if stack.startswith("busy-worker;")]
+    assert busy and all("_busy_loop" in stack for stack in busy)
+    assert not any("sample_stacks" in stack for stack in result["stacks"])
+
+
+def test_memory_diff_points_at_growing_allocation() -> None:
+    hoard = []
+
+    def grow():
+        for _ in range(200):
+            hoard.append(bytearray(10_000))
+            time.sleep(0.0005)
+
+    thread = threading.Thread(target=grow)
+    thread.start()
+    result = memory_diff(0.3, limit=5)
+    thread.join()
+
+    top = result["top"][0]
+    assert top["size_diff"] >= 500_000
+    assert "test_profiler.py" in top["traceback"][0]
+
+
+@pytest.fixture()
+def admin_client(monkeypatch):
+    if not HTTPX_AVAILABLE:
+        pytest.skip("httpx is required for API-level tests")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", "secret")
+    app = FastAPI()
+    app.include_router(routes_admin.router)
+    return TestClient(app)
+
+
+def test_profile_endpoint_requires_token(admin_client, monkeypatch) -> None:
+    assert admin_client.get("/admin/profile?seconds=0.05").status_code == 401
+    assert admin_client.get("/admin/profile?seconds=0.05", headers={"X-Admin-Token": "bad"}).status_code == 401
+
+    response = admin_client.get("/admin/profile?seconds=0.1", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert int(response.headers["x-profile-samples"]) > 0
+    # строки вида «поток;модуль:функция;… число»
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
+
+    memory = admin_client.get("/admin/profile?seconds=0.05&mode=memory", headers={"X-Admin-Token": "secret"})
+    assert memory.status_code == 200 and "top" in memory.json()
+
+    monkeypatch.setattr(routes_admin, "ADMIN_TOKEN", None)
+    assert admin_client.get("/admin/profile?seconds=0.05", headers={"X-Admin-Token": "secret"}).status_code == 403
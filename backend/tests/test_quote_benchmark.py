@@ -0,0 +1,62 @@
+import importlib.util
+
+import pytest
+
+from backend.bench.quote_bench import (
+    compare_reports,
+    percentile,
+    run_benchmark,
+    run_pipeline_once,
+    use_distance_provider,
+)
+from backend.bench.workload import generate_workload
+from backend.service.distance_providers import HaversineDistanceProvider
+from backend.service.quote_records import OfferIndex
+from backend.service.scenario_builder import build_factory_scenarios_v2
+
+BENCHMARK_AVAILABLE = importlib.util.find_spec("pytest_benchmark") is not None
+requires_benchmark = pytest.mark.skipif(
+    not BENCHMARK_AVAILABLE, reason="pytest-benchmark is required for benchmark tests"
+)
+
+
+@pytest.fixture(scope="module")
+def workload():
+    return generate_workload(factories=40, categories=2, subtypes=10, baskets=8,
+                             max_items=4, max_combinations=64, seed=7)
+
+
+@requires_benchmark
+def test_bench_build_scenarios(benchmark, workload) -> None:
+    # как в эндпоинте: индекс предложений общий для всех расчётов на версии каталога
+    index = OfferIndex(workload.products_list)
+    baskets = [b["items"] for b in workload.baskets]
+
+    scenarios = benchmark(lambda: [build_factory_scenarios_v2([], items, index=index) for items in baskets])
+
+    assert all(scenarios)
+
+
+@requires_benchmark
+def test_bench_full_pipeline(benchmark, workload) -> None:
+    products = workload.products_list
+    with use_distance_provider(HaversineDistanceProvider()):
+        counts = benchmark(
+            lambda: [run_pipeline_once(workload, payload, products) for payload in workload.baskets]
+        )
+
+    assert sum(counts) > 0
+
+
+def test_report_has_latency_percentiles_and_flags_regressions(workload) -> None:
+    report = run_benchmark(workload, stages=("pipeline",), memory_sample=2)
+
+    stats = report["pipeline"]
+    assert stats["count"] == len(workload.baskets)
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert report["peak_memory_mb"] > 0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+
+    slower = {"pipeline": dict(stats, p95_ms=stats["p95_ms"] * 2 + 1)}
+    rows = compare_reports(report, slower, tolerance=0.2)
+    assert any(r["metric"] == "p95_ms" and r["regression"] for r in rows)
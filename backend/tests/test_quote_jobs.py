@@ -0,0 +1,68 @@
+import json
+import time
+
+import pytest
+
+from backend.service import quote_jobs
+from backend.service.quote_jobs import JobStore, QueueFull
+
+
+@pytest.fixture()
+def jobs_client(quote_client):
+    from backend.app.routes_jobs import router
+
+    quote_client.app.include_router(router, prefix="/api")
+    yield quote_client
+    if quote_jobs._runner is not None:
+        quote_jobs._runner.stop()
+        quote_jobs._runner = None
+
+
+def _wait_finished(client, job_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/quote/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"задание {job_id} не завершилось")
+
+
+def test_job_result_matches_sync_quote(jobs_client, quote_workload) -> None:
+    basket = quote_workload.baskets[0]
+    created = jobs_client.post("/api/quote/jobs", json=basket)
+    assert created.status_code == 202
+    job_id = created.json()["id"]
+
+    job = _wait_finished(jobs_client, job_id)
+    assert job["status"] == "done" and job["httpStatus"] == 200
+    assert job["progress"]["done"] == job["progress"]["total"] > 0
+    assert job["result"] == jobs_client.post("/api/quote", json=basket).json()
+
+    events = jobs_client.get(f"/api/quote/jobs/{job_id}/events")
+    assert events.headers["content-type"].startswith("text/event-stream")
+    assert events.text.startswith("event: done\n")
+    assert json.loads(events.text.split("data: ", 1)[1])["id"] == job_id
+
+    assert jobs_client.get("/api/quote/jobs/unknown").status_code == 404
+
+
+def test_store_survives_restart_and_requeues_orphans(tmp_path) -> None:
+    path = str(tmp_path / "jobs.sqlite3")
+    store = JobStore(path)
+    first = store.submit({"items": []}, "full")
+    store.submit({"items": []}, "summary")
+    with pytest.raises(QueueFull):
+        store.submit({"items": []}, "full", max_queued=2)
+
+    claimed = store.claim()
+    assert claimed["id"] == first
+    # исполнитель «умер»: задание принадлежит несуществующему процессу
+    with store._connect() as conn:
+        conn.execute("UPDATE quote_jobs SET owner = ? WHERE id = ?", (2 ** 22 + 1, first))
+
+    reopened = JobStore(path)
+    assert reopened.get(first)["status"] == "running"
+    assert reopened.requeue_orphans() == 1
+    assert reopened.get(first)["status"] == "queued"
+    assert reopened.claim()["id"] == first
@@ -0,0 +1,101 @@
+import pytest
+
+from backend.models.dto import QuoteRequest
+from backend.service.quote_records import OfferIndex, QuoteResult
+from backend.service.scenario_builder import build_factory_scenarios_v2
+from backend.service.transport_calc import evaluate_scenario_transport
+
+
+def _product(name, price, subtype="M100", lat=55.0, lon=37.0):
+    return {
+        "category": "Бетон",
+        "subtype": subtype,
+        "weight_per_item": 2.5,
+        "special_threshold": None,
+        "max_per_trip": None,
+        "factory": {"name": name, "lat": lat, "lon": lon, "price": price, "contact": "+7"},
+    }
+
+
+def test_offer_index_keeps_cheapest_offer_per_factory() -> None:
+    index = OfferIndex([
+        _product("Завод А", 120.0),
+        _product("завод а", 100.0),
+        _product("Завод Б", 110.0),
+        _product("Завод Б", 90.0, subtype="M200"),
+    ])
+
+    offers = index.cheapest_per_factory("Бетон", "M100")
+    assert [(o.factory.name, o.price) for o in offers] == [("завод а", 100.0), ("Завод Б", 110.0)]
+    # без subtype — любые товары категории
+    assert [o.price for o in index.cheapest_per_factory("Бетон", None)] == [90.0, 100.0]
+    # один и тот же завод разных товаров — один объект
+    assert index.by_key[("Бетон", "M100")][2].factory is index.by_key[("Бетон", "M200")][0].factory
+    assert index.cheapest_per_factory("Бетон", "M100") is offers
+
+
+def test_scenarios_share_selections_and_convert_to_legacy_dicts(quote_workload, quote_storage) -> None:
+    index = OfferIndex(quote_workload.products_list)
+    payload = max(quote_workload.baskets, key=lambda b: len(b["items"]))
+    req = QuoteRequest(**payload)
+    scenarios = build_factory_scenarios_v2([], [i.dict() for i in req.items], index=index)
+    assert len(scenarios) > 1
+
+    # позиции не копируются между сценариями — сценарий хранит ссылки на общие записи
+    selections = {id(s) for sc in scenarios for items in sc.factories.values() for s in items}
+    assert len(selections) < sum(len(items) for sc in scenarios for items in sc.factories.values())
+
+    results = [r for r in (evaluate_scenario_transport(sc, req, quote_workload.tariffs) for sc in scenarios) if r]
+    assert results and all(isinstance(r, QuoteResult) for r in results)
+
+    best = min(results, key=lambda r: r.total_cost)
+    data = best.to_dict()
+    assert data["total_cost"] == data["material_sum"] + data["delivery_cost"]
+    assert data["trip_count"] == sum(len(p["trips"]) for p in data["factory_plans"])
+    assert data["factories"][0]["trips"] is data["factory_plans"][0]["trips"]
+
+    trip = data["factory_plans"][0]["trips"][0]
+    assert set(trip) == {"tag", "tariff_name", "tariff_label", "trip_cost", "load_ton", "distance_km", "items"}
+    assert all(isinstance(line, str) and line for line in trip["items"])
+
+    selection = next(iter(data["scenario"]["factories"].values()))[0]
+    assert selection["factory"]["name"] and selection["weight_total"] == (
+        selection["weight_per_item"] * selection["quantity"]
+    )
+
+
+def test_summary_view_skips_trip_details_and_groups_trips(quote_client, quote_workload) -> None:
+    payload = max(quote_workload.baskets, key=lambda b: len(b["items"]))
+    full = quote_client.post("/api/quote", json=payload)
+    summary = quote_client.post("/api/quote", params={"view": "summary"}, json=payload)
+    assert full.status_code == summary.status_code == 200
+    assert len(summary.content) < len(full.content)
+
+    for short, detailed in zip(summary.json()["variants"], full.json()["variants"]):
+        assert not {"transportDetails", "details", "tripItems"} & set(short)
+        assert {k: v for k, v in detailed.items() if k in short} == short
+
+        groups = short["tripGroups"]
+        assert sum(g["count"] for g in groups) == short["tripCount"] == len(detailed["tripItems"])
+        assert sum(g["deliveryCost"] for g in groups) == pytest.approx(short["deliveryCost"], abs=0.05)
+        assert all(g["label"] == f"{g['count']} × {g['vehicle']}" for g in groups)
+
+    assert quote_client.post("/api/quote", params={"view": "compact"}, json=payload).status_code == 422
+
+
+def test_variant_key_loads_one_variant_like_full_view(quote_client, quote_workload) -> None:
+    payload = max(quote_workload.baskets, key=lambda b: len(b["items"]))
+    full = quote_client.post("/api/quote", json=payload).json()["variants"]
+    summary = quote_client.post("/api/quote", params={"view": "summary"}, json=payload).json()["variants"]
+
+    for short, detailed in zip(summary, full):
+        response = quote_client.post("/api/quote/variant", json={**payload, "variantKey": short["variantKey"]})
+        assert response.status_code == 200
+        assert response.json()["variant"] == detailed
+
+    assert quote_client.post("/api/quote/variant", json={**payload, "variantKey": "не ключ"}).status_code == 400
+    # ключ не подходит к другой корзине
+    other = min(quote_workload.baskets, key=lambda b: len(b["items"]))
+    if len(other["items"]) != len(payload["items"]):
+        stale = quote_client.post("/api/quote/variant", json={**other, "variantKey": summary[0]["variantKey"]})
+        assert stale.status_code == 409
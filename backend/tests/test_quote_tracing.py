@@ -0,0 +1,51 @@
+import json
+
+from backend.core import slowlog
+
+
+def test_quote_without_debug_has_no_timings(quote_client, quote_workload) -> None:
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0])
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert "debug" not in response.json()
+
+
+def test_quote_debug_timing_reports_stages_and_counters(quote_client, quote_workload) -> None:
+    response = quote_client.post(
+        "/api/quote",
+        json=quote_workload.baskets[0],
+        headers={"X-Debug-Timing": "1"},
+    )
+
+    assert response.status_code == 200
+    header = response.headers["server-timing"]
+    for stage in ("load_data", "scenarios", "evaluate", "details", "serialize", "total"):
+        assert f"{stage};dur=" in header
+
+    debug = response.json()["debug"]
+    counters = debug["counters"]
+    assert counters["scenarios_generated"] == counters["scenarios_evaluated"] > 0
+    assert counters["planner_iterations"] > 0
+    lookups = counters.get("distance_cache_hits", 0) + counters.get("distance_cache_misses", 0)
+    assert lookups >= counters["scenarios_evaluated"]
+    assert "linear_plan" in debug["timings_ms"]
+
+
+def test_slow_quote_is_written_to_slow_log(quote_client, quote_workload, tmp_path, monkeypatch) -> None:
+    path = tmp_path / "slow.log"
+    monkeypatch.setattr(slowlog, "QUOTE_SLOW_MS", 0.001)
+    monkeypatch.setattr(slowlog, "QUOTE_SLOW_LOG", str(path))
+    monkeypatch.setattr(slowlog, "_handler", None)
+
+    response = quote_client.post("/api/quote", json=quote_workload.baskets[0])
+    assert response.status_code == 200
+    # журнал включает трассировку, но в ответ она не попадает
+    assert "debug" not in response.json() and "server-timing" not in response.headers
+
+    slowlog._handler.close()
+    entry = json.loads(path.read_text(encoding="utf-8").splitlines()[-1])
+    assert entry["status"] == 200 and entry["elapsed_ms"] > 0
+    assert entry["request"]["items"] == quote_workload.baskets[0]["items"]
+    assert entry["counters"]["scenarios_evaluated"] > 0
+    assert "evaluate" in entry["timings_ms"]
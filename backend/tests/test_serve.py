@@ -0,0 +1,132 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+import requests
+
+from backend.core import data_loader
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "fork") or not Path("/proc").is_dir(), reason="prefork-сервер работает только на Linux"
+)
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _children(pid: int) -> set:
+    result = set()
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == pid:
+            result.add(int(stat.parent.name))
+    return result
+
+
+def _wait(predicate, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(0.1)
+    raise AssertionError("не дождались условия")
+
+
+def _get(url: str):
+    try:
+        return requests.get(url, timeout=2)
+    except requests.RequestException:
+        return None
+
+
+def test_prefork_server_serves_reloads_and_stops(tmp_path, quote_workload) -> None:
+    previous = data_loader.STORAGE_PATH
+    data_loader.set_storage_path(str(tmp_path))
+    try:
+        data_loader._save_factories(quote_workload.products)
+        data_loader._save_tariffs(quote_workload.tariffs)
+    finally:
+        data_loader.set_storage_path(previous)
+
+    port = _free_port()
+    env = dict(os.environ, STORAGE_PATH=str(tmp_path), PYTHONPATH=str(ROOT), SERVE_GRACEFUL_TIMEOUT_S="5")
+    env.pop("GOOGLE_SHEET_ID", None)
+    master = subprocess.Popen(
+        [sys.executable, "-m", "backend.app.serve", "--host", "127.0.0.1", "--port", str(port), "--workers", "2"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        response = _wait(lambda: _get(base + "/api/tariffs"))
+        assert response.status_code == 200
+        first_generation = _wait(lambda: len(_children(master.pid)) == 2 and _children(master.pid))
+
+        # SIGHUP — новое поколение воркеров с заново загруженным каталогом
+        master.send_signal(signal.SIGHUP)
+        second_generation = _wait(
+            lambda: (kids := _children(master.pid)) and not kids & first_generation and len(kids) == 2 and kids
+        )
+        assert _get(base + "/api/categories").status_code == 200
+
+        # упавший воркер перезапускается
+        victim = next(iter(second_generation))
+        os.kill(victim, signal.SIGKILL)
+        _wait(lambda: victim not in (kids := _children(master.pid)) and len(kids) == 2)
+        assert _get(base + "/api/factories").status_code == 200
+
+        master.send_signal(signal.SIGTERM)
+        assert master.wait(timeout=15) == 0
+    finally:
+        if master.poll() is None:
+            master.kill()
+            master.wait()
+
+
+def test_workers_crashing_at_start_are_respawned_with_backoff(monkeypatch) -> None:
+    from backend.app import serve
+    from backend.core.logger import get_logger
+
+    server = serve.PreforkServer("127.0.0.1", 0, workers=1)
+    server.log = get_logger("serve")
+    spawned = []
+    monkeypatch.setattr(server, "_spawn", lambda: spawned.append(time.monotonic()))
+
+    delays = []
+    for _ in range(4):
+        before = time.monotonic()
+        server._schedule_respawn(1, 256, uptime_s=0.1)
+        delays.append(server._respawn_at.pop() - before)
+    assert delays[0] >= serve.SERVE_RESPAWN_BACKOFF_S
+    assert delays == sorted(delays) and delays[-1] >= 4 * delays[0]
+
+    # воркер, проработавший дольше порога, перезапускается сразу и сбрасывает счётчик
+    server._schedule_respawn(1, 0, uptime_s=serve.SERVE_RESPAWN_MIN_UPTIME_S + 1)
+    server._respawn_due()
+    assert len(spawned) == 1 and server._crashes == 0
+
+
+def test_reaped_worker_metrics_are_marked_dead(tmp_path, monkeypatch) -> None:
+    from backend.app import serve
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    live = tmp_path / "gauge_livemax_4242.db"
+    kept = tmp_path / "gauge_max_4242.db"
+    live.write_bytes(b"")
+    kept.write_bytes(b"")
+
+    serve._mark_metrics_dead(4242)
+    assert not live.exists() and kept.exists()
@@ -0,0 +1,42 @@
+import pytest
+
+from backend.bench.synthetic_sheets import generate_workbook, write_csv_workbook
+from backend.service.factories_parser import LocalSheetSource, SheetSource, parse_google_sheet
+
+
+def test_local_csv_source_parses_like_google_layout(tmp_path) -> None:
+    workbook = generate_workbook(factories=30, categories=2, subtypes=5, density=1.0, seed=1)
+    workbook["Дорожные ПЛИТЫ/ПАГИ"] = workbook.pop("Категория 2")
+    write_csv_workbook(workbook, tmp_path)
+
+    result = parse_google_sheet(source=LocalSheetSource(tmp_path))
+
+    products = result["products"]
+    assert set(products) == {"Категория 1", "Дорожные ПЛИТЫ/ПАГИ"}
+    assert len(products["Категория 1"]) == 30 * 5
+
+    first = products["Категория 1"][0]
+    assert first["weight_per_item"] > 0
+    assert first["factory"]["lat"] is not None and first["factory"]["lon"] is not None
+    assert first["factory"]["price"] > 0
+
+    tariffs = result["tariffs"]
+    assert tariffs
+    assert {t["tag"] for t in tariffs} == {"manipulator", "long_haul", "special"}
+
+
+def test_local_source_respects_allowed_sheets(tmp_path) -> None:
+    write_csv_workbook(generate_workbook(factories=5, categories=3, subtypes=2), tmp_path)
+
+    result = parse_google_sheet(["Категория 2"], source=LocalSheetSource(tmp_path))
+
+    assert list(result["products"]) == ["Категория 2"]
+    assert result["tariffs"] == []
+
+
+def test_sheet_source_requires_worksheets() -> None:
+    class Incomplete(SheetSource):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
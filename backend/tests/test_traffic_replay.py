@@ -0,0 +1,39 @@
+import pytest
+
+from backend.bench import replay
+from backend.service import traffic_recorder
+from backend.service.traffic_recorder import read_records
+
+
+@pytest.fixture(params=["traffic.jsonl", "traffic.jsonl.gz"])
+def record_file(request, tmp_path, monkeypatch):
+    path = str(tmp_path / request.param)
+    monkeypatch.setattr(traffic_recorder, "QUOTE_RECORD_FILE", path)
+    monkeypatch.setattr(traffic_recorder, "_recorder", None)
+    return path
+
+
+def test_recorded_traffic_replays_to_same_top3(quote_client, quote_workload, record_file) -> None:
+    for basket in quote_workload.baskets[:3]:
+        assert quote_client.post("/api/quote?view=summary", json=basket).status_code == 200
+
+    records = list(read_records([record_file]))
+    assert len(records) == 3
+    first = records[0]
+    assert first["view"] == "summary" and first["status"] == 200 and len(first["top"]) > 0
+    assert first["request"]["items"] == quote_workload.baskets[0]["items"]
+    # точка выгрузки в журнале округлена, расстояния записаны по заводам
+    assert first["request"]["upload_lat"] == round(quote_workload.baskets[0]["upload_lat"], 3)
+    assert first["distances"] and all(len(row) == 3 for row in first["distances"])
+
+    report = replay.run_replay(records)
+    summary = report["summary"]
+    assert summary["requests"] == 3
+    assert summary["top_changed"] == summary["status_changed"] == summary["catalog_changed"] == 0
+    assert summary["distance_misses"] == 0
+
+    # другой топ-3 в записи — воспроизведение показывает изменение
+    records[1]["top"] = records[1]["top"][::-1] + [{"totalCost": 0}]
+    changed = replay.run_replay(records, baseline=report)
+    assert [row["top_changed"] for row in changed["requests"]] == [False, True, False]
+    assert changed["reference"] == "baseline"
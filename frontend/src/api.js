@@ -5,11 +5,12 @@ export const API_BASE = envBase || (isDev ? "http://127.0.0.1:8000" : window.loc
 console.log("🌍 API_BASE =", API_BASE);
 
 // === Универсальная обёртка для fetch ===
-async function request(method, path, body) {
+async function request(method, path, body, init = {}) {
   const url = `${API_BASE}${path}`;
   const options = {
     method,
     headers: { "Content-Type": "application/json" },
+    ...init,
   };
   if (body !== undefined) {
     options.body = JSON.stringify(body);
@@ -39,6 +40,12 @@ async function request(method, path, body) {
 }
 
 // === Основные функции API ===
+// Категории, параметры подтипов и машины из тарифов одним документом.
+// cache: "no-cache" — браузер перепроверяет сохранённую копию по ETag и получает 304
+export async function getBootstrap() {
+  return request("GET", "/api/bootstrap", undefined, { cache: "no-cache" });
+}
+
 export async function getCategories() {
   return request("GET", "/api/categories");
 }
@@ -51,12 +58,18 @@ export async function reloadAll() {
   return request("POST", "/admin/reload", {});
 }
 
-export async function getQuote(payload) {
-  const data = await request("POST", "/api/quote", payload);
+// view: "summary" — итоги и рейсы «N × машина», "full" — плюс детализация по каждому рейсу
+export async function getQuote(payload, { view = "full" } = {}) {
+  const data = await request("POST", `/api/quote?view=${encodeURIComponent(view)}`, payload);
   // если сервер возвращает объект с полем result, разворачиваем
   return data.result || data;
 }
 
+// Детализация одного варианта по variantKey из ответа getQuote(..., { view: "summary" })
+export async function getQuoteVariant(payload, variantKey) {
+  const data = await request("POST", "/api/quote/variant", { ...payload, variantKey });
+  return data.variant;
+}
 
 // === Совместимость со старым фронтом ===
 // (чтобы Admin.jsx и прочие старые страницы не падали)
@@ -1,7 +1,6 @@
 import React, { useState, useEffect } from "react";
 import { motion } from "framer-motion";
-import { getCategories, getQuote } from "../api";
-import { API_BASE } from "../api";
+import { getBootstrap, getQuote, getQuoteVariant } from "../api";
 
 export default function Calculator() {
   const [categories, setCategories] = useState({});
@@ -10,41 +9,23 @@ export default function Calculator() {
   const [transportType, setTransportType] = useState("auto");
   const [result, setResult] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [lastPayload, setLastPayload] = useState(null);
+  const [detailsLoading, setDetailsLoading] = useState(false);
   const [addManipulator, setAddManipulator] = useState(false);
   const [selectedSpecial, setSelectedSpecial] = useState("");
   const [specialVehicles, setSpecialVehicles] = useState([]);
 
   useEffect(() => {
     async function load() {
-      const data = await getCategories();
-      setCategories(data || {});
-
       try {
-        const res = await fetch(`${API_BASE}/api/tariffs`);
-        const tariffs = await res.json();
-
-        // поддержка русских и английских ключей
-        const specials = (tariffs || []).filter(
-          (t) => t.tag === "special" || t["тег"] === "special"
-        );
-
-        const uniqueSpecials = [];
-        const seenNames = new Set();
-
-        for (const t of specials) {
-          const name = t.name || t["название"];
-          if (!seenNames.has(name)) {
-            seenNames.add(name);
-            uniqueSpecials.push({
-              name,
-              tag: t.tag || t["тег"],
-            });
-          }
-        }
+        const data = await getBootstrap();
+        setCategories(data?.categories || {});
 
-        setSpecialVehicles(uniqueSpecials);
+        // машины спецтранспорта — из сводки тарифов
+        const specials = (data?.tariffs || []).filter((t) => t.tag === "special");
+        setSpecialVehicles(specials.map((t) => ({ name: t.name, tag: t.tag })));
       } catch (err) {
-        console.error("Ошибка загрузки тарифов:", err);
+        console.error("Ошибка загрузки справочников:", err);
       }
 
       const demo = sessionStorage.getItem("demo_coords");
@@ -92,7 +73,9 @@ export default function Calculator() {
         })),
       };
 
-      const data = await getQuote(payload);
+      // для списка вариантов хватает итогов; детализацию рейсов запрашиваем по кнопке
+      const data = await getQuote(payload, { view: "summary" });
+      setLastPayload(payload);
       if (data?.variants) {
         setResult({ ...data, selectedVariant: 0 });
       } else {
@@ -122,6 +105,28 @@ export default function Calculator() {
     }
   };
 
+  const handleLoadDetails = async () => {
+    const index = result?.selectedVariant ?? 0;
+    const variantKey = result?.variants?.[index]?.variantKey;
+    if (!lastPayload || !variantKey) return;
+    try {
+      setDetailsLoading(true);
+      // сервер пересчитывает только этот вариант, а не весь перебор заводов
+      const variant = await getQuoteVariant(lastPayload, variantKey);
+      if (variant) {
+        setResult((prev) => ({
+          ...prev,
+          variants: prev.variants.map((v, i) => (i === index ? variant : v)),
+        }));
+      }
+    } catch (err) {
+      console.error("Ошибка загрузки детализации:", err);
+      alert(err?.message || "Ошибка при загрузке детализации");
+    } finally {
+      setDetailsLoading(false);
+    }
+  };
+
   return (
     <motion.div
       className="space-y-8"
@@ -348,39 +353,84 @@ export default function Calculator() {
             const activeVariant = result.variants[result.selectedVariant] || {};
             const tripItems = activeVariant.tripItems || [];
             const detailRows = activeVariant.details || [];
+            const tripGroups = activeVariant.tripGroups || [];
+            const hasDetails = Array.isArray(activeVariant.details);
 
             return (
               <div className="mt-10 space-y-6">
-                <div className="overflow-auto rounded-xl border border-slate-200 bg-slate-900/70 shadow-sm">
-                  <table className="w-full text-sm text-slate-200">
-                    <thead className="bg-slate-900/50 text-slate-300 border-b border-slate-800">
-                      <tr>
-                        <th className="p-3 text-left">Производство</th>
-                        <th className="p-3 text-left">Контакт</th>
-                        <th className="p-3 text-left">Товар</th>
-                        <th className="p-3 text-left">Машина</th>
-                        <th className="p-3 text-left">Расстояние (км)</th>
-                        <th className="p-3 text-left">Материал (₽)</th>
-                        <th className="p-3 text-left">Доставка (₽)</th>
-                        <th className="p-3 text-left">Итого (₽)</th>
-                      </tr>
-                    </thead>
-                    <tbody>
-                      {detailRows.map((d, idx) => (
-                        <tr key={idx} className="border-b border-slate-800">
-                          <td className="p-3 whitespace-nowrap">{d["завод"]}</td>
-                          <td className="p-3 whitespace-pre-line text-slate-400">{d["контакт"] || "—"}</td>
-                          <td className="p-3">{d["товар"]}</td>
-                          <td className="p-3">{d["машина"]}</td>
-                          <td className="p-3">{d["расстояние_км"]}</td>
-                          <td className="p-3">{d["стоимость_материала"]?.toLocaleString()}</td>
-                          <td className="p-3">{d["стоимость_доставки"]?.toLocaleString()}</td>
-                          <td className="p-3 text-indigo-300 font-semibold">{d["итого"]?.toLocaleString()}</td>
+                {tripGroups.length > 0 && (
+                  <div className="overflow-auto rounded-xl border border-slate-200 bg-slate-900/70 shadow-sm">
+                    <div className="p-4 border-b border-slate-800 flex items-center gap-2 text-slate-200">
+                      🚛 Рейсы по машинам
+                    </div>
+                    <table className="w-full text-sm text-slate-200">
+                      <thead className="bg-slate-900/50 text-slate-300 border-b border-slate-800">
+                        <tr>
+                          <th className="p-3 text-left">Производство</th>
+                          <th className="p-3 text-left">Рейсы</th>
+                          <th className="p-3 text-left">Расстояние (км)</th>
+                          <th className="p-3 text-left">Загрузка (т)</th>
+                          <th className="p-3 text-left">Доставка (₽)</th>
                         </tr>
-                      ))}
-                    </tbody>
-                  </table>
-                </div>
+                      </thead>
+                      <tbody>
+                        {tripGroups.map((g, i) => (
+                          <tr key={i} className="border-b border-slate-800">
+                            <td className="p-3 whitespace-nowrap">{g.factory}</td>
+                            <td className="p-3">{g.label}</td>
+                            <td className="p-3">{g.distanceKm}</td>
+                            <td className="p-3">{g.loadTon}</td>
+                            <td className="p-3">{Number(g.deliveryCost || 0).toLocaleString()}</td>
+                          </tr>
+                        ))}
+                      </tbody>
+                    </table>
+                  </div>
+                )}
+
+                {!hasDetails && (
+                  <button
+                    type="button"
+                    onClick={handleLoadDetails}
+                    disabled={detailsLoading}
+                    className="px-4 py-2 bg-white border border-slate-200 rounded-lg shadow-sm text-sm font-semibold hover:border-indigo-200 disabled:opacity-60"
+                  >
+                    {detailsLoading ? "Загружаем детализацию..." : "Показать детализацию по рейсам"}
+                  </button>
+                )}
+
+                {hasDetails && (
+                  <div className="overflow-auto rounded-xl border border-slate-200 bg-slate-900/70 shadow-sm">
+                    <table className="w-full text-sm text-slate-200">
+                      <thead className="bg-slate-900/50 text-slate-300 border-b border-slate-800">
+                        <tr>
+                          <th className="p-3 text-left">Производство</th>
+                          <th className="p-3 text-left">Контакт</th>
+                          <th className="p-3 text-left">Товар</th>
+                          <th className="p-3 text-left">Машина</th>
+                          <th className="p-3 text-left">Расстояние (км)</th>
+                          <th className="p-3 text-left">Материал (₽)</th>
+                          <th className="p-3 text-left">Доставка (₽)</th>
+                          <th className="p-3 text-left">Итого (₽)</th>
+                        </tr>
+                      </thead>
+                      <tbody>
+                        {detailRows.map((d, idx) => (
+                          <tr key={idx} className="border-b border-slate-800">
+                            <td className="p-3 whitespace-nowrap">{d["завод"]}</td>
+                            <td className="p-3 whitespace-pre-line text-slate-400">{d["контакт"] || "—"}</td>
+                            <td className="p-3">{d["товар"]}</td>
+                            <td className="p-3">{d["машина"]}</td>
+                            <td className="p-3">{d["расстояние_км"]}</td>
+                            <td className="p-3">{d["стоимость_материала"]?.toLocaleString()}</td>
+                            <td className="p-3">{d["стоимость_доставки"]?.toLocaleString()}</td>
+                            <td className="p-3 text-indigo-300 font-semibold">{d["итого"]?.toLocaleString()}</td>
+                          </tr>
+                        ))}
+                      </tbody>
+                    </table>
+                  </div>
+                )}
 
                 {Array.isArray(tripItems) && tripItems.length > 0 && (
                   <div className="overflow-auto rounded-xl border border-slate-200 bg-slate-900/70 shadow-sm">